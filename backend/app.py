@@ -1,21 +1,59 @@
 import os
+import threading
 import time
 
+import psycopg2
+from cache import INVALIDATION_CHANNEL, catalogue_cache, handle_invalidation
+from conditional import handle_version_notification, table_versions
 from crud_api import crud_bp
-from db_helper import init_db
+from events import BOOKING_EVENTS_CHANNEL, broker
 from flask import Flask
 from flask_cors import CORS
 from login_signup import auth_bp
+from metrics import init_metrics
+from migrations import migrate
+from notifications import listener
+from query_log import init_query_log
+from reservations import run_hold_sweeper
+from suggest import (SUGGESTION_CHANNEL, apply_suggestion_changes, handle_suggestion_change, request_rebuild,
+                     warm_suggestion_index)
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
 app.register_blueprint(auth_bp)
 app.register_blueprint(crud_bp)
+init_metrics(app)
+init_query_log(app)
+
+threading.Thread(target=warm_suggestion_index, name='suggest-warmup', daemon=True).start()
+threading.Thread(target=apply_suggestion_changes, name='suggest-changes', daemon=True).start()
+threading.Thread(target=run_hold_sweeper, name='hold-sweeper', daemon=True).start()
+
+# Evict cached catalogue reads and move ETags on when any worker or container
+# writes. The cache must be invalidated before the version changes, or a
+# request in between could label a stale cached body with the new ETag.
+# While the listener is disconnected notifications may be missed, so nothing
+# cached or versioned before the outage is trusted afterwards.
+listener.subscribe(INVALIDATION_CHANNEL, handle_invalidation)
+listener.subscribe(INVALIDATION_CHANNEL, handle_version_notification)
+listener.on_connect(table_versions.announce)
+listener.on_disconnect(table_versions.reset)
+listener.on_disconnect(catalogue_cache.clear)
+listener.on_reconnect(catalogue_cache.clear)
+# Title and author name changes from every worker keep each suggestion index current
+listener.subscribe(SUGGESTION_CHANNEL, handle_suggestion_change)
+listener.on_reconnect(request_rebuild)
+# Booking changes are pushed to this worker's open admin and reader event streams
+listener.subscribe(BOOKING_EVENTS_CHANNEL, broker.publish)
+listener.start()
 
 if __name__ == "__main__":
     print("⏳ Waiting for database to be ready...")
     time.sleep(3)
-    init_db()
+    try:
+        migrate()
+    except psycopg2.Error as e:
+        print(f"❌ Database migration error: {e}")
     port = int(os.environ.get("PORT", 5000))
     app.run(debug=False, host="0.0.0.0", port=port)
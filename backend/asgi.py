@@ -0,0 +1,307 @@
+import asyncio
+import os
+import re
+import time
+import urllib.parse
+from contextlib import asynccontextmanager
+
+import psycopg
+from a2wsgi import WSGIMiddleware
+from app import app as flask_app
+from crud_api import BOOK_DETAIL_QUERY, BOOK_LIST_SPEC, QUEUE_POSITION, _prefixed, rating_summary
+from db_helper import DB_CONFIG, POOL_CONFIG
+from events import BOOKING_EVENTS_CHANNEL, TooManyClients, async_broker, async_event_stream
+from metrics import (record_acquire, registry, request_db_queries, request_db_time, request_duration,
+                     requests_in_flight, requests_total, response_size)
+from notifications import listener
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from query_log import observe_statement
+
+# Serve the app on an event loop: run with
+#   uvicorn --host 0.0.0.0 --port 8080 --workers 4 asgi:app
+#
+# The routes that spend their time waiting (event streams, the book detail
+# page, the health check) run as coroutines on an async connection pool, so
+# an idle or slow client costs a coroutine instead of a thread. Every other
+# route of auth_bp and crud_bp is the Flask view itself, run on a bounded
+# thread pool, so the JSON contracts are the same in both modes. Those routes
+# are as concurrent as ASYNC_WSGI_THREADS allows, no more than under gunicorn;
+# only GET /api/health, GET /api/books/<id>/detail and the event stream are
+# native. No throughput or latency comparison with gunicorn has been
+# measured (see the README's Benchmarks section for how to run one).
+
+# Threads for the routes still served by Flask, each held for the whole of one
+# such request; by default one per connection of the (threaded) Flask pool
+ASYNC_WSGI_THREADS = int(os.getenv("ASYNC_WSGI_THREADS", POOL_CONFIG['max_size']))
+# Connections in each process's async pool. Requests queue for them, so this
+# bounds the load on Postgres however many clients are connected.
+ASYNC_DB_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", 20))
+# Seconds a request waits for a pooled connection before answering 503
+ASYNC_DB_TIMEOUT = float(os.getenv("ASYNC_DB_TIMEOUT", 5))
+
+# Seconds clients are told to wait after a 503
+RETRY_AFTER = '5'
+
+_pool = None
+wsgi = WSGIMiddleware(flask_app, workers=ASYNC_WSGI_THREADS)
+
+# app.py already LISTENs on the channel for the threaded broker, and the
+# listener looks callbacks up per notification, so adding one now is safe
+listener.subscribe(BOOKING_EVENTS_CHANNEL, async_broker.publish)
+
+
+def _pool_kwargs():
+    # psycopg 3 only takes the libpq name for the database
+    kwargs = {key: value for key, value in DB_CONFIG.items() if key != 'database'}
+    return {**kwargs, 'dbname': DB_CONFIG['database'], 'row_factory': dict_row}
+
+
+@asynccontextmanager
+async def db_connection():
+    """Async counterpart of db_helper.db_connection: a pooled connection, or None if none came in time.
+
+    The transaction is committed when the block exits cleanly and rolled
+    back if it raises.
+    """
+    started = time.perf_counter()
+    acquired = False
+    try:
+        async with _pool.connection(timeout=ASYNC_DB_TIMEOUT) as conn:
+            acquired = True
+            record_acquire(time.perf_counter() - started, True)
+            yield conn
+    except (PoolTimeout, psycopg.OperationalError) as e:
+        if acquired:
+            raise
+        print(f"Async database connection error: {e}")
+        record_acquire(time.perf_counter() - started, False)
+        yield None
+
+
+class Request:
+    """What a native route needs from the ASGI scope, plus its statement count for Server-Timing."""
+
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        # Like Flask's request.args.get, the first value of a repeated parameter wins
+        self.args = {}
+        for key, value in urllib.parse.parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True):
+            self.args.setdefault(key, value)
+        self.query_count = 0
+        self.query_seconds = 0.0
+
+    async def fetchone(self, conn, query, params):
+        started = time.perf_counter()
+        ok = False
+        async with conn.cursor() as cur:
+            try:
+                await cur.execute(query, params)
+                row = await cur.fetchone()
+                ok = True
+            finally:
+                seconds = time.perf_counter() - started
+                self.query_count += 1
+                self.query_seconds += seconds
+                # Not 'execute', which would have it run a blocking EXPLAIN on this connection
+                observe_statement(cur, 'execute_async', query, params, seconds, ok)
+        return row
+
+
+def _cors_headers(request):
+    # The same headers flask-cors adds for origins "*"
+    origin = request.headers.get('origin')
+    if origin:
+        return [(b'access-control-allow-origin', origin.encode('latin-1')), (b'vary', b'Origin')]
+    return [(b'access-control-allow-origin', b'*')]
+
+
+async def send_json(request, send, body, status=200, headers=()):
+    """Send ``body`` exactly as Flask's jsonify would encode it."""
+    payload = (flask_app.json.dumps(body, indent=None, separators=(',', ':')) + '\n').encode()
+    timing = f'db;dur={request.query_seconds * 1000:.3f};desc="{request.query_count} queries"'
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode()),
+            (b'server-timing', timing.encode()),
+            *_cors_headers(request),
+            *headers
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def send_db_unavailable(request, send):
+    await send_json(request, send, {'success': False, 'message': 'Database temporarily unavailable'}, 503,
+                    [(b'retry-after', RETRY_AFTER.encode())])
+
+
+# ==================== NATIVE ROUTES ====================
+
+# (path pattern, handler, metrics labels); the labels match the Flask rule the
+# route replaces, so dashboards see one series whichever way it is served
+ROUTES = []
+
+
+def route(pattern, blueprint, rule):
+    def register(handler):
+        labels = (blueprint, rule, 'GET')
+        ROUTES.append((re.compile(pattern), handler, labels))
+        return handler
+    return register
+
+
+@route(r'/api/health', 'auth', '/api/health')
+async def health(request, send):
+    """Health check endpoint"""
+    async with db_connection() as conn:
+        db_status = "connected" if conn else "disconnected"
+
+    await send_json(request, send, {
+        'status': 'healthy',
+        'message': 'Library Management System API is running',
+        'database': db_status
+    })
+
+
+@route(r'/api/books/(\d+)/detail', 'crud', '/api/books/<int:book_id>/detail')
+async def get_book_detail(request, send, book_id):
+    """Async version of crud_api.get_book_detail, on the same query"""
+    try:
+        user_id = request.args.get('user_id')
+
+        async with db_connection() as conn:
+            if not conn:
+                return await send_db_unavailable(request, send)
+
+            columns = ', '.join(f'b.{column}' for column in BOOK_LIST_SPEC['columns'])
+            row = await request.fetchone(conn, BOOK_DETAIL_QUERY.format(columns=columns, position=QUEUE_POSITION),
+                                         {'book_id': int(book_id), 'user_id': user_id})
+
+        if not row:
+            return await send_json(request, send, {'success': False, 'message': 'Book not found'}, 404)
+
+        body = {
+            'success': True,
+            'book': {column: row[column] for column in BOOK_LIST_SPEC['columns']},
+            'author': {'authorid': row['authorid'], 'authorname': row['authorname'], 'authorbio': row['authorbio']},
+            'publisher': {'publisherid': row['publisherid'], 'publishername': row['publishername']} if row['publisherid'] else None,
+            'rating': rating_summary(row)
+        }
+        if user_id:
+            body['user'] = {
+                'user_id': user_id,
+                'booking': _prefixed(row, 'user_booking_'),
+                'reservation': _prefixed(row, 'user_reservation_'),
+                'review': _prefixed(row, 'user_review_')
+            }
+
+        await send_json(request, send, body)
+
+    except Exception as e:
+        print(f"Get book detail error: {e}")
+        await send_json(request, send, {'success': False, 'message': str(e)}, 500)
+
+
+async def _until_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _send_events(send, subscriber, user_id):
+    async for message in async_event_stream(subscriber, user_id):
+        await send({'type': 'http.response.body', 'body': message.encode(), 'more_body': True})
+
+
+@route(r'/api/bookings/events', 'crud', '/api/bookings/events')
+async def stream_booking_events(request, send):
+    """Stream booking changes as server-sent events, one coroutine per client"""
+    try:
+        subscriber = async_broker.subscribe()
+    except TooManyClients:
+        return await send_json(request, send,
+                               {'success': False, 'message': 'Too many open event streams, try again later'}, 503,
+                               [(b'retry-after', b'30')])
+
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+                *_cors_headers(request)
+            ]
+        })
+        # Nothing is read from the client, so its leaving is only seen by waiting on receive()
+        tasks = {asyncio.ensure_future(_send_events(send, subscriber, request.args.get('user_id'))),
+                 asyncio.ensure_future(_until_disconnect(request.receive))}
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+        for task in done:
+            if not task.cancelled() and task.exception() and not isinstance(task.exception(), OSError):
+                print(f"Booking event stream error: {task.exception()}")
+    finally:
+        async_broker.unsubscribe(subscriber)
+
+
+async def _observed(handler, labels, request, send, params):
+    """Run a native route, recording the same metrics metrics.py records for Flask's."""
+    registry.ensure_flusher()
+    started = time.perf_counter()
+
+    async def send_and_record(message):
+        if message['type'] == 'http.response.start':
+            requests_total.inc(labels + (str(message['status']),))
+            request_duration.observe(labels, time.perf_counter() - started)
+            request_db_time.observe(labels, request.query_seconds)
+            if request.query_count:
+                request_db_queries.inc(labels, request.query_count)
+            length = dict(message['headers']).get(b'content-length')
+            if length is not None:
+                response_size.observe(labels, int(length))
+        await send(message)
+
+    requests_in_flight.inc(labels)
+    try:
+        await handler(request, send_and_record, *params)
+    finally:
+        requests_in_flight.dec(labels)
+
+
+async def _lifespan(receive, send):
+    global _pool
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Not waiting for the first connection, so the server starts even while Postgres is down
+            _pool = AsyncConnectionPool(kwargs=_pool_kwargs(), min_size=POOL_CONFIG['min_size'],
+                                        max_size=ASYNC_DB_POOL_MAX, open=False)
+            await _pool.open(wait=False)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _pool is not None:
+                await _pool.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """The ASGI application: native routes first, everything else to Flask."""
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        for pattern, handler, labels in ROUTES:
+            match = pattern.fullmatch(scope['path'])
+            if match:
+                return await _observed(handler, labels, Request(scope, receive), send, match.groups())
+    await wsgi(scope, receive, send)
@@ -0,0 +1,318 @@
+"""Bulk book import from CSV or NDJSON, staged with COPY and applied set-based.
+
+Also usable from the command line:
+
+    python bulk_import.py books.csv
+    python bulk_import.py books.ndjson --format ndjson
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime
+
+import psycopg2
+from db_helper import db_connection
+from images import ImageError, store_data_uri
+from suggest import REBUILD_PAYLOAD, SUGGESTION_CHANNEL, SUGGESTION_NOTIFY_SETTING
+
+# Rows staged and applied per transaction
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 50000))
+# Per-row errors listed in the report; any beyond this are only counted
+MAX_REPORTED_ERRORS = 1000
+
+# Input columns are matched case-insensitively, using the same names as POST /api/books
+REQUIRED_FIELDS = ('name', 'category', 'genre', 'publishdate', 'language', 'pagecount',
+                   'copiesavailable', 'ratedtype', 'authorname', 'publishername')
+# Column widths from the schema, checked up front so one long value cannot fail a whole batch
+MAX_LENGTHS = {'name': 50, 'category': 50, 'genre': 50, 'language': 30, 'ratedtype': 20,
+               'authorname': 50, 'authorbio': 500, 'publishername': 50}
+# Largest value of an INT column (BookId, pagecount, copiesavailable), checked for the same reason
+MAX_INT = 2 ** 31 - 1
+
+STAGING_COLUMNS = ('line', 'bookid', 'name', 'author_name', 'author_bio', 'publisher_name', 'category', 'genre',
+                   'publishdate', 'language', 'pagecount', 'copiesavailable', 'imglink', 'cover_hash', 'ratedtype',
+                   'description')
+
+# Lives for the session, so a pooled connection creates it once; emptied by every commit
+STAGING_TABLE = '''
+    CREATE TEMP TABLE IF NOT EXISTS book_import (
+        line INT NOT NULL,
+        bookid INT,
+        name TEXT NOT NULL,
+        author_name TEXT NOT NULL,
+        author_bio TEXT,
+        publisher_name TEXT NOT NULL,
+        category TEXT NOT NULL,
+        genre TEXT NOT NULL,
+        publishdate DATE NOT NULL,
+        language TEXT NOT NULL,
+        pagecount INT NOT NULL,
+        copiesavailable INT NOT NULL,
+        imglink TEXT,
+        cover_hash TEXT,
+        ratedtype TEXT NOT NULL,
+        description TEXT
+    ) ON COMMIT DELETE ROWS
+'''
+
+# Names are matched case-insensitively, as create_book() does. Each query
+# handles the whole batch with one anti-join, however many rows share a name.
+CREATE_AUTHORS = '''
+    INSERT INTO Author (AuthorName, AuthorBio)
+    SELECT DISTINCT ON (LOWER(author_name)) author_name, author_bio
+    FROM book_import i
+    WHERE NOT EXISTS (SELECT 1 FROM Author a WHERE LOWER(a.AuthorName) = LOWER(i.author_name))
+    ORDER BY LOWER(author_name), line
+    ON CONFLICT DO NOTHING
+'''
+
+CREATE_PUBLISHERS = '''
+    INSERT INTO Publisher (PublisherName)
+    SELECT DISTINCT ON (LOWER(publisher_name)) publisher_name
+    FROM book_import i
+    WHERE NOT EXISTS (SELECT 1 FROM Publisher p WHERE LOWER(p.PublisherName) = LOWER(i.publisher_name))
+    ORDER BY LOWER(publisher_name), line
+    ON CONFLICT DO NOTHING
+'''
+
+MISSING_BOOKS = '''
+    SELECT line, bookid FROM book_import i
+    WHERE bookid IS NOT NULL AND NOT EXISTS (SELECT 1 FROM Books b WHERE b.BookId = i.bookid)
+    ORDER BY line
+'''
+
+# Taken before UPSERT_BOOKS, whose fresh snapshot then sees every checkout
+# and return of these titles: both take the Books row lock first
+LOCK_BOOKS = '''
+    SELECT 1 FROM Books
+    WHERE BookId IN (SELECT bookid FROM book_import)
+    ORDER BY BookId
+    FOR UPDATE
+'''
+
+# Rows with a BookId update that book; the rest are inserted. The imported
+# copiesavailable is the title's total stock: copies out on loan or held for
+# a reserver stay off the shelf until they come back.
+UPSERT_BOOKS = '''
+    WITH authors AS (
+        SELECT DISTINCT ON (LOWER(AuthorName)) LOWER(AuthorName) AS name_key, AuthorId
+        FROM Author
+        WHERE LOWER(AuthorName) IN (SELECT LOWER(author_name) FROM book_import)
+        ORDER BY LOWER(AuthorName), AuthorId
+    ), publishers AS (
+        SELECT DISTINCT ON (LOWER(PublisherName)) LOWER(PublisherName) AS name_key, PublisherId
+        FROM Publisher
+        WHERE LOWER(PublisherName) IN (SELECT LOWER(publisher_name) FROM book_import)
+        ORDER BY LOWER(PublisherName), PublisherId
+    ), staged AS (
+        SELECT i.*, a.AuthorId AS author_id, p.PublisherId AS publisher_id
+        FROM book_import i
+        JOIN authors a ON a.name_key = LOWER(i.author_name)
+        JOIN publishers p ON p.name_key = LOWER(i.publisher_name)
+    ), updated AS (
+        UPDATE Books b SET
+            Name = s.name, authorID = s.author_id, category = s.category, genre = s.genre,
+            publisherID = s.publisher_id, publishdate = s.publishdate, language = s.language,
+            pagecount = s.pagecount, imglink = s.imglink,
+            copiesavailable = GREATEST(s.copiesavailable
+                - (SELECT COUNT(*) FROM Bookings bk
+                   WHERE bk.BookId = b.BookId AND (bk.CurrentlyBookedIndicator OR bk.pendingReturnIndicator))
+                - (SELECT COUNT(*) FROM Reservations r WHERE r.BookId = b.BookId AND r.HoldExpiresAt IS NOT NULL),
+                0),
+            cover_hash = s.cover_hash, ratedType = s.ratedtype, description = s.description
+        FROM staged s
+        WHERE b.BookId = s.bookid
+        RETURNING b.BookId
+    ), inserted AS (
+        INSERT INTO Books (Name, authorID, category, genre, publisherID, publishdate, language,
+                           pagecount, copiesavailable, imglink, cover_hash, ratedType, description)
+        SELECT name, author_id, category, genre, publisher_id, publishdate, language,
+               pagecount, copiesavailable, imglink, cover_hash, ratedtype, description
+        FROM staged
+        WHERE bookid IS NULL
+        RETURNING BookId
+    )
+    SELECT (SELECT COUNT(*) FROM updated), (SELECT COUNT(*) FROM inserted)
+'''
+
+
+def read_rows(stream, import_format):
+    """Yield ``(line, row)`` from a text stream; ``row`` is None for an NDJSON line that is not an object."""
+    if import_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            row = None
+        yield line, row if isinstance(row, dict) else None
+
+
+def _text(row, field):
+    value = row.get(field)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _int(row, field, minimum=None, maximum=MAX_INT):
+    value = _text(row, field)
+    if value is None:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f'{field} must be an integer')
+    if minimum is not None and number < minimum:
+        raise ValueError(f'{field} must be at least {minimum}')
+    if number > maximum:
+        raise ValueError(f'{field} must be at most {maximum}')
+    return number
+
+
+def parse_row(line, row):
+    """Validate one input row and return it as a tuple in STAGING_COLUMNS order. Raises ValueError."""
+    if row is None:
+        raise ValueError('not a JSON object')
+    row = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+
+    for field in REQUIRED_FIELDS:
+        if _text(row, field) is None:
+            raise ValueError(f'{field} is required')
+    for field, limit in MAX_LENGTHS.items():
+        value = _text(row, field)
+        if value is not None and len(value) > limit:
+            raise ValueError(f'{field} is longer than {limit} characters')
+    try:
+        publish_date = datetime.strptime(_text(row, 'publishdate'), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('publishdate must be YYYY-MM-DD')
+    # Inline covers go to the image store, as they do through POST /api/books
+    imglink, cover_hash = _text(row, 'imglink'), None
+    if imglink and imglink.startswith('data:'):
+        try:
+            imglink, cover_hash = None, store_data_uri(imglink)
+        except ImageError as e:
+            raise ValueError(f'imglink: {e}')
+
+    return (
+        line,
+        _int(row, 'bookid', 1),
+        _text(row, 'name'),
+        _text(row, 'authorname'),
+        _text(row, 'authorbio'),
+        _text(row, 'publishername'),
+        _text(row, 'category'),
+        _text(row, 'genre'),
+        publish_date.isoformat(),
+        _text(row, 'language'),
+        _int(row, 'pagecount', 0),
+        _int(row, 'copiesavailable', 0),
+        imglink,
+        cover_hash,
+        _text(row, 'ratedtype'),
+        _text(row, 'description')
+    )
+
+
+def _add_error(report, line, message):
+    report['error_count'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append({'line': line, 'message': message})
+
+
+def _apply_batch(conn, batch, report):
+    """COPY one batch into the staging table and apply it in a single transaction."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(batch)
+    buffer.seek(0)
+
+    cur = conn.cursor()
+    try:
+        cur.execute(STAGING_TABLE)
+        # One rebuild notification below instead of a burst from the triggers
+        cur.execute("SELECT set_config(%s, 'off', true)", (SUGGESTION_NOTIFY_SETTING,))
+        cur.copy_expert(f"COPY book_import ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cur.execute(CREATE_AUTHORS)
+        authors_created = cur.rowcount
+        cur.execute(CREATE_PUBLISHERS)
+        publishers_created = cur.rowcount
+        cur.execute(MISSING_BOOKS)
+        missing = cur.fetchall()
+        cur.execute(LOCK_BOOKS)
+        cur.execute(UPSERT_BOOKS)
+        updated, inserted = cur.fetchone()
+        if inserted or updated or authors_created:
+            cur.execute('SELECT pg_notify(%s, %s)', (SUGGESTION_CHANNEL, REBUILD_PAYLOAD))
+        conn.commit()
+    except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+        # Anything the row checks did not catch fails the whole batch
+        conn.rollback()
+        message = f'batch rejected by the database: {str(e).strip().splitlines()[0]}'
+        for row in batch:
+            _add_error(report, row[0], message)
+        return
+    finally:
+        cur.close()
+
+    for line, book_id in missing:
+        _add_error(report, line, f'BookId {book_id} not found')
+    report['inserted'] += inserted
+    report['updated'] += updated
+    report['authors_created'] += authors_created
+    report['publishers_created'] += publishers_created
+
+
+def import_books(conn, rows, batch_size=IMPORT_BATCH_SIZE):
+    """Import ``(line, row)`` pairs from read_rows() and return a report.
+
+    Invalid rows are skipped and reported by line. Every batch is committed
+    on its own, so a failed batch does not undo the ones before it.
+    """
+    report = {'rows': 0, 'inserted': 0, 'updated': 0, 'authors_created': 0, 'publishers_created': 0,
+              'error_count': 0, 'errors': []}
+    batch = []
+    for line, row in rows:
+        report['rows'] += 1
+        try:
+            batch.append(parse_row(line, row))
+        except ValueError as e:
+            _add_error(report, line, str(e))
+            continue
+        if len(batch) >= batch_size:
+            _apply_batch(conn, batch, report)
+            batch = []
+    if batch:
+        _apply_batch(conn, batch, report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import books from a CSV or NDJSON file.')
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=('csv', 'ndjson'),
+                        help='defaults to the file extension (.csv or anything else as NDJSON)')
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    import_format = args.format or ('csv' if args.path.lower().endswith('.csv') else 'ndjson')
+
+    with db_connection() as conn:
+        if not conn:
+            sys.exit('Database unavailable')
+        with open(args.path, encoding='utf-8-sig', newline='') as stream:
+            report = import_books(conn, read_rows(stream, import_format), args.batch_size)
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report['error_count'] else 0)
+
+
+if __name__ == '__main__':
+    main()
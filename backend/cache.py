@@ -0,0 +1,269 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 32 * 1024 * 1024))
+CACHE_TTL = float(os.getenv("CACHE_TTL", 60))
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# NOTIFY channel the catalogue tables' statement triggers publish on; the
+# payload is ``table:version:epoch`` and the table doubles as the cache tag
+INVALIDATION_CHANNEL = 'catalogue_invalidate'
+
+
+class TTLCache:
+    """Thread-safe, in-process LRU cache of byte strings, bounded by total size and entry age.
+
+    Entries are tagged with the tables they were read from. Writers call
+    ``invalidate(tag)`` after committing; each tag also carries a generation
+    counter so that a reader which started before the write cannot store
+    the stale result it computed once the write has invalidated the tag.
+    clear() bumps the ``'*'`` generation, which every snapshot includes.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._tagged = {}
+        self._bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def _drop(self, key):
+        _, size, _, tags = self._entries.pop(key)
+        self._bytes -= size
+        for tag in tags:
+            self._tagged[tag].discard(key)
+
+    def get(self, key, tags=()):
+        """Return the cached value for ``key``, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            expires_at, _, value, _ = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def _generation(self, tags):
+        # '*' is bumped by clear() and so is part of every snapshot
+        return tuple(self._generations.get(tag, 0) for tag in ('*',) + tuple(tags))
+
+    def generation(self, tags):
+        """Snapshot of the tags' generations, to pass back to set()."""
+        with self._lock:
+            return self._generation(tags)
+
+    def set(self, key, value, tags=(), generation=None, ttl=None):
+        """Store ``value`` unless any tag was invalidated since ``generation`` was taken."""
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation(tags):
+                return
+            if key in self._entries:
+                self._drop(key)
+            expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._entries[key] = (expires_at, size, value, tuple(tags))
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            self._bytes += size
+            self._stores += 1
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of ``tags``."""
+        with self._lock:
+            stale = set()
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                stale.update(self._tagged.get(tag, ()))
+            for key in stale:
+                self._drop(key)
+            self._invalidations += len(stale)
+
+    def clear(self):
+        """Drop every entry, e.g. after the invalidation listener reconnects."""
+        with self._lock:
+            self._generations['*'] = self._generations.get('*', 0) + 1
+            self._entries.clear()
+            self._tagged.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else None,
+                'stores': self._stores,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations
+            }
+
+
+class RedisCache:
+    """Cache shared by every worker and container, kept in Redis.
+
+    Same interface as TTLCache. Instead of deleting tagged entries, each tag
+    has a generation counter in Redis that is part of every entry key, so
+    invalidate() is a single INCR and stale entries simply stop being
+    addressed and age out. Size is bounded by the Redis server's own
+    ``maxmemory`` policy. Redis errors degrade to cache misses.
+    """
+
+    def __init__(self, url=CACHE_REDIS_URL, ttl=CACHE_TTL, prefix='catalogue'):
+        import redis  # only needed when CACHE_BACKEND=redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._error = redis.RedisError
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._invalidations = 0
+        self._errors = 0
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _entry_key(self, key, generation):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return f"{self.prefix}:{'.'.join(map(str, generation))}:{digest}"
+
+    def _generation(self, tags):
+        # '*' is bumped by clear() and so is part of every key
+        names = [f'{self.prefix}:gen:{tag}' for tag in ('*',) + tuple(tags)]
+        return tuple(int(value or 0) for value in self._redis.mget(names))
+
+    def generation(self, tags):
+        try:
+            return self._generation(tags)
+        except self._error:
+            self._count('_errors')
+            return None
+
+    def get(self, key, tags=()):
+        try:
+            value = self._redis.get(self._entry_key(key, self._generation(tags)))
+        except self._error:
+            self._count('_errors')
+            return None
+        self._count('_hits' if value is not None else '_misses')
+        return value
+
+    def set(self, key, value, tags=(), generation=None, ttl=None):
+        try:
+            if generation is None:
+                generation = self._generation(tags)
+            ttl_ms = int((self.ttl if ttl is None else ttl) * 1000)
+            self._redis.set(self._entry_key(key, generation), value, px=max(ttl_ms, 1))
+        except self._error:
+            self._count('_errors')
+            return
+        self._count('_stores')
+
+    def invalidate(self, *tags):
+        try:
+            pipe = self._redis.pipeline()
+            for tag in tags:
+                pipe.incr(f'{self.prefix}:gen:{tag}')
+            pipe.execute()
+        except self._error:
+            self._count('_errors')
+            return
+        self._count('_invalidations')
+
+    def clear(self):
+        self.invalidate('*')
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'backend': 'redis',
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else None,
+                'stores': self._stores,
+                'invalidations': self._invalidations,
+                'errors': self._errors
+            }
+
+
+def create_cache(backend=CACHE_BACKEND):
+    """Build the cache backend named by ``CACHE_BACKEND``: ``memory`` (default) or ``redis``."""
+    if backend == 'memory':
+        return TTLCache()
+    if backend == 'redis':
+        return RedisCache()
+    raise ValueError(f'Unknown CACHE_BACKEND: {backend}')
+
+
+catalogue_cache = create_cache()
+
+
+def handle_invalidation(payload):
+    """NOTIFY callback: another worker (or any other writer) changed a catalogue table."""
+    catalogue_cache.invalidate(payload.split(':', 1)[0])
+
+
+def cached_json(*tags):
+    """Serve a GET handler's successful JSON responses from ``catalogue_cache``.
+
+    The cache key is the handler plus its path and query arguments; the
+    encoded response body is stored so a hit skips both the query and
+    JSON serialisation. Only 200 responses are cached.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (view.__name__, tuple(sorted(kwargs.items())), tuple(sorted(request.args.items(multi=True))))
+            body = catalogue_cache.get(key, tags)
+            if body is not None:
+                return current_app.response_class(body, mimetype='application/json')
+
+            generation = catalogue_cache.generation(tags)
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                catalogue_cache.set(key, response.get_data(), tags, generation)
+            return response
+        return wrapper
+    return decorator
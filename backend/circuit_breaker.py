@@ -0,0 +1,101 @@
+import math
+import random
+import threading
+import time
+
+
+def backoff_delay(attempt, base, cap):
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2**attempt))."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """Fail-fast guard in front of the database.
+
+    After ``failure_threshold`` consecutive connection failures the circuit
+    opens and callers are refused immediately instead of waiting on a dead
+    server. While open, a background thread calls ``probe`` with jittered
+    exponential backoff and closes the circuit as soon as it succeeds.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+
+    def __init__(self, probe, failure_threshold=3, probe_base_delay=0.5, probe_max_delay=10.0, on_open=None):
+        self.probe = probe
+        self.failure_threshold = max(failure_threshold, 1)
+        self.probe_base_delay = probe_base_delay
+        self.probe_max_delay = probe_max_delay
+        self.on_open = on_open
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._next_probe_at = None
+        self._times_opened = 0
+        self._rejected = 0
+
+    @property
+    def state(self):
+        return self._state
+
+    def allow_request(self):
+        """Return True if callers may try the database right now."""
+        if self._state == self.CLOSED:
+            return True
+        with self._lock:
+            self._rejected += 1
+        return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.OPEN or self._failures < self.failure_threshold:
+                return
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._next_probe_at = self._opened_at + self.probe_base_delay
+            self._times_opened += 1
+        print(f"❌ Database circuit opened after {self._failures} consecutive failures")
+        if self.on_open:
+            self.on_open()
+        threading.Thread(target=self._probe_loop, name='db-circuit-probe', daemon=True).start()
+
+    def retry_after(self):
+        """Whole seconds until the next recovery probe, for the Retry-After header."""
+        next_probe_at = self._next_probe_at
+        if self._state == self.CLOSED or next_probe_at is None:
+            return 1
+        return max(1, math.ceil(next_probe_at - time.monotonic()))
+
+    def _probe_loop(self):
+        attempt = 0
+        while True:
+            delay = max(backoff_delay(attempt, self.probe_base_delay, self.probe_max_delay), self.probe_base_delay)
+            with self._lock:
+                self._next_probe_at = time.monotonic() + delay
+            time.sleep(delay)
+            if self.probe():
+                with self._lock:
+                    self._state = self.CLOSED
+                    self._failures = 0
+                    self._next_probe_at = None
+                    downtime = time.monotonic() - self._opened_at
+                print(f"✅ Database reachable again, circuit closed after {downtime:.1f}s")
+                return
+            attempt += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'times_opened': self._times_opened,
+                'rejected_requests': self._rejected,
+                'retry_after': self.retry_after() if self._state == self.OPEN else None
+            }
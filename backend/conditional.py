@@ -0,0 +1,123 @@
+import hashlib
+import itertools
+import os
+import threading
+from functools import wraps
+
+from flask import current_app, request
+
+# Tables whose writes the notify triggers report; must match the trigger arguments in migrations.py
+TRACKED_TABLES = ('books', 'authors', 'publishers', 'bookings', 'users')
+
+
+class TableVersions:
+    """Per-table version tokens, kept current from the catalogue NOTIFY stream.
+
+    Every notification carries a fresh value from ``catalogue_version_seq``,
+    so each token names exactly one committed change and is never reused.
+    The token is simply whichever value arrived last, not the largest, because
+    transactions can commit in a different order from the one they drew
+    their values in. A table has no token (and its endpoints send no ETag)
+    until this worker has seen a notification for it; announce() gets one
+    sent for every table as soon as the listener connects, and every worker
+    receives the same notifications in the same order, so all workers
+    converge on the same tokens and therefore the same ETags.
+
+    A worker that commits a write bump()s its own tokens straight away, so
+    it never answers its own client's next request from before the write
+    while the notification is still on its way.
+    """
+
+    def __init__(self, tables=TRACKED_TABLES):
+        self.tables = tables
+        self._lock = threading.Lock()
+        self._versions = {}
+        # Local tokens are strings, so they can never equal a sequence value
+        self._local = (f'{os.getpid()}.{n}' for n in itertools.count())
+
+    def update(self, table, version):
+        with self._lock:
+            self._versions[table] = version
+
+    def bump(self, *tables):
+        """Move ``tables`` to fresh tokens of this worker's own after it commits a write to them."""
+        with self._lock:
+            for table in tables:
+                self._versions[table] = next(self._local)
+
+    def reset(self):
+        with self._lock:
+            self._versions.clear()
+
+    def snapshot(self, tables):
+        """Return the tokens for ``tables``, or None if any of them is unknown."""
+        with self._lock:
+            if any(table not in self._versions for table in tables):
+                return None
+            return tuple(self._versions[table] for table in tables)
+
+    def announce(self, conn):
+        """Ask every worker, this one included, to move to fresh tokens for all tracked tables.
+
+        Called whenever the listener (re)connects: notifications may have been
+        missed while it was away, so nothing known before is trusted.
+        """
+        self.reset()
+        cur = conn.cursor()
+        for table in self.tables:
+            cur.execute('''
+                SELECT pg_notify('catalogue_invalidate',
+                    %s || ':' || nextval('catalogue_version_seq') || ':' || extract(epoch FROM clock_timestamp()))
+            ''', (table,))
+        cur.close()
+
+    def stats(self):
+        with self._lock:
+            return {table: self._versions.get(table) for table in self.tables}
+
+
+table_versions = TableVersions()
+
+
+def handle_version_notification(payload):
+    """NOTIFY callback: record the new token for the table named in a ``table:version:epoch`` payload."""
+    parts = payload.split(':')
+    if len(parts) != 3:
+        return
+    table, version, _ = parts
+    table_versions.update(table, int(version))
+
+
+def conditional(*tables, cache_control='public, no-cache'):
+    """Add ETag/Cache-Control to a GET handler and answer If-None-Match revalidations with 304.
+
+    The ETag is derived from the handler, its arguments and the current
+    version tokens of ``tables`` alone, so a revalidation that still
+    matches is answered without running the handler or touching the
+    database. ``no-cache`` lets clients keep the body but makes them
+    revalidate every time, which is what keeps this safe.
+
+    No Last-Modified is sent and If-Modified-Since is ignored: commit
+    times are neither unique at one-second resolution nor in commit
+    order, so only the token says whether anything changed.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            snapshot = table_versions.snapshot(tables)
+            if snapshot is None:
+                return view(*args, **kwargs)
+            key = repr((view.__name__, sorted(kwargs.items()), sorted(request.args.items(multi=True)), snapshot))
+            etag = hashlib.sha1(key.encode()).hexdigest()[:20]
+
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
@@ -1,42 +1,75 @@
+import io
+import os
 from datetime import datetime
 
-from db_helper import get_db_connection
-from flask import Blueprint, jsonify, request
+from bulk_import import import_books, read_rows
+from cache import cached_json, catalogue_cache
+from conditional import conditional, table_versions
+from db_helper import db_connection, db_unavailable, get_db_connection
+from events import TooManyClients, broker, event_stream, notify_booking_event
+from flask import Blueprint, Response, current_app, jsonify, request, send_file, stream_with_context
+from images import (MAX_IMAGE_BYTES, ImageError, UnsupportedImageType, cover_fields, image_path, is_digest,
+                    make_thumbnail, sniff_mimetype, store_image)
+from pagination import QueryParamError, fetch_page, id_list, page_body, parse_bool, parse_flag
 from psycopg2.extras import RealDictCursor
+from reservations import RESERVATION_HOLD, notify_hold
+from search import search_books
+from streaming import csv_chunks, export_query, iter_rows, ndjson_chunks
+from suggest import ensure_loaded, suggestion_index
 
 crud_bp = Blueprint('crud', __name__)
 
+def tables_changed(*tables):
+    """After committing a write: drop this worker's cached reads of ``tables`` and move its ETags on.
+
+    The NOTIFY does the same for every worker, but only once it arrives.
+    """
+    catalogue_cache.invalidate(*tables)
+    table_versions.bump(*tables)
+
 # =========================================USERS TABLE CRUD=========================================
 
+USER_LIST_SPEC = {
+    'table': 'Users',
+    'key': 'userid',
+    # PasswordHash is deliberately not listable
+    'columns': ['userid', 'username', 'email', 'creationtime', 'adminindicator'],
+    'sorts': {'userid', 'username', 'creationtime'},
+    'default_sort': 'userid',
+    'filters': {
+        'ids': ('userid = ANY(%s)', id_list(str)),
+        'admin': ('adminindicator = %s', parse_bool)
+    }
+}
+
 @crud_bp.route('/api/users', methods=['GET'])
 def get_users():
-    """Get all users or a specific user by UserId"""
+    """Get a page of users or a specific user by UserId"""
     try:
         user_id = request.args.get('user_id')
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur = conn.cursor(cursor_factory=RealDictCursor)
         
-        if user_id:
-            cur.execute('SELECT * FROM Users WHERE UserId = %s', (user_id,))
-            user = cur.fetchone()
-            cur.close()
-            conn.close()
+            if user_id:
+                cur.execute('SELECT * FROM Users WHERE UserId = %s', (user_id,))
+                user = cur.fetchone()
+                cur.close()
             
-            if not user:
-                return jsonify({'success': False, 'message': 'User not found'}), 404
+                if not user:
+                    return jsonify({'success': False, 'message': 'User not found'}), 404
             
-            return jsonify({'success': True, 'user': user}), 200
-        else:
-            cur.execute('SELECT * FROM Users')
-            users = cur.fetchall()
-            cur.close()
-            conn.close()
-            
-            return jsonify({'success': True, 'count': len(users), 'users': users}), 200
+                return jsonify({'success': True, 'user': user}), 200
+            else:
+                users, next_cursor, total = fetch_page(cur, USER_LIST_SPEC, request.args)
+                cur.close()
             
+                return jsonify(page_body('users', users, next_cursor, total)), 200
+    
+    except QueryParamError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Get users error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -54,37 +87,36 @@ def create_user():
             if field not in data:
                 return jsonify({'success': False, 'message': f'{field} is required'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor()
+            cur = conn.cursor()
+        
+            cur.execute('SELECT UserId FROM Users WHERE UserId = %s', (data['UserId'],))
+            if cur.fetchone():
+                cur.close()
+                return jsonify({'success': False, 'message': 'UserId already exists'}), 409
         
-        cur.execute('SELECT UserId FROM Users WHERE UserId = %s', (data['UserId'],))
-        if cur.fetchone():
+            cur.execute('''
+                INSERT INTO Users (UserId, Username, Email, PasswordHash, AdminIndicator, CreationTime)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING UserId
+            ''', (
+                data['UserId'],
+                data['Username'],
+                data['Email'],
+                data['PasswordHash'],
+                data.get('AdminIndicator', False),
+                data.get('CreationTime', datetime.now())
+            ))
+        
+            user_id = cur.fetchone()[0]
+            conn.commit()
             cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'UserId already exists'}), 409
-        
-        cur.execute('''
-            INSERT INTO Users (UserId, Username, Email, PasswordHash, AdminIndicator, CreationTime)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            RETURNING UserId
-        ''', (
-            data['UserId'],
-            data['Username'],
-            data['Email'],
-            data['PasswordHash'],
-            data.get('AdminIndicator', False),
-            data.get('CreationTime', datetime.now())
-        ))
-        
-        user_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'message': 'User created successfully', 'user_id': user_id}), 201
+            tables_changed('users')
+        
+            return jsonify({'success': True, 'message': 'User created successfully', 'user_id': user_id}), 201
         
     except Exception as e:
         print(f"Create user error: {e}")
@@ -98,42 +130,40 @@ def update_user(user_id):
         if not data:
             return jsonify({'success': False, 'message': 'No data provided'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor()
+            cur = conn.cursor()
         
-        cur.execute('SELECT UserId FROM Users WHERE UserId = %s', (user_id,))
-        if not cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'User not found'}), 404
+            cur.execute('SELECT UserId FROM Users WHERE UserId = %s', (user_id,))
+            if not cur.fetchone():
+                cur.close()
+                return jsonify({'success': False, 'message': 'User not found'}), 404
         
-        update_fields = []
-        values = []
+            update_fields = []
+            values = []
         
-        allowed_fields = ['Username', 'Email', 'PasswordHash', 'AdminIndicator']
-        for field in allowed_fields:
-            if field in data:
-                update_fields.append(f"{field} = %s")
-                values.append(data[field])
+            allowed_fields = ['Username', 'Email', 'PasswordHash', 'AdminIndicator']
+            for field in allowed_fields:
+                if field in data:
+                    update_fields.append(f"{field} = %s")
+                    values.append(data[field])
         
-        if not update_fields:
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'No valid fields to update'}), 400
+            if not update_fields:
+                cur.close()
+                return jsonify({'success': False, 'message': 'No valid fields to update'}), 400
         
-        values.append(user_id)
-        query = f"UPDATE Users SET {', '.join(update_fields)} WHERE UserId = %s RETURNING UserId"
+            values.append(user_id)
+            query = f"UPDATE Users SET {', '.join(update_fields)} WHERE UserId = %s RETURNING UserId"
         
-        cur.execute(query, values)
-        updated_user_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
+            cur.execute(query, values)
+            updated_user_id = cur.fetchone()[0]
+            conn.commit()
+            cur.close()
+            tables_changed('users')
         
-        return jsonify({'success': True, 'message': 'User updated successfully', 'user_id': updated_user_id}), 200
+            return jsonify({'success': True, 'message': 'User updated successfully', 'user_id': updated_user_id}), 200
         
     except Exception as e:
         print(f"Update user error: {e}")
@@ -141,35 +171,48 @@ def update_user(user_id):
 
 # ===================================AUTHOR TABLE CRUD===================================
 
+AUTHOR_LIST_SPEC = {
+    'table': 'Author',
+    'key': 'authorid',
+    'columns': ['authorid', 'authorname', 'authorbio'],
+    'sorts': {'authorid', 'authorname'},
+    'default_sort': 'authorid',
+    'filters': {
+        'ids': ('authorid = ANY(%s)', id_list(int)),
+        'name': ('LOWER(authorname) = LOWER(%s)', str)
+    }
+}
+
 @crud_bp.route('/api/authors', methods=['GET'])
+@conditional('authors')
+@cached_json('authors')
 def get_authors():
-    """Get all authors or a specific author by AuthorId"""
+    """Get a page of authors or a specific author by AuthorId"""
     try:
         author_id = request.args.get('author_id')
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur = conn.cursor(cursor_factory=RealDictCursor)
         
-        if author_id:
-            cur.execute('SELECT * FROM Author WHERE AuthorId = %s', (author_id,))
-            author = cur.fetchone()
-            cur.close()
-            conn.close()
+            if author_id:
+                cur.execute('SELECT * FROM Author WHERE AuthorId = %s', (author_id,))
+                author = cur.fetchone()
+                cur.close()
             
-            if not author:
-                return jsonify({'success': False, 'message': 'Author not found'}), 404
+                if not author:
+                    return jsonify({'success': False, 'message': 'Author not found'}), 404
             
-            return jsonify({'success': True, 'author': author}), 200
-        else:
-            cur.execute('SELECT * FROM Author')
-            authors = cur.fetchall()
-            cur.close()
-            conn.close()
-            
-            return jsonify({'success': True, 'count': len(authors), 'authors': authors}), 200
+                return jsonify({'success': True, 'author': author}), 200
+            else:
+                authors, next_cursor, total = fetch_page(cur, AUTHOR_LIST_SPEC, request.args)
+                cur.close()
             
+                return jsonify(page_body('authors', authors, next_cursor, total)), 200
+    
+    except QueryParamError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Get authors error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -182,27 +225,28 @@ def create_author():
         if not data or not data.get('AuthorName'):
             return jsonify({'success': False, 'message': 'AuthorName is required'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor()
+            cur = conn.cursor()
         
-        cur.execute('''
-            INSERT INTO Author (AuthorName, AuthorBio)
-            VALUES (%s, %s)
-            RETURNING AuthorId
-        ''', (
-            data['AuthorName'],
-            data.get('AuthorBio')
-        ))
+            cur.execute('''
+                INSERT INTO Author (AuthorName, AuthorBio)
+                VALUES (%s, %s)
+                RETURNING AuthorId
+            ''', (
+                data['AuthorName'],
+                data.get('AuthorBio')
+            ))
         
-        author_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
+            author_id = cur.fetchone()[0]
+            conn.commit()
+            cur.close()
+            tables_changed('authors')
+            suggestion_index.upsert('author', author_id, data['AuthorName'])
         
-        return jsonify({'success': True, 'message': 'Author created successfully', 'author_id': author_id}), 201
+            return jsonify({'success': True, 'message': 'Author created successfully', 'author_id': author_id}), 201
         
     except Exception as e:
         print(f"Create author error: {e}")
@@ -216,44 +260,44 @@ def update_author(author_id):
         if not data:
             return jsonify({'success': False, 'message': 'No data provided'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor()
+            cur = conn.cursor()
         
-        cur.execute('SELECT AuthorId FROM Author WHERE AuthorId = %s', (author_id,))
-        if not cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'Author not found'}), 404
+            cur.execute('SELECT AuthorId FROM Author WHERE AuthorId = %s', (author_id,))
+            if not cur.fetchone():
+                cur.close()
+                return jsonify({'success': False, 'message': 'Author not found'}), 404
         
-        update_fields = []
-        values = []
+            update_fields = []
+            values = []
         
-        if 'AuthorName' in data:
-            update_fields.append("AuthorName = %s")
-            values.append(data['AuthorName'])
+            if 'AuthorName' in data:
+                update_fields.append("AuthorName = %s")
+                values.append(data['AuthorName'])
         
-        if 'AuthorBio' in data:
-            update_fields.append("AuthorBio = %s")
-            values.append(data['AuthorBio'])
+            if 'AuthorBio' in data:
+                update_fields.append("AuthorBio = %s")
+                values.append(data['AuthorBio'])
         
-        if not update_fields:
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'No valid fields to update'}), 400
+            if not update_fields:
+                cur.close()
+                return jsonify({'success': False, 'message': 'No valid fields to update'}), 400
         
-        values.append(author_id)
-        query = f"UPDATE Author SET {', '.join(update_fields)} WHERE AuthorId = %s RETURNING AuthorId"
+            values.append(author_id)
+            query = f"UPDATE Author SET {', '.join(update_fields)} WHERE AuthorId = %s RETURNING AuthorId"
         
-        cur.execute(query, values)
-        updated_author_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
+            cur.execute(query, values)
+            updated_author_id = cur.fetchone()[0]
+            conn.commit()
+            cur.close()
+            tables_changed('authors')
+            if 'AuthorName' in data:
+                suggestion_index.upsert('author', updated_author_id, data['AuthorName'])
         
-        return jsonify({'success': True, 'message': 'Author updated successfully', 'author_id': updated_author_id}), 200
+            return jsonify({'success': True, 'message': 'Author updated successfully', 'author_id': updated_author_id}), 200
         
     except Exception as e:
         print(f"Update author error: {e}")
@@ -261,35 +305,48 @@ def update_author(author_id):
 
 # =========================================PUBLISHER TABLE CRUD=========================================
 
+PUBLISHER_LIST_SPEC = {
+    'table': 'Publisher',
+    'key': 'publisherid',
+    'columns': ['publisherid', 'publishername'],
+    'sorts': {'publisherid', 'publishername'},
+    'default_sort': 'publisherid',
+    'filters': {
+        'ids': ('publisherid = ANY(%s)', id_list(int)),
+        'name': ('LOWER(publishername) = LOWER(%s)', str)
+    }
+}
+
 @crud_bp.route('/api/publishers', methods=['GET'])
+@conditional('publishers')
+@cached_json('publishers')
 def get_publishers():
-    """Get all publishers or a specific publisher by PublisherId"""
+    """Get a page of publishers or a specific publisher by PublisherId"""
     try:
         publisher_id = request.args.get('publisher_id')
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur = conn.cursor(cursor_factory=RealDictCursor)
         
-        if publisher_id:
-            cur.execute('SELECT * FROM Publisher WHERE PublisherId = %s', (publisher_id,))
-            publisher = cur.fetchone()
-            cur.close()
-            conn.close()
-            
-            if not publisher:
-                return jsonify({'success': False, 'message': 'Publisher not found'}), 404
+            if publisher_id:
+                cur.execute('SELECT * FROM Publisher WHERE PublisherId = %s', (publisher_id,))
+                publisher = cur.fetchone()
+                cur.close()
             
-            return jsonify({'success': True, 'publisher': publisher}), 200
-        else:
-            cur.execute('SELECT * FROM Publisher')
-            publishers = cur.fetchall()
-            cur.close()
-            conn.close()
+                if not publisher:
+                    return jsonify({'success': False, 'message': 'Publisher not found'}), 404
             
-            return jsonify({'success': True, 'count': len(publishers), 'publishers': publishers}), 200
+                return jsonify({'success': True, 'publisher': publisher}), 200
+            else:
+                publishers, next_cursor, total = fetch_page(cur, PUBLISHER_LIST_SPEC, request.args)
+                cur.close()
             
+                return jsonify(page_body('publishers', publishers, next_cursor, total)), 200
+    
+    except QueryParamError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Get publishers error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -302,24 +359,24 @@ def create_publisher():
         if not data or not data.get('PublisherName'):
             return jsonify({'success': False, 'message': 'PublisherName is required'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor()
+            cur = conn.cursor()
         
-        cur.execute('''
-            INSERT INTO Publisher (PublisherName)
-            VALUES (%s)
-            RETURNING PublisherId
-        ''', (data['PublisherName'],))
+            cur.execute('''
+                INSERT INTO Publisher (PublisherName)
+                VALUES (%s)
+                RETURNING PublisherId
+            ''', (data['PublisherName'],))
         
-        publisher_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
+            publisher_id = cur.fetchone()[0]
+            conn.commit()
+            cur.close()
+            tables_changed('publishers')
         
-        return jsonify({'success': True, 'message': 'Publisher created successfully', 'publisher_id': publisher_id}), 201
+            return jsonify({'success': True, 'message': 'Publisher created successfully', 'publisher_id': publisher_id}), 201
         
     except Exception as e:
         print(f"Create publisher error: {e}")
@@ -333,30 +390,29 @@ def update_publisher(publisher_id):
         if not data or not data.get('PublisherName'):
             return jsonify({'success': False, 'message': 'PublisherName is required'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor()
+            cur = conn.cursor()
         
-        cur.execute('SELECT PublisherId FROM Publisher WHERE PublisherId = %s', (publisher_id,))
-        if not cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'Publisher not found'}), 404
+            cur.execute('SELECT PublisherId FROM Publisher WHERE PublisherId = %s', (publisher_id,))
+            if not cur.fetchone():
+                cur.close()
+                return jsonify({'success': False, 'message': 'Publisher not found'}), 404
         
-        cur.execute('''
-            UPDATE Publisher SET PublisherName = %s
-            WHERE PublisherId = %s
-            RETURNING PublisherId
-        ''', (data['PublisherName'], publisher_id))
+            cur.execute('''
+                UPDATE Publisher SET PublisherName = %s
+                WHERE PublisherId = %s
+                RETURNING PublisherId
+            ''', (data['PublisherName'], publisher_id))
         
-        updated_publisher_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
+            updated_publisher_id = cur.fetchone()[0]
+            conn.commit()
+            cur.close()
+            tables_changed('publishers')
         
-        return jsonify({'success': True, 'message': 'Publisher updated successfully', 'publisher_id': updated_publisher_id}), 200
+            return jsonify({'success': True, 'message': 'Publisher updated successfully', 'publisher_id': updated_publisher_id}), 200
         
     except Exception as e:
         print(f"Update publisher error: {e}")
@@ -364,57 +420,82 @@ def update_publisher(publisher_id):
 
 # ===================================BOOKS TABLE CRUD===================================
 
+BOOK_LIST_SPEC = {
+    'table': 'Books',
+    'key': 'bookid',
+    'columns': ['bookid', 'name', 'authorid', 'category', 'genre', 'publisherid', 'publishdate',
+                'language', 'pagecount', 'copiesavailable', 'imglink', 'cover_hash', 'ratedtype',
+                'description', 'review_count', 'average_rating'],
+    'sorts': {'bookid', 'name', 'publishdate', 'pagecount', 'copiesavailable', 'review_count', 'average_rating'},
+    'default_sort': 'bookid',
+    'filters': {
+        'ids': ('bookid = ANY(%s)', id_list(int)),
+        'category': ('category = %s', str),
+        'genre': ('genre = %s', str),
+        'language': ('language = %s', str),
+        'ratedType': ('ratedtype = %s', str),
+        'author_id': ('authorid = %s', int),
+        'publisher_id': ('publisherid = %s', int),
+        'min_rating': ('average_rating >= %s', float),
+        'min_reviews': ('review_count >= %s', int),
+        'author': ('authorid IN (SELECT AuthorId FROM Author WHERE LOWER(AuthorName) = LOWER(%s))', str),
+        'publisher': ('publisherid IN (SELECT PublisherId FROM Publisher WHERE LOWER(PublisherName) = LOWER(%s))', str)
+    }
+}
+
 @crud_bp.route('/api/books', methods=['GET'])
+@conditional('books', 'authors', 'publishers')
+@cached_json('books', 'authors', 'publishers')
 def get_books():
-    """Get all books or a specific book by BookId"""
+    """Get a page of books (filtered, sorted, projected) or a specific book by BookId"""
     try:
         book_id = request.args.get('book_id')
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur = conn.cursor(cursor_factory=RealDictCursor)
         
-        if book_id:
-            cur.execute('SELECT * FROM Books WHERE BookId = %s', (book_id,))
-            book = cur.fetchone()
-            cur.close()
-            conn.close()
-            
-            if not book:
-                return jsonify({'success': False, 'message': 'Book not found'}), 404
+            if book_id:
+                cur.execute(f"SELECT {', '.join(BOOK_LIST_SPEC['columns'])} FROM Books WHERE BookId = %s", (book_id,))
+                book = cur.fetchone()
+                cur.close()
             
-            return jsonify({'success': True, 'book': book}), 200
-        else:
-            cur.execute('SELECT * FROM Books')
-            books = cur.fetchall()
-            cur.close()
-            conn.close()
+                if not book:
+                    return jsonify({'success': False, 'message': 'Book not found'}), 404
             
-            return jsonify({'success': True, 'count': len(books), 'books': books}), 200
+                return jsonify({'success': True, 'book': book}), 200
+            else:
+                books, next_cursor, total = fetch_page(cur, BOOK_LIST_SPEC, request.args)
+                cur.close()
             
+                return jsonify(page_body('books', books, next_cursor, total)), 200
+    
+    except QueryParamError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Get books error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @crud_bp.route('/api/books/categories', methods=['GET'])
+@conditional('books')
+@cached_json('books')
 def get_book_categories():
     """Get all distinct book categories"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur = conn.cursor(cursor_factory=RealDictCursor)
         
-        cur.execute('SELECT DISTINCT category FROM Books ORDER BY category')
-        categories = cur.fetchall()
-        cur.close()
-        conn.close()
+            cur.execute('SELECT DISTINCT category FROM Books ORDER BY category')
+            categories = cur.fetchall()
+            cur.close()
         
-        category_list = [cat['category'] for cat in categories]
+            category_list = [cat['category'] for cat in categories]
         
-        return jsonify({'success': True, 'count': len(category_list), 'categories': category_list}), 200
+            return jsonify({'success': True, 'count': len(category_list), 'categories': category_list}), 200
         
     except Exception as e:
         print(f"Get book categories error: {e}")
@@ -422,31 +503,152 @@ def get_book_categories():
 
 @crud_bp.route('/api/books/search', methods=['GET'])
 def search_books_by_name():
-    """Search for books by name"""
+    """Relevance-ranked, typo-tolerant search over book name, author, publisher, genre and description"""
     try:
-        book_name = request.args.get('name')
+        book_name = (request.args.get('name') or request.args.get('q') or '').strip()
         
         if not book_name:
             return jsonify({'success': False, 'message': 'Book name is required'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur = conn.cursor(cursor_factory=RealDictCursor)
         
-        cur.execute('SELECT * FROM Books WHERE Name ILIKE %s ORDER BY Name', (f'%{book_name}%',))
-        books = cur.fetchall()
-        cur.close()
-        conn.close()
+            books, next_cursor = search_books(cur, book_name, request.args)
+            cur.close()
         
-        if not books:
-            return jsonify({'success': True, 'count': 0, 'books': []}), 200
+            return jsonify(page_body('books', books, next_cursor)), 200
+    
+    except QueryParamError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Search books by name error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@crud_bp.route('/api/books/suggest', methods=['GET'])
+def suggest_books():
+    """Search-as-you-type suggestions for book titles and author names, served from memory"""
+    try:
+        prefix = request.args.get('q') or request.args.get('name') or ''
+        
+        try:
+            limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'limit must be an integer'}), 400
         
-        return jsonify({'success': True, 'count': len(books), 'books': books}), 200
+        if not ensure_loaded():
+            if suggestion_index.loading:
+                response = jsonify({'success': False, 'message': 'Suggestions are still loading, try again shortly'})
+                response.headers['Retry-After'] = '1'
+                return response, 503
+            return db_unavailable()
+        
+        suggestions = suggestion_index.suggest(prefix, limit)
+        return jsonify({'success': True, 'count': len(suggestions), 'suggestions': suggestions}), 200
         
     except Exception as e:
-        print(f"Search books by name error: {e}")
+        print(f"Suggest books error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+# Book, author, publisher, rating aggregates and the caller's own booking,
+# reservation and review in one round trip. Every LATERAL branch is an
+# index lookup on BookId (plus UserId), so the cost does not grow with the
+# size of the catalogue.
+BOOK_DETAIL_QUERY = '''
+    SELECT {columns},
+        a.AuthorName AS authorname, a.AuthorBio AS authorbio,
+        p.PublisherName AS publishername, b.rating_histogram,
+        ub.BookingId AS user_booking_bookingid, ub.BookingDate AS user_booking_bookingdate,
+        ub.dueDate AS user_booking_duedate,
+        ub.CurrentlyBookedIndicator AS user_booking_currentlybookedindicator,
+        ub.pendingReturnIndicator AS user_booking_pendingreturnindicator,
+        ur.ReservationId AS user_reservation_reservationid,
+        ur.ReservationDate AS user_reservation_reservationdate,
+        ur.HoldExpiresAt AS user_reservation_holdexpiresat, ur.position AS user_reservation_position,
+        uv.Rating AS user_review_rating, uv.ReviewDate AS user_review_reviewdate,
+        uv.ReviewDescription AS user_review_reviewdescription
+    FROM Books b
+    JOIN Author a ON a.AuthorId = b.authorID
+    LEFT JOIN Publisher p ON p.PublisherId = b.publisherID
+    LEFT JOIN LATERAL (
+        SELECT * FROM Bookings
+        WHERE BookId = b.BookId AND UserId = %(user_id)s
+        ORDER BY CurrentlyBookedIndicator DESC, pendingReturnIndicator DESC, BookingId DESC
+        LIMIT 1
+    ) ub ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT r.*, ({position}) AS position FROM Reservations r
+        WHERE r.BookId = b.BookId AND r.UserId = %(user_id)s
+        ORDER BY r.ReservationId
+        LIMIT 1
+    ) ur ON TRUE
+    LEFT JOIN Reviews uv ON uv.BookID = b.BookId AND uv.UserId = %(user_id)s
+    WHERE b.BookId = %(book_id)s
+'''
+
+
+def rating_summary(row):
+    """Rating figures for a book from its maintained ``review_count``/``average_rating``/``rating_histogram`` columns."""
+    histogram = row['rating_histogram'] or [0] * 5
+    stars = [star for star, count in enumerate(histogram, 1) if count]
+    return {
+        'review_count': row['review_count'],
+        'average_rating': row['average_rating'] if row['review_count'] else None,
+        'min_rating': stars[0] if stars else None,
+        'max_rating': stars[-1] if stars else None,
+        'histogram': {str(star): count for star, count in enumerate(histogram, 1)}
+    }
+
+
+def _prefixed(row, prefix):
+    """Pull the ``<prefix>*`` columns of a joined row into their own dict, or None if the join found nothing."""
+    values = {key[len(prefix):]: value for key, value in row.items() if key.startswith(prefix)}
+    return values if any(value is not None for value in values.values()) else None
+
+
+@crud_bp.route('/api/books/<int:book_id>/detail', methods=['GET'])
+def get_book_detail(book_id):
+    """Get everything the book details page shows, including the caller's own state, in one query"""
+    try:
+        user_id = request.args.get('user_id')
+        
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
+        
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+        
+            columns = ', '.join(f'b.{column}' for column in BOOK_LIST_SPEC['columns'])
+            cur.execute(BOOK_DETAIL_QUERY.format(columns=columns, position=QUEUE_POSITION), {'book_id': book_id, 'user_id': user_id})
+            row = cur.fetchone()
+            cur.close()
+        
+        if not row:
+            return jsonify({'success': False, 'message': 'Book not found'}), 404
+        
+        body = {
+            'success': True,
+            'book': {column: row[column] for column in BOOK_LIST_SPEC['columns']},
+            'author': {'authorid': row['authorid'], 'authorname': row['authorname'], 'authorbio': row['authorbio']},
+            'publisher': {'publisherid': row['publisherid'], 'publishername': row['publishername']} if row['publisherid'] else None,
+            'rating': rating_summary(row)
+        }
+        if user_id:
+            body['user'] = {
+                'user_id': user_id,
+                'booking': _prefixed(row, 'user_booking_'),
+                'reservation': _prefixed(row, 'user_reservation_'),
+                'review': _prefixed(row, 'user_review_')
+            }
+        
+        return jsonify(body), 200
+        
+    except Exception as e:
+        print(f"Get book detail error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
@@ -475,85 +677,120 @@ def create_book():
             if field not in data:
                 return jsonify({'success': False, 'message': f'{field} is required'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        cover_fields(data)
+        
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor()
+            cur = conn.cursor()
 
-        author_name = data.get('AuthorName') or data.get('authorName')
-        author_bio = data.get('AuthorBio')
+            author_name = data.get('AuthorName') or data.get('authorName')
+            author_bio = data.get('AuthorBio')
 
-        if not author_name:
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'AuthorName is required'}), 400
+            if not author_name:
+                cur.close()
+                return jsonify({'success': False, 'message': 'AuthorName is required'}), 400
 
-        cur.execute('SELECT AuthorId FROM Author WHERE LOWER(AuthorName) = LOWER(%s)', (author_name,))
-        existing_author = cur.fetchone()
-        if existing_author:
-            author_id = existing_author[0]
-        else:
-            cur.execute('''
-                INSERT INTO Author (AuthorName, AuthorBio)
-                VALUES (%s, %s)
-                RETURNING AuthorId
-            ''', (author_name, author_bio))
-            author_id = cur.fetchone()[0]
+            cur.execute('SELECT AuthorId FROM Author WHERE LOWER(AuthorName) = LOWER(%s)', (author_name,))
+            existing_author = cur.fetchone()
+            author_created = not existing_author
+            if existing_author:
+                author_id = existing_author[0]
+            else:
+                cur.execute('''
+                    INSERT INTO Author (AuthorName, AuthorBio)
+                    VALUES (%s, %s)
+                    RETURNING AuthorId
+                ''', (author_name, author_bio))
+                author_id = cur.fetchone()[0]
 
-        publisher_name = data.get('PublisherName') or data.get('publisherName')
+            publisher_name = data.get('PublisherName') or data.get('publisherName')
 
-        if not publisher_name:
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'PublisherName is required'}), 400
+            if not publisher_name:
+                cur.close()
+                return jsonify({'success': False, 'message': 'PublisherName is required'}), 400
 
-        cur.execute('SELECT PublisherId FROM Publisher WHERE LOWER(PublisherName) = LOWER(%s)', (publisher_name,))
-        existing_publisher = cur.fetchone()
-        if existing_publisher:
-            publisher_id = existing_publisher[0]
-        else:
-            cur.execute('''
-                INSERT INTO Publisher (PublisherName)
-                VALUES (%s)
-                RETURNING PublisherId
-            ''', (publisher_name,))
-            publisher_id = cur.fetchone()[0]
+            cur.execute('SELECT PublisherId FROM Publisher WHERE LOWER(PublisherName) = LOWER(%s)', (publisher_name,))
+            existing_publisher = cur.fetchone()
+            if existing_publisher:
+                publisher_id = existing_publisher[0]
+            else:
+                cur.execute('''
+                    INSERT INTO Publisher (PublisherName)
+                    VALUES (%s)
+                    RETURNING PublisherId
+                ''', (publisher_name,))
+                publisher_id = cur.fetchone()[0]
 
-        publish_date = data['publishdate']
-        if isinstance(publish_date, str):
-            publish_date = datetime.strptime(publish_date, '%Y-%m-%d').date()
-        
-        cur.execute('''
-            INSERT INTO Books (Name, authorID, category, genre, publisherID, publishdate, language, pagecount, copiesavailable, imglink, ratedType, description)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING BookId
-        ''', (
-            data['Name'],
-            author_id,
-            data['category'],
-            data['genre'],
-            publisher_id,
-            publish_date,
-            data['language'],
-            data['pagecount'],
-            data['copiesavailable'],
-            data.get('imglink'),
-            data['ratedType'],
-            data.get('description')
-        ))
-        
-        book_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'message': 'Book created successfully', 'book_id': book_id}), 201
+            publish_date = data['publishdate']
+            if isinstance(publish_date, str):
+                publish_date = datetime.strptime(publish_date, '%Y-%m-%d').date()
+        
+            cur.execute('''
+                INSERT INTO Books (Name, authorID, category, genre, publisherID, publishdate, language, pagecount, copiesavailable, imglink, cover_hash, ratedType, description)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING BookId
+            ''', (
+                data['Name'],
+                author_id,
+                data['category'],
+                data['genre'],
+                publisher_id,
+                publish_date,
+                data['language'],
+                data['pagecount'],
+                data['copiesavailable'],
+                data.get('imglink'),
+                data.get('cover_hash'),
+                data['ratedType'],
+                data.get('description')
+            ))
+        
+            book_id = cur.fetchone()[0]
+            conn.commit()
+            cur.close()
+            tables_changed('books', 'authors', 'publishers')
+            suggestion_index.upsert('book', book_id, data['Name'])
+            if author_created:
+                suggestion_index.upsert('author', author_id, author_name)
         
+            return jsonify({'success': True, 'message': 'Book created successfully', 'book_id': book_id}), 201
+        
+    except ImageError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Create book error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@crud_bp.route('/api/books/import', methods=['POST'])
+def import_books_bulk():
+    """Create or update many books from a CSV or NDJSON request body"""
+    try:
+        import_format = request.args.get('format')
+        if import_format is None:
+            import_format = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+        if import_format not in ('csv', 'ndjson'):
+            return jsonify({'success': False, 'message': 'format must be csv or ndjson'}), 400
+        
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
+        
+            # Read the body as it arrives rather than buffering the whole upload
+            stream = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+            report = import_books(conn, read_rows(stream, import_format))
+        
+        if report['inserted'] or report['updated'] or report['authors_created'] or report['publishers_created']:
+            # Every worker's suggestion index follows through SUGGESTION_CHANNEL
+            tables_changed('books', 'authors', 'publishers')
+        
+        return jsonify({'success': True, **report}), 200
+        
+    except Exception as e:
+        print(f"Import books error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @crud_bp.route('/api/books/<int:book_id>', methods=['PUT'])
 def update_book(book_id):
     """Update an existing book"""
@@ -562,113 +799,249 @@ def update_book(book_id):
         if not data:
             return jsonify({'success': False, 'message': 'No data provided'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        cover_fields(data)
         
-        cur = conn.cursor()
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur.execute('SELECT BookId FROM Books WHERE BookId = %s', (book_id,))
-        if not cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'Book not found'}), 404
+            cur = conn.cursor()
         
-        update_fields = []
-        values = []
+            cur.execute('SELECT BookId FROM Books WHERE BookId = %s', (book_id,))
+            if not cur.fetchone():
+                cur.close()
+                return jsonify({'success': False, 'message': 'Book not found'}), 404
         
-        allowed_fields = ['Name', 'authorID', 'category', 'genre', 'publisherID', 'publishdate', 
-                         'language', 'pagecount', 'copiesavailable', 'imglink', 'ratedType', 'description']
+            update_fields = []
+            values = []
         
-        for field in allowed_fields:
-            if field in data:
-                if field == 'publishdate' and isinstance(data[field], str):
-                    update_fields.append(f"{field} = %s")
-                    values.append(datetime.strptime(data[field], '%Y-%m-%d').date())
-                else:
-                    update_fields.append(f"{field} = %s")
-                    values.append(data[field])
+            allowed_fields = ['Name', 'authorID', 'category', 'genre', 'publisherID', 'publishdate', 
+                             'language', 'pagecount', 'copiesavailable', 'imglink', 'cover_hash', 'ratedType', 'description']
         
-        if not update_fields:
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'No valid fields to update'}), 400
+            for field in allowed_fields:
+                if field in data:
+                    if field == 'publishdate' and isinstance(data[field], str):
+                        update_fields.append(f"{field} = %s")
+                        values.append(datetime.strptime(data[field], '%Y-%m-%d').date())
+                    else:
+                        update_fields.append(f"{field} = %s")
+                        values.append(data[field])
+        
+            if not update_fields:
+                cur.close()
+                return jsonify({'success': False, 'message': 'No valid fields to update'}), 400
         
-        values.append(book_id)
-        query = f"UPDATE Books SET {', '.join(update_fields)} WHERE BookId = %s RETURNING BookId"
+            values.append(book_id)
+            query = f"UPDATE Books SET {', '.join(update_fields)} WHERE BookId = %s RETURNING BookId"
         
-        cur.execute(query, values)
-        updated_book_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
+            cur.execute(query, values)
+            updated_book_id = cur.fetchone()[0]
+            conn.commit()
+            cur.close()
+            tables_changed('books')
+            if 'Name' in data:
+                suggestion_index.upsert('book', updated_book_id, data['Name'])
         
-        return jsonify({'success': True, 'message': 'Book updated successfully', 'book_id': updated_book_id}), 200
+            return jsonify({'success': True, 'message': 'Book updated successfully', 'book_id': updated_book_id}), 200
         
+    except ImageError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Update book error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+# ===========================================COVER IMAGES===========================================
+
+# A digest always names the same bytes, so browsers and CDNs may keep images forever
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+def image_urls(digest):
+    return {'url': f'/api/images/{digest}', 'thumbnail_url': f'/api/images/{digest}/thumb'}
+
+def send_image(digest, path, mimetype):
+    # conditional=True answers Range and If-None-Match requests, and the file is
+    # handed to the server's wsgi.file_wrapper (sendfile under gunicorn)
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=digest, max_age=31536000)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+@crud_bp.route('/api/images', methods=['POST'])
+def upload_image():
+    """Store a cover image sent as multipart field 'file' or as the raw request body"""
+    try:
+        upload = request.files.get('file')
+        stream = upload.stream if upload else request.stream
+        data = stream.read(MAX_IMAGE_BYTES + 1)
+        if not data:
+            return jsonify({'success': False, 'message': 'Image data is required'}), 400
+        
+        digest, created = store_image(data)
+        return jsonify({'success': True, 'hash': digest, **image_urls(digest)}), 201 if created else 200
+        
+    except UnsupportedImageType as e:
+        return jsonify({'success': False, 'message': str(e)}), 415
+    except ImageError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Upload image error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@crud_bp.route('/api/images/<digest>', methods=['GET'])
+def get_image(digest):
+    """Serve a stored cover image by its SHA-256"""
+    try:
+        if not is_digest(digest) or not os.path.exists(image_path(digest)):
+            return jsonify({'success': False, 'message': 'Image not found'}), 404
+        
+        path = image_path(digest)
+        with open(path, 'rb') as f:
+            mimetype = sniff_mimetype(f.read(16))
+        return send_image(digest, path, mimetype)
+        
+    except Exception as e:
+        print(f"Get image error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@crud_bp.route('/api/images/<digest>/thumb', methods=['GET'])
+def get_image_thumbnail(digest):
+    """Serve the thumbnail of a stored cover, falling back to the full image if none can be made"""
+    try:
+        if not is_digest(digest) or not os.path.exists(image_path(digest)):
+            return jsonify({'success': False, 'message': 'Image not found'}), 404
+        
+        path = image_path(digest, thumbnail=True)
+        # Images stored before Pillow was available get their thumbnail on first request
+        if os.path.exists(path) or make_thumbnail(digest):
+            return send_image(f'{digest}-thumb', path, 'image/jpeg')
+        return get_image(digest)
+        
+    except Exception as e:
+        print(f"Get image thumbnail error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 # ============================================BOOKINGS TABLE CRUD============================================
 
+BOOKING_LIST_SPEC = {
+    'table': 'Bookings',
+    'key': 'bookingid',
+    'columns': ['bookingid', 'userid', 'bookid', 'bookingdate', 'duedate',
+                'currentlybookedindicator', 'pendingreturnindicator'],
+    'sorts': {'bookingid', 'bookingdate', 'duedate'},
+    'default_sort': 'bookingid',
+    'filters': {
+        'user_id': ('userid = %s', str),
+        'book_id': ('bookid = %s', int),
+        'pending': ('pendingreturnindicator = %s', parse_bool)
+    }
+}
+
+# include_names=1 lists bookings with the borrower's username and the book's
+# name joined in. The joins sit in a derived table so filters, sort and
+# keyset cursors work unchanged; the planner flattens it and still drives
+# the scan from the Bookings indexes.
+BOOKING_NAMED_SPEC = dict(
+    BOOKING_LIST_SPEC,
+    table='''(SELECT bk.*, u.Username AS username, b.Name AS bookname
+              FROM Bookings bk
+              JOIN Users u ON u.UserId = bk.UserId
+              JOIN Books b ON b.BookId = bk.BookId) AS bookings''',
+    columns=BOOKING_LIST_SPEC['columns'] + ['username', 'bookname']
+)
+
 @crud_bp.route('/api/bookings', methods=['GET'])
+@conditional('bookings', 'users', 'books', cache_control='private, no-cache')
 def get_bookings():
-    """Get all bookings or a specific booking by BookingId"""
+    """Get a page of bookings (optionally filtered, optionally with user and book names) or a specific booking by BookingId"""
     try:
         booking_id = request.args.get('booking_id')
-        user_id = request.args.get('user_id')
-        book_id = request.args.get('book_id')
-        pending = request.args.get('pending')
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+            cur = conn.cursor(cursor_factory=RealDictCursor)
         
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        if booking_id:
-            cur.execute('SELECT * FROM Bookings WHERE BookingId = %s', (booking_id,))
-            booking = cur.fetchone()
-            cur.close()
-            conn.close()
-            
-            if not booking:
-                return jsonify({'success': False, 'message': 'Booking not found'}), 404
+            if booking_id:
+                cur.execute('SELECT * FROM Bookings WHERE BookingId = %s', (booking_id,))
+                booking = cur.fetchone()
+                cur.close()
             
-            return jsonify({'success': True, 'booking': booking}), 200
-        elif user_id:
-            cur.execute('SELECT * FROM Bookings WHERE UserId = %s', (user_id,))
-            bookings = cur.fetchall()
-            cur.close()
-            conn.close()
-            return jsonify({'success': True, 'count': len(bookings), 'bookings': bookings}), 200
-        elif book_id:
-            cur.execute('SELECT * FROM Bookings WHERE BookId = %s', (book_id,))
-            bookings = cur.fetchall()
-            cur.close()
-            conn.close()
-            return jsonify({'success': True, 'count': len(bookings), 'bookings': bookings}), 200
-        elif pending and pending in ['1', 'true', 'True']:
-            cur.execute('SELECT * FROM Bookings WHERE pendingReturnIndicator = TRUE')
-            bookings = cur.fetchall()
-            cur.close()
-            conn.close()
-            return jsonify({'success': True, 'count': len(bookings), 'bookings': bookings}), 200
-        else:
-            cur.execute('SELECT * FROM Bookings')
-            bookings = cur.fetchall()
-            cur.close()
-            conn.close()
+                if not booking:
+                    return jsonify({'success': False, 'message': 'Booking not found'}), 404
             
-            return jsonify({'success': True, 'count': len(bookings), 'bookings': bookings}), 200
+                return jsonify({'success': True, 'booking': booking}), 200
+            else:
+                spec = BOOKING_NAMED_SPEC if parse_flag(request.args, 'include_names') else BOOKING_LIST_SPEC
+                bookings, next_cursor, total = fetch_page(cur, spec, request.args)
+                cur.close()
             
+                return jsonify(page_body('bookings', bookings, next_cursor, total)), 200
+    
+    except QueryParamError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Get bookings error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@crud_bp.route('/api/bookings/events', methods=['GET'])
+def stream_booking_events():
+    """Stream booking changes (new booking, return requested/approved, new reservation) as server-sent events"""
+    try:
+        subscriber = broker.subscribe()
+    except TooManyClients:
+        response = jsonify({'success': False, 'message': 'Too many open event streams, try again later'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+
+    response = Response(stream_with_context(event_stream(subscriber, request.args.get('user_id'))), mimetype='text/event-stream')
+    # Also covers a client that leaves before the generator has started
+    response.call_on_close(lambda: broker.unsubscribe(subscriber))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Checks out one copy: the one held for the user if their reservation has a
+# live hold, otherwise one off the shelf. Records the booking and, if the user
+# had reserved the title, consumes the reservation and logs it. A reservation
+# whose hold has run out but not been swept yet is left alone: its copy is
+# still counted as held, and only expire_reservation_holds() passes it on. The
+# conditional UPDATE is the availability check: concurrent checkouts of the
+# same title queue on the Books row lock and each re-tests copiesavailable > 0
+# once it gets it, so the last copy can only be taken once. When no copy is
+# left nothing is written and no row is returned.
+CHECKOUT_QUERY = '''
+    WITH hold AS (
+        SELECT BookId FROM Reservations
+        WHERE UserId = %(user_id)s AND BookId = %(book_id)s AND HoldExpiresAt > LOCALTIMESTAMP
+        LIMIT 1
+        FOR UPDATE
+    ), taken AS (
+        UPDATE Books SET copiesavailable = copiesavailable - 1
+        WHERE BookId = %(book_id)s AND copiesavailable > 0 AND NOT EXISTS (SELECT 1 FROM hold)
+        RETURNING BookId
+    ), copy AS (
+        SELECT BookId FROM hold
+        UNION ALL
+        SELECT BookId FROM taken
+    ), booked AS (
+        INSERT INTO Bookings (UserId, BookId, BookingDate, dueDate, CurrentlyBookedIndicator, pendingReturnIndicator)
+        SELECT %(user_id)s, BookId, %(booking_date)s, %(due_date)s, TRUE, FALSE
+        FROM copy
+        RETURNING BookingId
+    ), reserved AS (
+        DELETE FROM Reservations
+        WHERE UserId = %(user_id)s AND BookId IN (SELECT BookId FROM copy)
+          AND (HoldExpiresAt IS NULL OR HoldExpiresAt > LOCALTIMESTAMP)
+        RETURNING UserId, BookId
+    ), logged AS (
+        INSERT INTO TransactionHistory (UserId, BookId, TransactionDate, ReservedIndicator)
+        SELECT DISTINCT UserId, BookId, %(transaction_date)s, TRUE FROM reserved
+    )
+    SELECT BookingId FROM booked
+'''
+
 @crud_bp.route('/api/bookings', methods=['POST'])
 def create_booking():
-    """Create a new booking"""
+    """Check out a copy of a book, consuming the user's reservation for it if there is one"""
     try:
         data = request.get_json()
         required_fields = ['UserId', 'BookId', 'dueDate']
@@ -677,132 +1050,155 @@ def create_booking():
             if field not in data:
                 return jsonify({'success': False, 'message': f'{field} is required'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
-        
-        cur = conn.cursor()
-        
-        due_date = data['dueDate']
-        if isinstance(due_date, str):
-            due_date = datetime.strptime(due_date, '%Y-%m-%d %H:%M:%S')
-        
-        booking_date = data.get('BookingDate', datetime.now())
-        if isinstance(booking_date, str):
-            booking_date = datetime.strptime(booking_date, '%Y-%m-%d %H:%M:%S')
-        
-        cur.execute('''
-            INSERT INTO Bookings (UserId, BookId, BookingDate, dueDate, CurrentlyBookedIndicator, pendingReturnIndicator)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            RETURNING BookingId
-        ''', (
-            data['UserId'],
-            data['BookId'],
-            booking_date,
-            due_date,
-            data.get('CurrentlyBookedIndicator', True),
-            data.get('pendingReturnIndicator', False)
-        ))
-        
-        booking_id = cur.fetchone()[0]
-        # Side-effects: if a reservation exists for this user/book, delete it and log a reserved transaction
-        cur.execute('SELECT ReservationId FROM Reservations WHERE UserId = %s AND BookId = %s', (data['UserId'], data['BookId']))
-        res = cur.fetchone()
-        if res:
-            cur.execute('DELETE FROM Reservations WHERE ReservationId = %s', (res[0],))
-            cur.execute('''
-                INSERT INTO TransactionHistory (UserId, BookId, TransactionDate, ReservedIndicator)
-                VALUES (%s, %s, %s, %s)
-            ''', (data['UserId'], data['BookId'], datetime.now(), True))
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
+        
+            cur = conn.cursor()
+        
+            due_date = data['dueDate']
+            if isinstance(due_date, str):
+                due_date = datetime.strptime(due_date, '%Y-%m-%d %H:%M:%S')
+        
+            booking_date = data.get('BookingDate', datetime.now())
+            if isinstance(booking_date, str):
+                booking_date = datetime.strptime(booking_date, '%Y-%m-%d %H:%M:%S')
+        
+            cur.execute(CHECKOUT_QUERY, {
+                'user_id': data['UserId'],
+                'book_id': data['BookId'],
+                'booking_date': booking_date,
+                'due_date': due_date,
+                'transaction_date': datetime.now()
+            })
+            row = cur.fetchone()
+            if not row:
+                cur.execute('SELECT 1 FROM Books WHERE BookId = %s', (data['BookId'],))
+                found = cur.fetchone()
+                cur.close()
+                if not found:
+                    return jsonify({'success': False, 'message': 'Book not found'}), 404
+                return jsonify({'success': False, 'message': 'No copies available'}), 409
         
-        return jsonify({'success': True, 'message': 'Booking created successfully', 'booking_id': booking_id}), 201
+            booking_id = row[0]
+            notify_booking_event(cur, 'booking_created', booking_id, data['UserId'], data['BookId'])
+            conn.commit()
+            cur.close()
+            tables_changed('bookings', 'books')
+        
+            return jsonify({'success': True, 'message': 'Booking created successfully', 'booking_id': booking_id}), 201
         
     except Exception as e:
         print(f"Create booking error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+# Completes an approved return: the booking with a pending return moves to
+# TransactionHistory and allocate_returned_copy() either holds the copy for
+# the next reserver in line or puts it back on the shelf. The increment is
+# computed by Postgres under the Books row lock, so concurrent returns of the
+# same title cannot lose one. Data-modifying CTEs always run, whether or not
+# the outer query reads them.
+RETURN_APPROVAL_QUERY = '''
+    WITH returned AS (
+        DELETE FROM Bookings
+        WHERE BookingId = %(booking_id)s AND pendingReturnIndicator
+        RETURNING UserId, BookId
+    ), logged AS (
+        INSERT INTO TransactionHistory (UserId, BookId, TransactionDate, ReservedIndicator)
+        SELECT UserId, BookId, %(transaction_date)s, FALSE FROM returned
+    )
+    SELECT UserId, BookId, allocate_returned_copy(BookId, %(hold_for)s) FROM returned
+'''
+
+# Every booking holds the copy its checkout took off the shelf, so deleting
+# one releases that copy the way a return does, without logging a
+# transaction. Rows written before checkout set CurrentlyBookedIndicator on
+# every booking may have only pendingReturnIndicator set; they hold a copy too.
+BOOKING_DELETE_QUERY = '''
+    WITH deleted AS (
+        DELETE FROM Bookings
+        WHERE BookingId = %(booking_id)s
+        RETURNING BookingId, UserId, BookId, CurrentlyBookedIndicator OR pendingReturnIndicator AS holds_copy
+    )
+    SELECT BookingId, UserId, BookId, holds_copy,
+        CASE WHEN holds_copy THEN allocate_returned_copy(BookId, %(hold_for)s) END
+    FROM deleted
+'''
+
 @crud_bp.route('/api/bookings/<int:booking_id>', methods=['PUT'])
 def update_booking(booking_id):
-    """Update an existing booking"""
+    """Update a booking, request its return, or approve a requested return"""
     try:
         data = request.get_json()
         if not data:
             return jsonify({'success': False, 'message': 'No data provided'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
-        
-        cur = conn.cursor()
-        
-        cur.execute('SELECT BookingId FROM Bookings WHERE BookingId = %s', (booking_id,))
-        if not cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'Booking not found'}), 404
-        
-        update_fields = []
-        values = []
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
+        
+            cur = conn.cursor()
+        
+            # Clearing pendingReturnIndicator on a booking with a pending return
+            # approves it: restock, log and delete in one statement. The DELETE
+            # locks the booking row until commit, so a concurrent approval of the
+            # same booking waits and then finds it gone.
+            if 'pendingReturnIndicator' in data and not data['pendingReturnIndicator']:
+                cur.execute(RETURN_APPROVAL_QUERY, {
+                    'booking_id': booking_id,
+                    'transaction_date': datetime.now(),
+                    'hold_for': RESERVATION_HOLD
+                })
+                returned = cur.fetchone()
+                if returned:
+                    uid, bid, held_for = returned
+                    notify_booking_event(cur, 'return_approved', booking_id, uid, bid)
+                    notify_hold(cur, bid, held_for)
+                    conn.commit()
+                    cur.close()
+                    tables_changed('bookings', 'books')
+                    print(f"Return completed: Booking {booking_id} moved to history and deleted")
+                    return jsonify({'success': True, 'message': 'Booking updated successfully', 'booking_id': booking_id}), 200
+        
+            update_fields = []
+            values = []
+        
+            # CurrentlyBookedIndicator and BookId are not writable: the copy a
+            # booking holds is only taken by checkout and only released by an
+            # approved return or a delete, which keep copiesavailable in step
+            allowed_fields = ['UserId', 'BookingDate', 'dueDate', 'pendingReturnIndicator']
+        
+            for field in allowed_fields:
+                if field in data:
+                    if field in ['BookingDate', 'dueDate'] and isinstance(data[field], str):
+                        update_fields.append(f"{field} = %s")
+                        values.append(datetime.strptime(data[field], '%Y-%m-%d %H:%M:%S'))
+                    else:
+                        update_fields.append(f"{field} = %s")
+                        values.append(data[field])
+        
+            if not update_fields:
+                cur.close()
+                return jsonify({'success': False, 'message': 'No valid fields to update'}), 400
         
-        allowed_fields = ['UserId', 'BookId', 'BookingDate', 'dueDate', 'CurrentlyBookedIndicator', 'pendingReturnIndicator']
+            values.append(booking_id)
+            query = f"""UPDATE Bookings SET {', '.join(update_fields)} WHERE BookingId = %s
+                RETURNING BookingId, UserId, BookId"""
         
-        for field in allowed_fields:
-            if field in data:
-                if field in ['BookingDate', 'dueDate'] and isinstance(data[field], str):
-                    update_fields.append(f"{field} = %s")
-                    values.append(datetime.strptime(data[field], '%Y-%m-%d %H:%M:%S'))
-                else:
-                    update_fields.append(f"{field} = %s")
-                    values.append(data[field])
+            cur.execute(query, values)
+            row = cur.fetchone()
+            if not row:
+                cur.close()
+                return jsonify({'success': False, 'message': 'Booking not found'}), 404
+            updated_booking_id, uid, bid = row
         
-        if not update_fields:
+            if data.get('pendingReturnIndicator'):
+                notify_booking_event(cur, 'return_requested', updated_booking_id, uid, bid)
+            conn.commit()
             cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'No valid fields to update'}), 400
-        
-        values.append(booking_id)
-        query = f"UPDATE Bookings SET {', '.join(update_fields)} WHERE BookingId = %s RETURNING BookingId"
-        
-        cur.execute(query, values)
-        updated_booking_id = cur.fetchone()[0]
-        conn.commit()
-        
-        # After update, check if booking should be moved to TransactionHistory
-        cur.execute('SELECT CurrentlyBookedIndicator, pendingReturnIndicator, UserId, BookId FROM Bookings WHERE BookingId = %s', (updated_booking_id,))
-        row = cur.fetchone()
-        if row:
-            currently_booked = bool(row[0])
-            pending_return = bool(row[1])
-            uid = row[2]
-            bid = row[3]
-
-            if (not currently_booked) and (not pending_return):
-                # Admin approved return - INCREMENT copies in Books table
-                cur.execute('SELECT copiesavailable FROM Books WHERE BookId = %s', (bid,))
-                book_row = cur.fetchone()
-                if book_row:
-                    current_copies = book_row[0]
-                    new_copies = current_copies + 1
-                    cur.execute('UPDATE Books SET copiesavailable = %s WHERE BookId = %s', (new_copies, bid))
-                    print(f"Return approved: BookId {bid} copies incremented from {current_copies} to {new_copies}")
-                
-                # Move to transactions (ReservedIndicator = False)
-                transaction_date = datetime.now()
-                cur.execute('''
-                    INSERT INTO TransactionHistory (UserId, BookId, TransactionDate, ReservedIndicator)
-                    VALUES (%s, %s, %s, %s)
-                ''', (uid, bid, transaction_date, False))
-                # Delete the booking record
-                cur.execute('DELETE FROM Bookings WHERE BookingId = %s', (updated_booking_id,))
-                conn.commit()
-                print(f"Return completed: Booking {updated_booking_id} moved to history and deleted")
-        cur.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'message': 'Booking updated successfully', 'booking_id': updated_booking_id}), 200
+            tables_changed('bookings')
+        
+            return jsonify({'success': True, 'message': 'Booking updated successfully', 'booking_id': updated_booking_id}), 200
         
     except Exception as e:
         print(f"Update booking error: {e}")
@@ -810,27 +1206,31 @@ def update_booking(booking_id):
 
 @crud_bp.route('/api/bookings/<int:booking_id>', methods=['DELETE'])
 def delete_booking(booking_id):
-    """Delete an existing booking"""
+    """Delete an existing booking, releasing the copy it holds"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor()
+            cur = conn.cursor()
         
-        cur.execute('SELECT BookingId FROM Bookings WHERE BookingId = %s', (booking_id,))
-        if not cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'Booking not found'}), 404
+            cur.execute(BOOKING_DELETE_QUERY, {'booking_id': booking_id, 'hold_for': RESERVATION_HOLD})
+            row = cur.fetchone()
+            if not row:
+                cur.close()
+                return jsonify({'success': False, 'message': 'Booking not found'}), 404
+            deleted_booking_id, uid, bid, holds_copy, held_for = row
         
-        cur.execute('DELETE FROM Bookings WHERE BookingId = %s RETURNING BookingId', (booking_id,))
-        deleted_booking_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
+            if holds_copy:
+                notify_hold(cur, bid, held_for)
+            conn.commit()
+            cur.close()
+            if holds_copy:
+                tables_changed('bookings', 'books')
+            else:
+                tables_changed('bookings')
         
-        return jsonify({'success': True, 'message': 'Booking deleted successfully', 'booking_id': deleted_booking_id}), 200
+            return jsonify({'success': True, 'message': 'Booking deleted successfully', 'booking_id': deleted_booking_id}), 200
         
     except Exception as e:
         print(f"Delete booking error: {e}")
@@ -839,54 +1239,89 @@ def delete_booking(booking_id):
 
 # ==========================================RESERVATIONS TABLE CRUD==========================================
 
+RESERVATION_LIST_SPEC = {
+    'table': 'Reservations',
+    'key': 'reservationid',
+    'columns': ['reservationid', 'userid', 'bookid', 'reservationdate', 'holdexpiresat'],
+    'sorts': {'reservationid', 'reservationdate'},
+    'default_sort': 'reservationid',
+    'filters': {
+        'user_id': ('userid = %s', str),
+        'book_id': ('bookid = %s', int)
+    }
+}
+
+# 1-based place of reservation ``r`` in its book's queue: a range count over
+# idx_reservations_queue (BookId, ReservationDate, ReservationId), so it only
+# reads the index entries of the reservations ahead of it
+QUEUE_POSITION = '''
+    SELECT COUNT(*) + 1 FROM Reservations q
+    WHERE q.BookId = r.BookId
+        AND (q.ReservationDate, q.ReservationId) < (r.ReservationDate, r.ReservationId)
+'''
+
+QUEUE_POSITION_QUERY = f'''
+    SELECT r.ReservationId AS reservationid, r.BookId AS bookid, r.HoldExpiresAt AS holdexpiresat,
+        ({QUEUE_POSITION}) AS position,
+        (SELECT COUNT(*) FROM Reservations q WHERE q.BookId = r.BookId) AS queue_length
+    FROM Reservations r
+    WHERE r.ReservationId = %s
+'''
+
 @crud_bp.route('/api/reservations', methods=['GET'])
 def get_reservations():
-    """Get all reservations or filter by UserId or BookId"""
+    """Get a page of reservations (optionally filtered by UserId or BookId) or a specific reservation"""
     try:
         reservation_id = request.args.get('reservation_id')
-        user_id = request.args.get('user_id')
-        book_id = request.args.get('book_id')
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+            cur = conn.cursor(cursor_factory=RealDictCursor)
         
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        if reservation_id:
-            cur.execute('SELECT * FROM Reservations WHERE ReservationId = %s', (reservation_id,))
-            reservation = cur.fetchone()
-            cur.close()
-            conn.close()
+            if reservation_id:
+                cur.execute('SELECT * FROM Reservations WHERE ReservationId = %s', (reservation_id,))
+                reservation = cur.fetchone()
+                cur.close()
             
-            if not reservation:
-                return jsonify({'success': False, 'message': 'Reservation not found'}), 404
+                if not reservation:
+                    return jsonify({'success': False, 'message': 'Reservation not found'}), 404
             
-            return jsonify({'success': True, 'reservation': reservation}), 200
-        elif user_id:
-            cur.execute('SELECT * FROM Reservations WHERE UserId = %s', (user_id,))
-            reservations = cur.fetchall()
-            cur.close()
-            conn.close()
-            return jsonify({'success': True, 'count': len(reservations), 'reservations': reservations}), 200
-        elif book_id:
-            cur.execute('SELECT * FROM Reservations WHERE BookId = %s', (book_id,))
-            reservations = cur.fetchall()
-            cur.close()
-            conn.close()
-            return jsonify({'success': True, 'count': len(reservations), 'reservations': reservations}), 200
-        else:
-            cur.execute('SELECT * FROM Reservations')
-            reservations = cur.fetchall()
-            cur.close()
-            conn.close()
-            
-            return jsonify({'success': True, 'count': len(reservations), 'reservations': reservations}), 200
+                return jsonify({'success': True, 'reservation': reservation}), 200
+            else:
+                reservations, next_cursor, total = fetch_page(cur, RESERVATION_LIST_SPEC, request.args)
+                cur.close()
             
+                return jsonify(page_body('reservations', reservations, next_cursor, total)), 200
+    
+    except QueryParamError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Get reservations error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@crud_bp.route('/api/reservations/<int:reservation_id>/position', methods=['GET'])
+def get_reservation_position(reservation_id):
+    """Get a reservation's place in its book's queue and whether a copy is held for it"""
+    try:
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
+        
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur.execute(QUEUE_POSITION_QUERY, (reservation_id,))
+            position = cur.fetchone()
+            cur.close()
+        
+        if not position:
+            return jsonify({'success': False, 'message': 'Reservation not found'}), 404
+        
+        return jsonify({'success': True, **position}), 200
+        
+    except Exception as e:
+        print(f"Get reservation position error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @crud_bp.route('/api/reservations', methods=['POST'])
 def create_reservation():
     """Create a new reservation"""
@@ -898,41 +1333,41 @@ def create_reservation():
             if field not in data:
                 return jsonify({'success': False, 'message': f'{field} is required'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
-        
-        cur = conn.cursor()
-        
-        reservation_date = data.get('ReservationDate', datetime.now())
-        if isinstance(reservation_date, str):
-            reservation_date = datetime.strptime(reservation_date, '%Y-%m-%d %H:%M:%S')
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        print(f"DEBUG: Creating reservation - UserId: {data['UserId']}, BookId: {data['BookId']}")
+            cur = conn.cursor()
         
-        cur.execute('''
-            INSERT INTO Reservations (UserId, BookId, ReservationDate)
-            VALUES (%s, %s, %s)
-            RETURNING ReservationId
-        ''', (
-            data['UserId'],
-            data['BookId'],
-            reservation_date
-        ))
+            reservation_date = data.get('ReservationDate', datetime.now())
+            if isinstance(reservation_date, str):
+                reservation_date = datetime.strptime(reservation_date, '%Y-%m-%d %H:%M:%S')
         
-        reservation_id = cur.fetchone()[0]
-        conn.commit()
-        print(f"DEBUG: Reservation created with ID: {reservation_id}")
+            print(f"DEBUG: Creating reservation - UserId: {data['UserId']}, BookId: {data['BookId']}")
         
-        # Verify it was actually saved
-        cur.execute('SELECT * FROM Reservations WHERE ReservationId = %s', (reservation_id,))
-        verify = cur.fetchone()
-        print(f"DEBUG: Verification fetch result: {verify}")
+            cur.execute('''
+                INSERT INTO Reservations (UserId, BookId, ReservationDate)
+                VALUES (%s, %s, %s)
+                RETURNING ReservationId
+            ''', (
+                data['UserId'],
+                data['BookId'],
+                reservation_date
+            ))
+        
+            reservation_id = cur.fetchone()[0]
+            notify_booking_event(cur, 'reservation_created', None, data['UserId'], data['BookId'])
+            conn.commit()
+            print(f"DEBUG: Reservation created with ID: {reservation_id}")
+        
+            # Verify it was actually saved
+            cur.execute('SELECT * FROM Reservations WHERE ReservationId = %s', (reservation_id,))
+            verify = cur.fetchone()
+            print(f"DEBUG: Verification fetch result: {verify}")
         
-        cur.close()
-        conn.close()
+            cur.close()
         
-        return jsonify({'success': True, 'message': 'Reservation created successfully', 'reservation_id': reservation_id}), 201
+            return jsonify({'success': True, 'message': 'Reservation created successfully', 'reservation_id': reservation_id}), 201
         
     except Exception as e:
         print(f"Create reservation error: {e}")
@@ -950,47 +1385,53 @@ def update_reservation(reservation_id):
         if not data:
             return jsonify({'success': False, 'message': 'No data provided'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor()
+            cur = conn.cursor()
         
-        cur.execute('SELECT ReservationId FROM Reservations WHERE ReservationId = %s', (reservation_id,))
-        if not cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'Reservation not found'}), 404
+            cur.execute('SELECT UserId, BookId, HoldExpiresAt FROM Reservations WHERE ReservationId = %s FOR UPDATE',
+                        (reservation_id,))
+            reservation = cur.fetchone()
+            if not reservation:
+                cur.close()
+                return jsonify({'success': False, 'message': 'Reservation not found'}), 404
+            # The copy held for this reservation belongs to its user and title;
+            # moving the reservation would hand it to someone else or lose it
+            user_id, book_id, hold_expires_at = reservation
+            if hold_expires_at and (str(data.get('UserId', user_id)) != str(user_id)
+                                    or str(data.get('BookId', book_id)) != str(book_id)):
+                cur.close()
+                return jsonify({'success': False, 'message': 'A copy is held for this reservation, so its user and book cannot change'}), 409
         
-        update_fields = []
-        values = []
+            update_fields = []
+            values = []
         
-        allowed_fields = ['UserId', 'BookId', 'ReservationDate']
+            allowed_fields = ['UserId', 'BookId', 'ReservationDate']
         
-        for field in allowed_fields:
-            if field in data:
-                if field == 'ReservationDate' and isinstance(data[field], str):
-                    update_fields.append(f"{field} = %s")
-                    values.append(datetime.strptime(data[field], '%Y-%m-%d %H:%M:%S'))
-                else:
-                    update_fields.append(f"{field} = %s")
-                    values.append(data[field])
+            for field in allowed_fields:
+                if field in data:
+                    if field == 'ReservationDate' and isinstance(data[field], str):
+                        update_fields.append(f"{field} = %s")
+                        values.append(datetime.strptime(data[field], '%Y-%m-%d %H:%M:%S'))
+                    else:
+                        update_fields.append(f"{field} = %s")
+                        values.append(data[field])
         
-        if not update_fields:
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'No valid fields to update'}), 400
+            if not update_fields:
+                cur.close()
+                return jsonify({'success': False, 'message': 'No valid fields to update'}), 400
         
-        values.append(reservation_id)
-        query = f"UPDATE Reservations SET {', '.join(update_fields)} WHERE ReservationId = %s RETURNING ReservationId"
+            values.append(reservation_id)
+            query = f"UPDATE Reservations SET {', '.join(update_fields)} WHERE ReservationId = %s RETURNING ReservationId"
         
-        cur.execute(query, values)
-        updated_reservation_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
+            cur.execute(query, values)
+            updated_reservation_id = cur.fetchone()[0]
+            conn.commit()
+            cur.close()
         
-        return jsonify({'success': True, 'message': 'Reservation updated successfully', 'reservation_id': updated_reservation_id}), 200
+            return jsonify({'success': True, 'message': 'Reservation updated successfully', 'reservation_id': updated_reservation_id}), 200
         
     except Exception as e:
         print(f"Update reservation error: {e}")
@@ -1000,25 +1441,32 @@ def update_reservation(reservation_id):
 def delete_reservation(reservation_id):
     """Delete an existing reservation"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor()
+            cur = conn.cursor()
         
-        cur.execute('SELECT ReservationId FROM Reservations WHERE ReservationId = %s', (reservation_id,))
-        if not cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'Reservation not found'}), 404
+            cur.execute('''
+                DELETE FROM Reservations WHERE ReservationId = %s
+                RETURNING ReservationId, BookId, HoldExpiresAt IS NOT NULL
+            ''', (reservation_id,))
+            row = cur.fetchone()
+            if not row:
+                cur.close()
+                return jsonify({'success': False, 'message': 'Reservation not found'}), 404
+            deleted_reservation_id, book_id, was_held = row
         
-        cur.execute('DELETE FROM Reservations WHERE ReservationId = %s RETURNING ReservationId', (reservation_id,))
-        deleted_reservation_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
+            if was_held:
+                # The copy held for this reservation goes to the next in line or back on the shelf
+                cur.execute('SELECT allocate_returned_copy(%s, %s)', (book_id, RESERVATION_HOLD))
+                notify_hold(cur, book_id, cur.fetchone()[0])
+            conn.commit()
+            cur.close()
+            if was_held:
+                tables_changed('books')
         
-        return jsonify({'success': True, 'message': 'Reservation deleted successfully', 'reservation_id': deleted_reservation_id}), 200
+            return jsonify({'success': True, 'message': 'Reservation deleted successfully', 'reservation_id': deleted_reservation_id}), 200
         
     except Exception as e:
         print(f"Delete reservation error: {e}")
@@ -1027,49 +1475,49 @@ def delete_reservation(reservation_id):
 
 # =========================================REVIEWS TABLE CRUD=========================================
 
+REVIEW_LIST_SPEC = {
+    'table': 'Reviews',
+    'key': ('bookid', 'userid'),
+    'columns': ['bookid', 'userid', 'rating', 'reviewdate', 'reviewdescription'],
+    'sorts': {'bookid', 'rating', 'reviewdate'},
+    'default_sort': 'bookid',
+    'filters': {
+        'book_id': ('bookid = %s', int),
+        'user_id': ('userid = %s', str),
+        'rating': ('rating = %s', int)
+    }
+}
+
 @crud_bp.route('/api/reviews', methods=['GET'])
 def get_reviews():
-    """Get all reviews or filter by BookID or UserId"""
+    """Get a page of reviews (optionally filtered by BookID or UserId) or one user's review of a book"""
     try:
         book_id = request.args.get('book_id')
         user_id = request.args.get('user_id')
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur = conn.cursor(cursor_factory=RealDictCursor)
         
-        if book_id and user_id:
-            cur.execute('SELECT * FROM Reviews WHERE BookID = %s AND UserId = %s', (book_id, user_id))
-            review = cur.fetchone()
-            cur.close()
-            conn.close()
-            
-            if not review:
-                return jsonify({'success': False, 'message': 'Review not found'}), 404
+            if book_id and user_id:
+                cur.execute('SELECT * FROM Reviews WHERE BookID = %s AND UserId = %s', (book_id, user_id))
+                review = cur.fetchone()
+                cur.close()
             
-            return jsonify({'success': True, 'review': review}), 200
-        elif book_id:
-            cur.execute('SELECT * FROM Reviews WHERE BookID = %s', (book_id,))
-            reviews = cur.fetchall()
-            cur.close()
-            conn.close()
-            return jsonify({'success': True, 'count': len(reviews), 'reviews': reviews}), 200
-        elif user_id:
-            cur.execute('SELECT * FROM Reviews WHERE UserId = %s', (user_id,))
-            reviews = cur.fetchall()
-            cur.close()
-            conn.close()
-            return jsonify({'success': True, 'count': len(reviews), 'reviews': reviews}), 200
-        else:
-            cur.execute('SELECT * FROM Reviews')
-            reviews = cur.fetchall()
-            cur.close()
-            conn.close()
+                if not review:
+                    return jsonify({'success': False, 'message': 'Review not found'}), 404
             
-            return jsonify({'success': True, 'count': len(reviews), 'reviews': reviews}), 200
+                return jsonify({'success': True, 'review': review}), 200
+            else:
+                reviews, next_cursor, total = fetch_page(cur, REVIEW_LIST_SPEC, request.args)
+                cur.close()
             
+                return jsonify(page_body('reviews', reviews, next_cursor, total)), 200
+    
+    except QueryParamError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Get reviews error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -1089,43 +1537,44 @@ def create_review():
         if not isinstance(rating, int) or rating < 1 or rating > 5:
             return jsonify({'success': False, 'message': 'Rating must be an integer between 1 and 5'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
-        
-        cur = conn.cursor()
-        
-        review_date = data.get('ReviewDate', datetime.now())
-        if isinstance(review_date, str):
-            review_date = datetime.strptime(review_date, '%Y-%m-%d %H:%M:%S')
-        
-        cur.execute('''
-            INSERT INTO Reviews (BookID, UserId, Rating, ReviewDate, ReviewDescription)
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT (BookID, UserId) DO UPDATE SET
-                Rating = EXCLUDED.Rating,
-                ReviewDate = EXCLUDED.ReviewDate,
-                ReviewDescription = EXCLUDED.ReviewDescription
-            RETURNING BookID, UserId
-        ''', (
-            data['BookID'],
-            data['UserId'],
-            rating,
-            review_date,
-            data.get('ReviewDescription')
-        ))
-        
-        result = cur.fetchone()
-        conn.commit()
-        cur.close()
-        conn.close()
-        
-        return jsonify({
-            'success': True, 
-            'message': 'Review created/updated successfully', 
-            'book_id': result[0],
-            'user_id': result[1]
-        }), 201
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
+        
+            cur = conn.cursor()
+        
+            review_date = data.get('ReviewDate', datetime.now())
+            if isinstance(review_date, str):
+                review_date = datetime.strptime(review_date, '%Y-%m-%d %H:%M:%S')
+        
+            cur.execute('''
+                INSERT INTO Reviews (BookID, UserId, Rating, ReviewDate, ReviewDescription)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (BookID, UserId) DO UPDATE SET
+                    Rating = EXCLUDED.Rating,
+                    ReviewDate = EXCLUDED.ReviewDate,
+                    ReviewDescription = EXCLUDED.ReviewDescription
+                RETURNING BookID, UserId
+            ''', (
+                data['BookID'],
+                data['UserId'],
+                rating,
+                review_date,
+                data.get('ReviewDescription')
+            ))
+        
+            result = cur.fetchone()
+            conn.commit()
+            cur.close()
+            # The review triggers changed this book's rating columns
+            tables_changed('books')
+        
+            return jsonify({
+                'success': True, 
+                'message': 'Review created/updated successfully', 
+                'book_id': result[0],
+                'user_id': result[1]
+            }), 201
         
     except Exception as e:
         print(f"Create review error: {e}")
@@ -1142,62 +1591,59 @@ def update_review():
         if 'BookID' not in data or 'UserId' not in data:
             return jsonify({'success': False, 'message': 'BookID and UserId are required'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor()
+            cur = conn.cursor()
         
-        cur.execute('SELECT BookID, UserId FROM Reviews WHERE BookID = %s AND UserId = %s', 
-                    (data['BookID'], data['UserId']))
-        if not cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'Review not found'}), 404
-        
-        update_fields = []
-        values = []
-        
-        if 'Rating' in data:
-            rating = data['Rating']
-            if not isinstance(rating, int) or rating < 1 or rating > 5:
+            cur.execute('SELECT BookID, UserId FROM Reviews WHERE BookID = %s AND UserId = %s', 
+                        (data['BookID'], data['UserId']))
+            if not cur.fetchone():
                 cur.close()
-                conn.close()
-                return jsonify({'success': False, 'message': 'Rating must be an integer between 1 and 5'}), 400
-            update_fields.append("Rating = %s")
-            values.append(rating)
+                return jsonify({'success': False, 'message': 'Review not found'}), 404
         
-        if 'ReviewDate' in data:
-            review_date = data['ReviewDate']
-            if isinstance(review_date, str):
-                review_date = datetime.strptime(review_date, '%Y-%m-%d %H:%M:%S')
-            update_fields.append("ReviewDate = %s")
-            values.append(review_date)
+            update_fields = []
+            values = []
+        
+            if 'Rating' in data:
+                rating = data['Rating']
+                if not isinstance(rating, int) or rating < 1 or rating > 5:
+                    cur.close()
+                    return jsonify({'success': False, 'message': 'Rating must be an integer between 1 and 5'}), 400
+                update_fields.append("Rating = %s")
+                values.append(rating)
+        
+            if 'ReviewDate' in data:
+                review_date = data['ReviewDate']
+                if isinstance(review_date, str):
+                    review_date = datetime.strptime(review_date, '%Y-%m-%d %H:%M:%S')
+                update_fields.append("ReviewDate = %s")
+                values.append(review_date)
+        
+            if 'ReviewDescription' in data:
+                update_fields.append("ReviewDescription = %s")
+                values.append(data['ReviewDescription'])
+        
+            if not update_fields:
+                cur.close()
+                return jsonify({'success': False, 'message': 'No valid fields to update'}), 400
         
-        if 'ReviewDescription' in data:
-            update_fields.append("ReviewDescription = %s")
-            values.append(data['ReviewDescription'])
+            values.extend([data['BookID'], data['UserId']])
+            query = f"UPDATE Reviews SET {', '.join(update_fields)} WHERE BookID = %s AND UserId = %s RETURNING BookID, UserId"
         
-        if not update_fields:
+            cur.execute(query, values)
+            result = cur.fetchone()
+            conn.commit()
             cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'No valid fields to update'}), 400
+            tables_changed('books')
         
-        values.extend([data['BookID'], data['UserId']])
-        query = f"UPDATE Reviews SET {', '.join(update_fields)} WHERE BookID = %s AND UserId = %s RETURNING BookID, UserId"
-        
-        cur.execute(query, values)
-        result = cur.fetchone()
-        conn.commit()
-        cur.close()
-        conn.close()
-        
-        return jsonify({
-            'success': True, 
-            'message': 'Review updated successfully', 
-            'book_id': result[0],
-            'user_id': result[1]
-        }), 200
+            return jsonify({
+                'success': True, 
+                'message': 'Review updated successfully', 
+                'book_id': result[0],
+                'user_id': result[1]
+            }), 200
         
     except Exception as e:
         print(f"Update review error: {e}")
@@ -1205,31 +1651,24 @@ def update_review():
 
 @crud_bp.route('/api/reviews/rating/<int:book_id>', methods=['GET'])
 def get_book_average_rating(book_id):
-    """Get the average rating for a specific book"""
+    """Get the rating summary for a specific book from its maintained aggregates"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
-        
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cur.execute('''
-            SELECT 
-                BookID,
-                COUNT(*) as review_count,
-                ROUND(AVG(Rating)::numeric, 2) as average_rating,
-                MIN(Rating) as min_rating,
-                MAX(Rating) as max_rating
-            FROM Reviews
-            WHERE BookID = %s
-            GROUP BY BookID
-        ''', (book_id,))
-        
-        result = cur.fetchone()
-        cur.close()
-        conn.close()
-        
-        if not result:
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
+        
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+        
+            cur.execute('''
+                SELECT BookId, review_count, average_rating, rating_histogram
+                FROM Books
+                WHERE BookId = %s
+            ''', (book_id,))
+        
+            result = cur.fetchone()
+            cur.close()
+        
+        if not result or not result['review_count']:
             return jsonify({
                 'success': True,
                 'book_id': book_id,
@@ -1238,14 +1677,7 @@ def get_book_average_rating(book_id):
                 'message': 'No reviews found for this book'
             }), 200
         
-        return jsonify({
-            'success': True,
-            'book_id': result['bookid'],
-            'review_count': result['review_count'],
-            'average_rating': float(result['average_rating']) if result['average_rating'] else None,
-            'min_rating': result['min_rating'],
-            'max_rating': result['max_rating']
-        }), 200
+        return jsonify({'success': True, 'book_id': result['bookid'], **rating_summary(result)}), 200
         
     except Exception as e:
         print(f"Get book average rating error: {e}")
@@ -1253,50 +1685,57 @@ def get_book_average_rating(book_id):
 
 # ========================================TRANSACTIONHISTORY TABLE CRUD========================================
 
+TRANSACTION_LIST_SPEC = {
+    'table': 'TransactionHistory',
+    'key': 'transactionid',
+    'columns': ['transactionid', 'userid', 'bookid', 'transactiondate', 'reservedindicator'],
+    'sorts': {'transactionid', 'transactiondate'},
+    'default_sort': 'transactionid',
+    'filters': {
+        'user_id': ('userid = %s', str),
+        'book_id': ('bookid = %s', int),
+        'reserved': ('reservedindicator = %s', parse_bool)
+    }
+}
+
+TRANSACTION_NAMED_SPEC = dict(
+    TRANSACTION_LIST_SPEC,
+    table='''(SELECT t.*, u.Username AS username, b.Name AS bookname
+              FROM TransactionHistory t
+              JOIN Users u ON u.UserId = t.UserId
+              JOIN Books b ON b.BookId = t.BookId) AS transactions''',
+    columns=TRANSACTION_LIST_SPEC['columns'] + ['username', 'bookname']
+)
+
 @crud_bp.route('/api/transactions', methods=['GET'])
 def get_transactions():
-    """Get all transactions or filter by UserId or BookId"""
+    """Get a page of transactions (optionally filtered, optionally with user and book names) or a specific transaction"""
     try:
         transaction_id = request.args.get('transaction_id')
-        user_id = request.args.get('user_id')
-        book_id = request.args.get('book_id')
-        
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur = conn.cursor(cursor_factory=RealDictCursor)
         
-        if transaction_id:
-            cur.execute('SELECT * FROM TransactionHistory WHERE TransactionId = %s', (transaction_id,))
-            transaction = cur.fetchone()
-            cur.close()
-            conn.close()
-            
-            if not transaction:
-                return jsonify({'success': False, 'message': 'Transaction not found'}), 404
+            if transaction_id:
+                cur.execute('SELECT * FROM TransactionHistory WHERE TransactionId = %s', (transaction_id,))
+                transaction = cur.fetchone()
+                cur.close()
             
-            return jsonify({'success': True, 'transaction': transaction}), 200
-        elif user_id:
-            cur.execute('SELECT * FROM TransactionHistory WHERE UserId = %s', (user_id,))
-            transactions = cur.fetchall()
-            cur.close()
-            conn.close()
-            return jsonify({'success': True, 'count': len(transactions), 'transactions': transactions}), 200
-        elif book_id:
-            cur.execute('SELECT * FROM TransactionHistory WHERE BookId = %s', (book_id,))
-            transactions = cur.fetchall()
-            cur.close()
-            conn.close()
-            return jsonify({'success': True, 'count': len(transactions), 'transactions': transactions}), 200
-        else:
-            cur.execute('SELECT * FROM TransactionHistory')
-            transactions = cur.fetchall()
-            cur.close()
-            conn.close()
+                if not transaction:
+                    return jsonify({'success': False, 'message': 'Transaction not found'}), 404
             
-            return jsonify({'success': True, 'count': len(transactions), 'transactions': transactions}), 200
+                return jsonify({'success': True, 'transaction': transaction}), 200
+            else:
+                spec = TRANSACTION_NAMED_SPEC if parse_flag(request.args, 'include_names') else TRANSACTION_LIST_SPEC
+                transactions, next_cursor, total = fetch_page(cur, spec, request.args)
+                cur.close()
             
+                return jsonify(page_body('transactions', transactions, next_cursor, total)), 200
+    
+    except QueryParamError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Get transactions error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -1312,33 +1751,32 @@ def create_transaction():
             if field not in data:
                 return jsonify({'success': False, 'message': f'{field} is required'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
-        
-        cur = conn.cursor()
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        transaction_date = data.get('TransactionDate', datetime.now())
-        if isinstance(transaction_date, str):
-            transaction_date = datetime.strptime(transaction_date, '%Y-%m-%d %H:%M:%S')
+            cur = conn.cursor()
         
-        cur.execute('''
-            INSERT INTO TransactionHistory (UserId, BookId, TransactionDate, ReservedIndicator)
-            VALUES (%s, %s, %s, %s)
-            RETURNING TransactionId
-        ''', (
-            data['UserId'],
-            data['BookId'],
-            transaction_date,
-            data['ReservedIndicator']
-        ))
+            transaction_date = data.get('TransactionDate', datetime.now())
+            if isinstance(transaction_date, str):
+                transaction_date = datetime.strptime(transaction_date, '%Y-%m-%d %H:%M:%S')
         
-        transaction_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
+            cur.execute('''
+                INSERT INTO TransactionHistory (UserId, BookId, TransactionDate, ReservedIndicator)
+                VALUES (%s, %s, %s, %s)
+                RETURNING TransactionId
+            ''', (
+                data['UserId'],
+                data['BookId'],
+                transaction_date,
+                data['ReservedIndicator']
+            ))
+        
+            transaction_id = cur.fetchone()[0]
+            conn.commit()
+            cur.close()
         
-        return jsonify({'success': True, 'message': 'Transaction created successfully', 'transaction_id': transaction_id}), 201
+            return jsonify({'success': True, 'message': 'Transaction created successfully', 'transaction_id': transaction_id}), 201
         
     except Exception as e:
         print(f"Create transaction error: {e}")
@@ -1352,49 +1790,91 @@ def update_transaction(transaction_id):
         if not data:
             return jsonify({'success': False, 'message': 'No data provided'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor()
+            cur = conn.cursor()
         
-        cur.execute('SELECT TransactionId FROM TransactionHistory WHERE TransactionId = %s', (transaction_id,))
-        if not cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'Transaction not found'}), 404
+            cur.execute('SELECT TransactionId FROM TransactionHistory WHERE TransactionId = %s', (transaction_id,))
+            if not cur.fetchone():
+                cur.close()
+                return jsonify({'success': False, 'message': 'Transaction not found'}), 404
         
-        update_fields = []
-        values = []
+            update_fields = []
+            values = []
         
-        allowed_fields = ['UserId', 'BookId', 'TransactionDate', 'ReservedIndicator']
+            allowed_fields = ['UserId', 'BookId', 'TransactionDate', 'ReservedIndicator']
         
-        for field in allowed_fields:
-            if field in data:
-                if field == 'TransactionDate' and isinstance(data[field], str):
-                    update_fields.append(f"{field} = %s")
-                    values.append(datetime.strptime(data[field], '%Y-%m-%d %H:%M:%S'))
-                else:
-                    update_fields.append(f"{field} = %s")
-                    values.append(data[field])
+            for field in allowed_fields:
+                if field in data:
+                    if field == 'TransactionDate' and isinstance(data[field], str):
+                        update_fields.append(f"{field} = %s")
+                        values.append(datetime.strptime(data[field], '%Y-%m-%d %H:%M:%S'))
+                    else:
+                        update_fields.append(f"{field} = %s")
+                        values.append(data[field])
         
-        if not update_fields:
-            cur.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'No valid fields to update'}), 400
+            if not update_fields:
+                cur.close()
+                return jsonify({'success': False, 'message': 'No valid fields to update'}), 400
         
-        values.append(transaction_id)
-        query = f"UPDATE TransactionHistory SET {', '.join(update_fields)} WHERE TransactionId = %s RETURNING TransactionId"
+            values.append(transaction_id)
+            query = f"UPDATE TransactionHistory SET {', '.join(update_fields)} WHERE TransactionId = %s RETURNING TransactionId"
         
-        cur.execute(query, values)
-        updated_transaction_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
+            cur.execute(query, values)
+            updated_transaction_id = cur.fetchone()[0]
+            conn.commit()
+            cur.close()
         
-        return jsonify({'success': True, 'message': 'Transaction updated successfully', 'transaction_id': updated_transaction_id}), 200
+            return jsonify({'success': True, 'message': 'Transaction updated successfully', 'transaction_id': updated_transaction_id}), 200
         
     except Exception as e:
         print(f"Update transaction error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+# ===============================================BULK EXPORTS===============================================
+
+EXPORT_SPECS = {
+    'books': BOOK_LIST_SPEC,
+    'bookings': BOOKING_LIST_SPEC,
+    'reviews': REVIEW_LIST_SPEC,
+    'transactions': TRANSACTION_LIST_SPEC
+}
+
+@crud_bp.route('/api/<any(books, bookings, reviews, transactions):resource>/export', methods=['GET'])
+def export_rows(resource):
+    """Stream every matching row as NDJSON (default) or CSV from a server-side cursor"""
+    try:
+        export_format = request.args.get('format', 'ndjson').lower()
+        if export_format not in ('ndjson', 'csv'):
+            return jsonify({'success': False, 'message': 'format must be ndjson or csv'}), 400
+        
+        fields, query, params = export_query(EXPORT_SPECS[resource], request.args)
+        
+        # The connection outlives this function: it is released when the response is closed
+        conn = get_db_connection()
+        if not conn:
+            return db_unavailable()
+        
+        try:
+            rows = iter_rows(conn, query, params, f'export_{resource}')
+            if export_format == 'csv':
+                response = Response(stream_with_context(csv_chunks(rows, fields)), mimetype='text/csv')
+            else:
+                response = Response(stream_with_context(ndjson_chunks(rows, current_app.json.dumps)),
+                                    mimetype='application/x-ndjson')
+            response.call_on_close(conn.close)
+        except BaseException:
+            # No response owns the connection yet, so give it back here
+            conn.close()
+            raise
+        response.headers['Content-Disposition'] = f'attachment; filename={resource}.{export_format}'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+        
+    except QueryParamError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Export {resource} error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
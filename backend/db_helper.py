@@ -1,159 +1,152 @@
 import os
+import threading
 import time
+from contextlib import contextmanager
 
 import psycopg2
+from circuit_breaker import CircuitBreaker, backoff_delay
+from db_pool import ConnectionPool, PoolTimeout
+from flask import jsonify
+from metrics import record_acquire
+from query_log import observe_statement
 
 DB_CONFIG = {
     "host": os.getenv("DB_HOST", "localhost"),
     "database": os.getenv("DB_NAME", "library_db"),
     "user": os.getenv("DB_USER", "postgres"),
     "password": os.getenv("DB_PASSWORD", "1234"),
-    "port": int(os.getenv("DB_PORT", 5432))
+    "port": int(os.getenv("DB_PORT", 5432)),
+    "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", 3))
 }
 
+POOL_CONFIG = {
+    "min_size": int(os.getenv("DB_POOL_MIN", 1)),
+    "max_size": int(os.getenv("DB_POOL_MAX", 10)),
+    "max_uses": int(os.getenv("DB_POOL_MAX_USES", 1000)),
+    "max_age": float(os.getenv("DB_POOL_MAX_AGE", 1800)),
+    "timeout": float(os.getenv("DB_POOL_TIMEOUT", 5)),
+    "health_check_after": float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", 30))
+}
+
+ACQUIRE_CONFIG = {
+    # Total time a request may spend obtaining a connection, retries included
+    "budget": float(os.getenv("DB_ACQUIRE_BUDGET", 3)),
+    "backoff_base": float(os.getenv("DB_BACKOFF_BASE", 0.05)),
+    "backoff_max": float(os.getenv("DB_BACKOFF_MAX", 1)),
+    "failure_threshold": int(os.getenv("DB_CIRCUIT_FAILURES", 3)),
+    "probe_max_delay": float(os.getenv("DB_CIRCUIT_PROBE_MAX", 10))
+}
+
+_pool = None
+_breaker = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def _probe_database():
+    """Open and close a throwaway connection to see whether the database is back."""
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        conn.close()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _ensure_process_state():
+    """Create the pool and circuit breaker on first use, and again after a fork."""
+    global _pool, _breaker, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = ConnectionPool(DB_CONFIG, query_observer=observe_statement, **POOL_CONFIG)
+            _breaker = CircuitBreaker(
+                _probe_database,
+                failure_threshold=ACQUIRE_CONFIG['failure_threshold'],
+                probe_max_delay=ACQUIRE_CONFIG['probe_max_delay'],
+                # Idle connections are almost certainly dead once the server went away
+                on_open=_pool.close_all
+            )
+            _pool_pid = pid
+            _pool.fill()
+
+def get_pool():
+    """Return this process's connection pool."""
+    _ensure_process_state()
+    return _pool
+
+def get_breaker():
+    """Return this process's database circuit breaker."""
+    _ensure_process_state()
+    return _breaker
+
+def get_pool_stats():
+    """Return usage statistics for this process's connection pool and circuit breaker."""
+    stats = get_pool().stats()
+    stats['pid'] = os.getpid()
+    stats['circuit_breaker'] = get_breaker().stats()
+    return stats
+
 def get_db_connection():
-    """Create and return a database connection with retry logic."""
-    max_retries = 5
-    retry_delay = 5
-    for attempt in range(max_retries):
+    """Borrow a pooled database connection, or return None if the database is unavailable.
+
+    Connection failures are retried with jittered exponential backoff, but
+    never for longer than the acquisition budget. Once the circuit breaker
+    has opened, callers get None immediately until the background probe
+    sees the database again. close() returns the connection to the pool.
+    """
+    start = time.perf_counter()
+    conn = _acquire_connection()
+    record_acquire(time.perf_counter() - start, conn is not None)
+    return conn
+
+def _acquire_connection():
+    """The retrying acquisition behind get_db_connection()."""
+    breaker = get_breaker()
+    if not breaker.allow_request():
+        return None
+
+    deadline = time.monotonic() + ACQUIRE_CONFIG['budget']
+    attempt = 0
+    while True:
         try:
-            conn = psycopg2.connect(**DB_CONFIG)
+            conn = get_pool().checkout(timeout=max(deadline - time.monotonic(), 0))
+            breaker.record_success()
             return conn
-        except psycopg2.OperationalError:
-            print(f"DB connection attempt {attempt + 1} failed. Retrying in {retry_delay}s...")
-            time.sleep(retry_delay)
-    print("❌ Could not connect to the database after retries.")
-    return None
-
-def init_db():
-    """Initialize all database tables if they don't exist."""
+        except PoolTimeout as e:
+            # The pool is saturated, the database itself may well be fine
+            print(f"❌ {e}")
+            return None
+        except psycopg2.OperationalError as e:
+            breaker.record_failure()
+            if not breaker.allow_request():
+                return None
+            delay = backoff_delay(attempt, ACQUIRE_CONFIG['backoff_base'], ACQUIRE_CONFIG['backoff_max'])
+            if time.monotonic() + delay >= deadline:
+                print(f"❌ Could not connect to the database within {ACQUIRE_CONFIG['budget']}s: {e}")
+                return None
+            print(f"DB connection attempt {attempt + 1} failed. Retrying in {delay:.2f}s...")
+            time.sleep(delay)
+            attempt += 1
+
+def db_unavailable():
+    """503 response for handlers that could not obtain a database connection."""
+    response = jsonify({'success': False, 'message': 'Database temporarily unavailable'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(get_breaker().retry_after())
+    return response
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection for the duration of a with-block.
+
+    Yields None when no connection could be obtained. Anything left
+    uncommitted when the block exits is rolled back before the connection
+    goes back to the pool.
+    """
     conn = get_db_connection()
-    if conn:
-        try:
-            cur = conn.cursor()
-            
-            # 1) Users Table
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS Users (
-                    UserId VARCHAR(10) PRIMARY KEY,
-                    Username VARCHAR(30) UNIQUE NOT NULL,
-                    Email VARCHAR(50) UNIQUE NOT NULL,
-                    PasswordHash VARCHAR(255) UNIQUE NOT NULL,
-                    CreationTime TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                    AdminIndicator BOOLEAN NOT NULL DEFAULT FALSE
-                );
-            ''')
-            
-            # 2) Author Table
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS Author (
-                    AuthorId SERIAL PRIMARY KEY,
-                    AuthorName VARCHAR(50) NOT NULL,
-                    AuthorBio VARCHAR(500)
-                );
-            ''')
-            
-            # 3) Publisher Table
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS Publisher (
-                    PublisherId SERIAL PRIMARY KEY,
-                    PublisherName VARCHAR(50) NOT NULL UNIQUE
-                );
-            ''')
-            
-            # 4) Books Table
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS Books (
-                    BookId SERIAL PRIMARY KEY,
-                    Name VARCHAR(50) NOT NULL,
-                    authorID INT NOT NULL,
-                    category VARCHAR(50) NOT NULL,
-                    genre VARCHAR(50) NOT NULL,
-                    publisherID INT,
-                    publishdate DATE NOT NULL,
-                    language VARCHAR(30) NOT NULL,
-                    pagecount INT NOT NULL,
-                    copiesavailable INT NOT NULL,
-                    imglink VARCHAR(255),
-                    ratedType VARCHAR(20) NOT NULL,
-                    description TEXT,
-                    CONSTRAINT fk_author FOREIGN KEY (authorID) REFERENCES Author(AuthorId),
-                    CONSTRAINT fk_publisher FOREIGN KEY (publisherID) REFERENCES Publisher(PublisherId)
-                );
-            ''')
-            
-            # 5) Bookings Table
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS Bookings (
-                    BookingId SERIAL PRIMARY KEY,
-                    UserId VARCHAR(10) NOT NULL,
-                    BookId INT NOT NULL,
-                    BookingDate TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                    dueDate TIMESTAMP NOT NULL,
-                    CurrentlyBookedIndicator BOOLEAN NOT NULL DEFAULT TRUE,
-                    pendingReturnIndicator BOOLEAN NOT NULL DEFAULT FALSE,
-                    CONSTRAINT fk_user_booking FOREIGN KEY (UserId) REFERENCES Users(UserId),
-                    CONSTRAINT fk_book_booking FOREIGN KEY (BookId) REFERENCES Books(BookId)
-                );
-            ''')
-            
-            # 6) Reservations Table
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS Reservations (
-                    ReservationId SERIAL PRIMARY KEY,
-                    UserId VARCHAR(10) NOT NULL,
-                    BookId INT NOT NULL,
-                    ReservationDate TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                    CONSTRAINT fk_user_reservation FOREIGN KEY (UserId) REFERENCES Users(UserId),
-                    CONSTRAINT fk_book_reservation FOREIGN KEY (BookId) REFERENCES Books(BookId)
-                );
-            ''')
-            
-            # 7) Reviews Table
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS Reviews (
-                    BookID INT NOT NULL,
-                    UserId VARCHAR(10) NOT NULL,
-                    Rating INT NOT NULL CHECK (Rating >= 1 AND Rating <= 5),
-                    ReviewDate TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                    ReviewDescription TEXT,
-                    PRIMARY KEY (BookID, UserId),
-                    CONSTRAINT fk_book_review FOREIGN KEY (BookID) REFERENCES Books(BookId),
-                    CONSTRAINT fk_user_review FOREIGN KEY (UserId) REFERENCES Users(UserId)
-                );
-            ''')
-            
-            # 8) TransactionHistory Table
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS TransactionHistory (
-                    TransactionId SERIAL PRIMARY KEY,
-                    UserId VARCHAR(10) NOT NULL,
-                    BookId INT NOT NULL,
-                    TransactionDate TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                    ReservedIndicator BOOLEAN NOT NULL,
-                    CONSTRAINT fk_user_transaction FOREIGN KEY (UserId) REFERENCES Users(UserId),
-                    CONSTRAINT fk_book_transaction FOREIGN KEY (BookId) REFERENCES Books(BookId)
-                );
-            ''')
-            
-            cur.execute('CREATE INDEX IF NOT EXISTS idx_username ON Users(Username);')
-            cur.execute('CREATE INDEX IF NOT EXISTS idx_email ON Users(Email);')
-            cur.execute('CREATE INDEX IF NOT EXISTS idx_userid_bookings ON Bookings(UserId);')
-            cur.execute('CREATE INDEX IF NOT EXISTS idx_bookid_bookings ON Bookings(BookId);')
-            cur.execute('CREATE INDEX IF NOT EXISTS idx_userid_reservations ON Reservations(UserId);')
-            cur.execute('CREATE INDEX IF NOT EXISTS idx_bookid_reservations ON Reservations(BookId);')
-            cur.execute('CREATE INDEX IF NOT EXISTS idx_bookid_reviews ON Reviews(BookID);')
-            cur.execute('CREATE INDEX IF NOT EXISTS idx_userid_reviews ON Reviews(UserId);')
-            cur.execute('CREATE INDEX IF NOT EXISTS idx_userid_transactions ON TransactionHistory(UserId);')
-            cur.execute('CREATE INDEX IF NOT EXISTS idx_bookid_transactions ON TransactionHistory(BookId);')
-            
-            conn.commit()
-            print("✅ Database initialized successfully with all tables.")
-        except Exception as e:
-            print(f"❌ Database initialization error: {e}")
-            conn.rollback()
-        finally:
-            cur.close()
+    try:
+        yield conn
+    finally:
+        if conn:
             conn.close()
-    else:
-        print("❌ Database connection not available during init.")
@@ -0,0 +1,318 @@
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+# Upper bounds (in milliseconds) of the checkout latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the checkout timeout."""
+
+
+class TimedCursor:
+    """Proxy around a psycopg2 cursor that reports every statement it runs and how long it took."""
+
+    def __init__(self, raw, observer):
+        object.__setattr__(self, '_raw', raw)
+        object.__setattr__(self, '_observer', observer)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._raw, name, value)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __enter__(self):
+        self._raw.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._raw.__exit__(*exc_info)
+
+    def _timed(self, method, args, statement, params=None):
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = getattr(self._raw, method)(*args)
+            ok = True
+            return result
+        finally:
+            self._observer(self._raw, method, statement, params, time.perf_counter() - start, ok)
+
+    def execute(self, query, vars=None):
+        return self._timed('execute', (query, vars), query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._timed('executemany', (query, vars_list), query, vars_list)
+
+    def callproc(self, procname, parameters=None):
+        return self._timed('callproc', (procname, parameters), procname, parameters)
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._timed('copy_expert', (sql, file, size), sql)
+
+
+class PooledConnection:
+    """Proxy around a psycopg2 connection whose close() hands it back to the pool."""
+
+    def __init__(self, pool, raw):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_raw', raw)
+        object.__setattr__(self, '_created_at', time.monotonic())
+        object.__setattr__(self, '_last_used', time.monotonic())
+        object.__setattr__(self, '_uses', 0)
+        object.__setattr__(self, '_checked_out', False)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._raw, name, value)
+
+    def cursor(self, *args, **kwargs):
+        cur = self._raw.cursor(*args, **kwargs)
+        observer = self._pool.query_observer
+        return TimedCursor(cur, observer) if observer else cur
+
+    def close(self):
+        """Return the connection to the pool instead of closing the socket."""
+        if self._checked_out:
+            self._pool.release(self)
+
+
+class ConnectionPool:
+    """Thread-safe, per-process pool of psycopg2 connections.
+
+    Connections are health-checked when they are handed out after sitting
+    idle, and recycled once they exceed ``max_uses`` checkouts or ``max_age``
+    seconds so that server-side memory and stale sessions do not accumulate.
+    If ``query_observer`` is given, it is called after every statement run on
+    a cursor of a pooled connection, as ``query_observer(cursor, method,
+    statement, params, seconds, ok)``.
+    """
+
+    def __init__(self, db_config, min_size=1, max_size=10, max_uses=1000, max_age=1800,
+                 timeout=5.0, health_check_after=30.0, query_observer=None):
+        self.db_config = dict(db_config)
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.query_observer = query_observer
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_ms_total = 0.0
+        self._wait_ms_max = 0.0
+        self._created = 0
+        self._recycled = 0
+        self._discarded = 0
+        self._latency_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._latency_sum_ms = 0.0
+
+    def _connect(self):
+        raw = psycopg2.connect(**self.db_config)
+        with self._cond:
+            self._created += 1
+        return PooledConnection(self, raw)
+
+    def _is_expired(self, conn):
+        if self.max_uses and conn._uses >= self.max_uses:
+            return True
+        return bool(self.max_age) and time.monotonic() - conn._created_at >= self.max_age
+
+    def _is_healthy(self, conn):
+        if conn._raw.closed:
+            return False
+        if time.monotonic() - conn._last_used < self.health_check_after:
+            return True
+        try:
+            cur = conn._raw.cursor()
+            cur.execute('SELECT 1')
+            cur.fetchone()
+            cur.close()
+            conn._raw.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn, recycled=False):
+        """Close a connection that is leaving the pool for good. Caller holds no lock."""
+        try:
+            conn._raw.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            if recycled:
+                self._recycled += 1
+            else:
+                self._discarded += 1
+            self._cond.notify()
+
+    def fill(self):
+        """Open connections until ``min_size`` are available. Failures are ignored."""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except psycopg2.OperationalError:
+                with self._cond:
+                    self._size -= 1
+                return
+            with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+
+    def checkout(self, timeout=None):
+        """Borrow a connection, waiting up to ``timeout`` seconds for one to be free."""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._idle:
+                        # LIFO keeps a small set of connections hot
+                        conn = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f'No database connection available within {timeout}s')
+                    waited = True
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif self._is_expired(conn):
+                self._discard(conn, recycled=True)
+                continue
+            elif not self._is_healthy(conn):
+                self._discard(conn)
+                continue
+
+            self._record_checkout(conn, start, waited)
+            return conn
+
+    def _record_checkout(self, conn, start, waited):
+        elapsed_ms = (time.monotonic() - start) * 1000
+        conn._checked_out = True
+        conn._uses += 1
+        with self._cond:
+            self._in_use += 1
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+                self._wait_ms_total += elapsed_ms
+                self._wait_ms_max = max(self._wait_ms_max, elapsed_ms)
+            self._latency_sum_ms += elapsed_ms
+            for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                if elapsed_ms <= bound:
+                    self._latency_buckets[i] += 1
+                    break
+            else:
+                self._latency_buckets[-1] += 1
+
+    def release(self, conn):
+        """Give a borrowed connection back, rolling back anything left uncommitted."""
+        if not conn._checked_out:
+            return
+        conn._checked_out = False
+        conn._last_used = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+
+        raw = conn._raw
+        if raw.closed:
+            self._discard(conn)
+            return
+        try:
+            if raw.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                raw.rollback()
+            if raw.autocommit:
+                raw.autocommit = False
+        except psycopg2.Error:
+            self._discard(conn)
+            return
+
+        if self._is_expired(conn):
+            self._discard(conn, recycled=True)
+            return
+
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection; borrowed ones are closed when released."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn, recycled=True)
+
+    def stats(self):
+        """Return a snapshot of pool usage counters."""
+        with self._cond:
+            buckets = {str(bound): count for bound, count in zip(LATENCY_BUCKETS_MS, self._latency_buckets)}
+            buckets['+Inf'] = self._latency_buckets[-1]
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'wait_ms_total': round(self._wait_ms_total, 3),
+                'wait_ms_max': round(self._wait_ms_max, 3),
+                'connections_created': self._created,
+                'connections_recycled': self._recycled,
+                'connections_discarded': self._discarded,
+                'checkout_latency_ms': {
+                    'buckets': buckets,
+                    'count': self._checkouts,
+                    'sum': round(self._latency_sum_ms, 3)
+                }
+            }
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import os
+import queue
+import threading
+
+# NOTIFY channel the booking handlers publish on; the payload is a JSON
+# object with ``type``, ``booking_id``, ``user_id`` and ``book_id``
+BOOKING_EVENTS_CHANNEL = 'booking_events'
+
+# Threads per gunicorn worker; the Dockerfile passes the same variable to --threads
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", 8))
+# Every open stream holds one of the worker's threads, so by default streams
+# may take at most a quarter of them and the rest stay free for ordinary requests
+SSE_MAX_CLIENTS = int(os.getenv("SSE_MAX_CLIENTS", max(1, WORKER_THREADS // 4)))
+# Under the ASGI server a stream is a coroutine and a small queue, not a thread
+ASYNC_SSE_MAX_CLIENTS = int(os.getenv("ASYNC_SSE_MAX_CLIENTS", 10000))
+# Seconds between keep-alive comments, so proxies do not close an idle stream
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", 15))
+# Events buffered per client before the oldest are dropped
+SSE_QUEUE_SIZE = 100
+# Milliseconds the browser waits before reconnecting a dropped stream
+SSE_RETRY_MS = 3000
+
+
+def notify_booking_event(cur, event_type, booking_id, user_id, book_id):
+    """Queue a booking event inside the caller's transaction; Postgres delivers it only on commit."""
+    payload = json.dumps({
+        'type': event_type,
+        'booking_id': booking_id,
+        'user_id': user_id,
+        'book_id': book_id
+    })
+    cur.execute('SELECT pg_notify(%s, %s)', (BOOKING_EVENTS_CHANNEL, payload))
+
+
+class TooManyClients(Exception):
+    pass
+
+
+class EventBroker:
+    """Fans booking events out from the worker's NOTIFY listener to its open event streams.
+
+    Each subscriber gets its own bounded queue. A client that stops reading
+    loses its oldest events rather than holding memory, and since every
+    event only tells the client to reload, a dropped event costs nothing
+    that the next one does not make up for.
+    """
+
+    def __init__(self, max_clients=SSE_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._published = 0
+        self._rejected = 0
+
+    def subscribe(self):
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                self._rejected += 1
+                raise TooManyClients()
+            subscriber = queue.Queue(SSE_QUEUE_SIZE)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, payload):
+        """NOTIFY callback: hand the raw JSON payload to every subscriber."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._published += 1
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait(payload)
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'clients': len(self._subscribers),
+                'max_clients': self.max_clients,
+                'published': self._published,
+                'rejected': self._rejected
+            }
+
+
+broker = EventBroker()
+
+
+def format_event(payload, user_id=None):
+    """The server-sent event for a NOTIFY payload, or None if it is malformed or for another user."""
+    try:
+        event = json.loads(payload)
+    except ValueError:
+        return None
+    if user_id is not None and event.get('user_id') != user_id:
+        return None
+    return f"event: {event.get('type', 'message')}\ndata: {payload}\n\n"
+
+
+def event_stream(subscriber, user_id=None):
+    """Yield server-sent events from ``subscriber`` until the client goes away.
+
+    With ``user_id`` only that user's events are sent. A comment line goes
+    out whenever the stream has been idle for SSE_KEEPALIVE seconds, which
+    is also how a closed connection is noticed and the subscriber released.
+    """
+    try:
+        yield f'retry: {SSE_RETRY_MS}\n\n'
+        while True:
+            try:
+                payload = subscriber.get(timeout=SSE_KEEPALIVE)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            message = format_event(payload, user_id)
+            if message:
+                yield message
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+class AsyncEventBroker:
+    """EventBroker for the ASGI server, whose subscribers are asyncio queues.
+
+    ``publish`` is still called on the NOTIFY listener's thread, so it only
+    hands the payload over to the event loop; the queues are touched on the
+    loop alone.
+    """
+
+    def __init__(self, max_clients=ASYNC_SSE_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._loop = None
+        self._subscribers = set()
+        self._published = 0
+        self._rejected = 0
+
+    def subscribe(self):
+        if len(self._subscribers) >= self.max_clients:
+            self._rejected += 1
+            raise TooManyClients()
+        self._loop = asyncio.get_running_loop()
+        subscriber = asyncio.Queue(SSE_QUEUE_SIZE)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.discard(subscriber)
+
+    def publish(self, payload):
+        """NOTIFY callback: deliver the payload on the loop the subscribers live on."""
+        self._published += 1
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._deliver, payload)
+
+    def _deliver(self, payload):
+        for subscriber in list(self._subscribers):
+            if subscriber.full():
+                subscriber.get_nowait()
+            subscriber.put_nowait(payload)
+
+    def stats(self):
+        return {
+            'clients': len(self._subscribers),
+            'max_clients': self.max_clients,
+            'published': self._published,
+            'rejected': self._rejected
+        }
+
+
+async_broker = AsyncEventBroker()
+
+
+async def async_event_stream(subscriber, user_id=None):
+    """event_stream for an AsyncEventBroker subscriber. The caller unsubscribes when the client leaves."""
+    yield f'retry: {SSE_RETRY_MS}\n\n'
+    while True:
+        try:
+            payload = await asyncio.wait_for(subscriber.get(), SSE_KEEPALIVE)
+        except asyncio.TimeoutError:
+            yield ': keepalive\n\n'
+            continue
+        message = format_event(payload, user_id)
+        if message:
+            yield message
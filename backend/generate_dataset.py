@@ -0,0 +1,397 @@
+"""Fill an empty database with a large, referentially consistent synthetic dataset.
+
+Generates users, authors, publishers and books, then reviews, active
+bookings, reservations and years of transaction history. Book popularity
+follows a Zipf distribution, so a few titles get most of the activity, as
+in a real library. Active bookings never exceed a title's stock and are
+taken off copiesavailable. Rows are loaded with COPY by parallel worker
+processes, one chunk per process at a time, with the per-row triggers off;
+ratings, search vectors and suggestion indexes are rebuilt once at the end.
+The same --seed always produces the same data.
+
+    python generate_dataset.py --books 100000
+    python generate_dataset.py --books 500000 --jobs 8     # about 12M rows
+
+Every synthetic user has the password given by --password (default
+"password"), hashed with a single PBKDF2 iteration so millions can be made
+quickly. Log in as synth1, synth2, ... Run migrations.py first.
+"""
+import argparse
+import hashlib
+import io
+import math
+import os
+import random
+import sys
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+import psycopg2
+from db_helper import DB_CONFIG
+from suggest import REBUILD_PAYLOAD, SUGGESTION_CHANNEL, SUGGESTION_NOTIFY_SETTING
+
+# Rows generated and copied per task
+CHUNK_SIZE = 100000
+# Skew of book popularity: the book of rank r is picked with weight 1 / r ** ZIPF_EXPONENT
+ZIPF_EXPONENT = 1.1
+
+FIRST_NAMES = ('Ada', 'Alan', 'Amara', 'Boris', 'Chen', 'Clara', 'Dmitri', 'Elena', 'Farah', 'Gabriel', 'Hana',
+               'Ivan', 'Jonas', 'Keiko', 'Lena', 'Mateo', 'Nadia', 'Omar', 'Priya', 'Rafael', 'Sofia', 'Tomas',
+               'Una', 'Victor', 'Wen', 'Yusuf', 'Zara')
+LAST_NAMES = ('Abbott', 'Baker', 'Castillo', 'Dubois', 'Eriksen', 'Fischer', 'Garcia', 'Haddad', 'Ito', 'Jensen',
+              'Kowalski', 'Laurent', 'Moreau', 'Nakamura', 'Okafor', 'Petrov', 'Quinn', 'Rossi', 'Schmidt',
+              'Tanaka', 'Umarov', 'Valdez', 'Weber', 'Xu', 'Yilmaz', 'Zhang')
+PUBLISHER_WORDS = ('Harbor', 'Lantern', 'Meridian', 'Northwind', 'Oak', 'Pinecrest', 'Quill', 'Riverside',
+                   'Saltmarsh', 'Tidewater', 'Upland', 'Vantage', 'Willow')
+PUBLISHER_SUFFIXES = ('Press', 'Books', 'House', 'Publishing', 'Editions')
+TITLE_WORDS = ('Shadow', 'River', 'Empire', 'Garden', 'Winter', 'Secret', 'Silent', 'Lost', 'Golden', 'Broken',
+               'Light', 'Storm', 'Kingdom', 'Memory', 'Glass', 'Iron', 'Summer', 'Night', 'Ocean', 'Fire',
+               'Stone', 'Crown', 'Letters', 'Machine', 'Orchard', 'Harvest', 'Island', 'Mirror', 'Song', 'City')
+DESCRIPTION_WORDS = ('a', 'the', 'of', 'journey', 'family', 'war', 'love', 'betrayal', 'discovery', 'young',
+                     'old', 'village', 'detective', 'mystery', 'history', 'science', 'future', 'past', 'friendship',
+                     'struggle', 'hope', 'across', 'between', 'generations', 'truth', 'power', 'home', 'sea')
+CATEGORIES = {'Fiction': ('Fantasy', 'Mystery', 'Romance', 'Science Fiction', 'Thriller', 'Historical'),
+              'Non-Fiction': ('Biography', 'History', 'Science', 'Self-Help', 'Travel'),
+              'Children': ('Picture Book', 'Adventure', 'Fairy Tale'),
+              'Academic': ('Mathematics', 'Computer Science', 'Philosophy', 'Economics')}
+LANGUAGES = (('English', 70), ('Spanish', 10), ('French', 8), ('German', 6), ('Japanese', 4), ('Arabic', 2))
+RATED_TYPES = ('General', 'PG', 'Teen', 'Mature')
+# Ratings lean positive, as real reviews do
+RATING_WEIGHTS = (4, 6, 15, 35, 40)
+SALT_CHARACTERS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+# Target table and column list of each COPY; ids are explicit where other tables refer to them
+COPY_TARGETS = {
+    'authors': ('Author', ('AuthorId', 'AuthorName', 'AuthorBio')),
+    'publishers': ('Publisher', ('PublisherId', 'PublisherName')),
+    'users': ('Users', ('UserId', 'Username', 'Email', 'PasswordHash', 'CreationTime', 'AdminIndicator')),
+    'books': ('Books', ('BookId', 'Name', 'authorID', 'category', 'genre', 'publisherID', 'publishdate',
+                        'language', 'pagecount', 'copiesavailable', 'ratedType', 'description')),
+    'reviews': ('Reviews', ('BookID', 'UserId', 'Rating', 'ReviewDate', 'ReviewDescription')),
+    'bookings': ('Bookings', ('UserId', 'BookId', 'BookingDate', 'dueDate', 'CurrentlyBookedIndicator',
+                              'pendingReturnIndicator')),
+    'reservations': ('Reservations', ('UserId', 'BookId', 'ReservationDate')),
+    'history': ('TransactionHistory', ('UserId', 'BookId', 'TransactionDate', 'ReservedIndicator')),
+}
+
+# Rebuilds the rating aggregates in one pass; the per-row trigger is off during the Reviews load
+REFRESH_RATINGS = '''
+    UPDATE Books b SET
+        review_count = r.review_count,
+        rating_sum = r.rating_sum,
+        rating_histogram = r.rating_histogram,
+        average_rating = r.average_rating
+    FROM (
+        SELECT BookID,
+            COUNT(*) AS review_count,
+            SUM(Rating) AS rating_sum,
+            ARRAY[COUNT(*) FILTER (WHERE Rating = 1), COUNT(*) FILTER (WHERE Rating = 2),
+                  COUNT(*) FILTER (WHERE Rating = 3), COUNT(*) FILTER (WHERE Rating = 4),
+                  COUNT(*) FILTER (WHERE Rating = 5)]::int[] AS rating_histogram,
+            ROUND(AVG(Rating)::numeric, 2) AS average_rating
+        FROM Reviews
+        GROUP BY BookID
+    ) r
+    WHERE b.BookId = r.BookID
+'''
+
+# Books are generated with their total stock in copiesavailable. Bookings
+# beyond a title's stock are dropped, latest first, and the rest are taken
+# off the shelf, as checkouts would have done.
+TRIM_BOOKINGS = '''
+    DELETE FROM Bookings WHERE BookingId IN (
+        SELECT BookingId FROM (
+            SELECT bk.BookingId, b.copiesavailable AS stock,
+                ROW_NUMBER() OVER (PARTITION BY bk.BookId ORDER BY bk.BookingDate, bk.BookingId) AS n
+            FROM Bookings bk
+            JOIN Books b ON b.BookId = bk.BookId
+            WHERE bk.CurrentlyBookedIndicator
+        ) ranked
+        WHERE n > stock
+    )
+'''
+
+CHECK_OUT_BOOKED_COPIES = '''
+    UPDATE Books b SET copiesavailable = b.copiesavailable - c.booked
+    FROM (SELECT BookId, COUNT(*) AS booked FROM Bookings WHERE CurrentlyBookedIndicator GROUP BY BookId) c
+    WHERE b.BookId = c.BookId
+'''
+
+# Builds every search_vector in one pass, as books_search_vector_refresh() would
+# row by row; that trigger is off during the Books load
+REFRESH_SEARCH_VECTORS = '''
+    UPDATE Books b SET search_vector =
+        setweight(to_tsvector('simple', COALESCE(b.Name, '')), 'A') ||
+        setweight(to_tsvector('simple', COALESCE(a.AuthorName, '')), 'B') ||
+        setweight(to_tsvector('simple', COALESCE(p.PublisherName, '')), 'C') ||
+        setweight(to_tsvector('simple', COALESCE(b.genre, '') || ' ' || COALESCE(b.category, '')), 'C') ||
+        setweight(to_tsvector('simple', COALESCE(b.description, '')), 'D')
+    FROM Books bk
+    LEFT JOIN Author a ON a.AuthorId = bk.authorID
+    LEFT JOIN Publisher p ON p.PublisherId = bk.publisherID
+    WHERE b.BookId = bk.BookId
+'''
+
+# Per-row triggers switched off for the load and replaced by the passes above
+DISABLED_TRIGGERS = (('Reviews', 'trg_reviews_rating'), ('Books', 'trg_books_search_vector'))
+
+
+def user_id(n):
+    return f'SYN{n:07d}'
+
+
+def password_hash(password, rng):
+    """A hash werkzeug's check_password_hash() accepts, with one PBKDF2 iteration and a seeded salt."""
+    salt = ''.join(rng.choice(SALT_CHARACTERS) for _ in range(16))
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 1).hex()
+    return f'pbkdf2:sha256:1${salt}${digest}'
+
+
+class Popularity:
+    """Draws book ids with Zipf-distributed popularity.
+
+    Popularity rank r maps to book id ``(r * stride) % books + 1`` for a
+    stride coprime with the number of books, so the best sellers are spread
+    over the id range rather than being the first ids inserted.
+    """
+
+    def __init__(self, books, exponent=ZIPF_EXPONENT):
+        self.books = books
+        self.cumulative = list(accumulate(rank ** -exponent for rank in range(1, books + 1)))
+        stride = int(books * 0.618) | 1
+        while math.gcd(stride, books) != 1:
+            stride += 2
+        self.stride = stride
+
+    def book(self, rng):
+        rank = bisect_left(self.cumulative, rng.random() * self.cumulative[-1])
+        return (rank * self.stride) % self.books + 1
+
+
+_popularity = None
+
+
+def popularity(books):
+    """This process's Popularity, built once per worker."""
+    global _popularity
+    if _popularity is None or _popularity.books != books:
+        _popularity = Popularity(books)
+    return _popularity
+
+
+def _timestamp(rng, start, end):
+    return datetime.fromtimestamp(rng.uniform(start.timestamp(), end.timestamp())).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _sentence(rng, low, high):
+    return ' '.join(rng.choice(DESCRIPTION_WORDS) for _ in range(rng.randint(low, high))).capitalize() + '.'
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value)
+
+
+def generate_rows(kind, start, end, settings, rng):
+    """Yield the rows of one chunk: ids ``start`` to ``end - 1`` of the chunk's driving entity."""
+    now = settings['now']
+    history_start = now - timedelta(days=365 * settings['years'])
+    books = settings['books']
+    users = settings['users']
+
+    if kind == 'authors':
+        for n in range(start, end):
+            name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {n}'
+            yield n, name, _sentence(rng, 8, 20)
+    elif kind == 'publishers':
+        for n in range(start, end):
+            yield n, f'{rng.choice(PUBLISHER_WORDS)} {rng.choice(PUBLISHER_SUFFIXES)} {n}'
+    elif kind == 'users':
+        for n in range(start, end):
+            yield (user_id(n), f'synth{n}', f'synth{n}@example.com', password_hash(settings['password'], rng),
+                   _timestamp(rng, history_start, now), False)
+    elif kind == 'books':
+        languages, language_weights = zip(*LANGUAGES)
+        for n in range(start, end):
+            category = rng.choice(list(CATEGORIES))
+            title = ' '.join(rng.sample(TITLE_WORDS, rng.randint(1, 3)))
+            published = date(1950, 1, 1) + timedelta(days=rng.randrange((now.date() - date(1950, 1, 1)).days))
+            yield (n, f'The {title} {n}'[:50], rng.randint(1, settings['authors']), category,
+                   rng.choice(CATEGORIES[category]), rng.randint(1, settings['publishers']), published.isoformat(),
+                   rng.choices(languages, language_weights)[0], rng.randint(48, 960), rng.randint(0, 10),
+                   rng.choice(RATED_TYPES), _sentence(rng, 12, 40))
+    elif kind == 'reviews':
+        # Driven by user, so each chunk owns its users and (BookID, UserId) stays unique
+        pick = popularity(books)
+        mean = settings['reviews_per_user']
+        for n in range(start, end):
+            count = min(int(rng.expovariate(1 / mean)) if mean else 0, books)
+            reviewed = set()
+            while len(reviewed) < count:
+                reviewed.add(pick.book(rng))
+            for book_id in reviewed:
+                rating = rng.choices(range(1, 6), RATING_WEIGHTS)[0]
+                yield (book_id, user_id(n), rating, _timestamp(rng, history_start, now),
+                       _sentence(rng, 5, 25) if rng.random() < 0.6 else None)
+    elif kind == 'bookings':
+        # Driven by user, and a user holds at most one copy of a title at a time
+        pick = popularity(books)
+        for n in range(start, end):
+            if rng.random() >= settings['borrowing_share']:
+                continue
+            borrowed = set()
+            for _ in range(min(rng.randint(1, 3), books)):
+                book_id = pick.book(rng)
+                if book_id in borrowed:
+                    continue
+                borrowed.add(book_id)
+                booked = now - timedelta(days=rng.uniform(0, 28))
+                yield (user_id(n), book_id, booked.strftime('%Y-%m-%d %H:%M:%S'),
+                       (booked + timedelta(days=14)).strftime('%Y-%m-%d %H:%M:%S'), True, rng.random() < 0.05)
+    elif kind == 'reservations':
+        pick = popularity(books)
+        for n in range(start, end):
+            if rng.random() < settings['reserving_share']:
+                yield user_id(n), pick.book(rng), _timestamp(rng, now - timedelta(days=60), now)
+    elif kind == 'history':
+        # Driven by event number; users and books are drawn for each event
+        pick = popularity(books)
+        for _ in range(start, end):
+            yield (user_id(rng.randint(1, users)), pick.book(rng), _timestamp(rng, history_start, now),
+                   rng.random() < 0.1)
+
+
+def load_chunk(kind, start, end, settings):
+    """Generate one chunk and COPY it in. Runs in a worker process; returns (kind, rows)."""
+    rng = random.Random(f"{settings['seed']}:{kind}:{start}")
+    buffer = io.StringIO()
+    rows = 0
+    for row in generate_rows(kind, start, end, settings, rng):
+        buffer.write('\t'.join(_copy_value(value) for value in row))
+        buffer.write('\n')
+        rows += 1
+    buffer.seek(0)
+
+    table, columns = COPY_TARGETS[kind]
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        cur = conn.cursor()
+        # main() sends one rebuild notification instead of one per title
+        cur.execute("SELECT set_config(%s, 'off', true)", (SUGGESTION_NOTIFY_SETTING,))
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+        conn.commit()
+    finally:
+        conn.close()
+    return kind, rows
+
+
+def chunks(kind, total, chunk_size):
+    return [(kind, start, min(start + chunk_size, total + 1)) for start in range(1, total + 1, chunk_size)]
+
+
+def run_phase(pool, tasks, settings, totals):
+    started = time.monotonic()
+    futures = [pool.submit(load_chunk, kind, start, end, settings) for kind, start, end in tasks]
+    for future in futures:
+        kind, rows = future.result()
+        totals[kind] = totals.get(kind, 0) + rows
+    kinds = sorted({kind for kind, _, _ in tasks})
+    print(f"Loaded {', '.join(f'{kind} ({totals[kind]})' for kind in kinds)} in {time.monotonic() - started:.1f}s",
+          file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--users', type=int, help='default: half the number of books')
+    parser.add_argument('--authors', type=int, help='default: a tenth of the number of books')
+    parser.add_argument('--publishers', type=int, help='default: one per thousand books, at least 20')
+    parser.add_argument('--reviews-per-user', type=float, default=4)
+    parser.add_argument('--history-per-book', type=float, default=20, help='past loans and reservations per book')
+    parser.add_argument('--years', type=int, default=5, help='span of the transaction history')
+    parser.add_argument('--borrowing-share', type=float, default=0.3, help='users with books checked out now')
+    parser.add_argument('--reserving-share', type=float, default=0.1, help='users with a reservation now')
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--truncate', action='store_true', help='empty every table first (destroys all data)')
+    args = parser.parse_args()
+
+    settings = {
+        'books': args.books,
+        'users': args.users or max(args.books // 2, 1),
+        'authors': args.authors or max(args.books // 10, 1),
+        'publishers': args.publishers or max(args.books // 1000, 20),
+        'reviews_per_user': args.reviews_per_user,
+        'years': args.years,
+        'borrowing_share': args.borrowing_share,
+        'reserving_share': args.reserving_share,
+        'password': args.password,
+        'seed': args.seed,
+        # Fixed per seed, so reruns produce identical timestamps
+        'now': datetime(2024, 1, 1) + timedelta(days=args.seed % 365),
+    }
+    history_events = int(args.books * args.history_per_book)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    cur = conn.cursor()
+    if args.truncate:
+        cur.execute('TRUNCATE Reviews, Bookings, Reservations, TransactionHistory, Books, Author, Publisher, Users '
+                    'RESTART IDENTITY CASCADE')
+    cur.execute('SELECT EXISTS (SELECT 1 FROM Books) OR EXISTS (SELECT 1 FROM Author) '
+                'OR EXISTS (SELECT 1 FROM Publisher) OR EXISTS (SELECT 1 FROM Users)')
+    if cur.fetchone()[0]:
+        sys.exit('The database already has data; generated ids would collide. Use --truncate to empty it first.')
+    # One set-based pass afterwards instead of work for every row loaded
+    for table, trigger in DISABLED_TRIGGERS:
+        cur.execute(f'ALTER TABLE {table} DISABLE TRIGGER {trigger}')
+    conn.commit()
+
+    totals = {}
+    started = time.monotonic()
+    try:
+        with ProcessPoolExecutor(args.jobs) as pool:
+            run_phase(pool, chunks('authors', settings['authors'], args.chunk_size)
+                      + chunks('publishers', settings['publishers'], args.chunk_size)
+                      + chunks('users', settings['users'], args.chunk_size), settings, totals)
+            run_phase(pool, chunks('books', settings['books'], args.chunk_size), settings, totals)
+            run_phase(pool, chunks('reviews', settings['users'], args.chunk_size)
+                      + chunks('bookings', settings['users'], args.chunk_size)
+                      + chunks('reservations', settings['users'], args.chunk_size)
+                      + chunks('history', history_events, args.chunk_size), settings, totals)
+
+        cur.execute("SELECT set_config(%s, 'off', true)", (SUGGESTION_NOTIFY_SETTING,))
+        cur.execute(TRIM_BOOKINGS)
+        totals['bookings'] -= cur.rowcount
+        cur.execute(CHECK_OUT_BOOKED_COPIES)
+        cur.execute(REFRESH_RATINGS)
+        cur.execute(REFRESH_SEARCH_VECTORS)
+        # Every running API worker reloads its suggestion index once this commits
+        cur.execute('SELECT pg_notify(%s, %s)', (SUGGESTION_CHANNEL, REBUILD_PAYLOAD))
+        for table, column in (('Author', 'AuthorId'), ('Publisher', 'PublisherId'), ('Books', 'BookId')):
+            cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', '{column.lower()}'), "
+                        f"(SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}), false)")
+        conn.commit()
+    finally:
+        conn.rollback()
+        for table, trigger in DISABLED_TRIGGERS:
+            cur.execute(f'ALTER TABLE {table} ENABLE TRIGGER {trigger}')
+        conn.commit()
+
+    conn.autocommit = True
+    cur.execute('ANALYZE')
+    conn.close()
+    print(f"Generated {sum(totals.values())} rows in {time.monotonic() - started:.1f}s", file=sys.stderr)
+    for kind, rows in totals.items():
+        print(f'{kind}\t{rows}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+IMAGE_DIR = os.getenv("IMAGE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'image_store'))
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", 5 * 1024 * 1024))
+# Thumbnails fit inside this box, keeping the cover's aspect ratio
+THUMBNAIL_SIZE = (int(os.getenv("THUMBNAIL_WIDTH", 200)), int(os.getenv("THUMBNAIL_HEIGHT", 300)))
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Leading bytes of the formats accepted as covers
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+
+class ImageError(ValueError):
+    pass
+
+
+class UnsupportedImageType(ImageError):
+    """The data is not one of the accepted image formats; uploads answer it with a 415."""
+
+
+def sniff_mimetype(head):
+    """Image type from a file's first bytes, or None if it is not an accepted format."""
+    for signature, mimetype in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def is_digest(value):
+    return bool(value) and DIGEST_PATTERN.match(value) is not None
+
+
+def image_path(digest, thumbnail=False):
+    """Where an image lives: fanned out by the first two hex digits so no directory grows too large."""
+    name = f'{digest}.thumb.jpg' if thumbnail else digest
+    return os.path.join(IMAGE_DIR, digest[:2], name)
+
+
+def _write_atomically(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # Readers only ever see a missing file or a complete one
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _render_thumbnail(source):
+    """JPEG thumbnail bytes for an image file or file object, or None if Pillow is not installed.
+
+    Raises ImageError for anything Pillow cannot decode, including images
+    whose pixel count marks them as decompression bombs.
+    """
+    try:
+        from PIL import Image  # only needed for thumbnails
+    except ImportError:
+        return None
+    buffer = io.BytesIO()
+    try:
+        with Image.open(source) as image:
+            image.thumbnail(THUMBNAIL_SIZE)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            image.save(buffer, 'JPEG', quality=85, optimize=True)
+    except (Image.DecompressionBombError, OSError, SyntaxError, ValueError) as e:
+        raise ImageError(f'Image could not be decoded: {e}')
+    return buffer.getvalue()
+
+
+def make_thumbnail(digest):
+    """Write the image's JPEG thumbnail. Returns False if Pillow is not installed or cannot decode it."""
+    try:
+        thumbnail = _render_thumbnail(image_path(digest))
+    except ImageError as e:
+        print(f"Thumbnail error for {digest}: {e}")
+        return False
+    if thumbnail is None:
+        return False
+    _write_atomically(image_path(digest, thumbnail=True), thumbnail)
+    return True
+
+
+def store_image(data):
+    """Store image bytes under their SHA-256 and build the thumbnail. Returns ``(digest, created)``.
+
+    Storing the same cover twice keeps one copy; since a digest always
+    names the same bytes, files are never rewritten once they exist.
+    """
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ImageError(f'Image is larger than {MAX_IMAGE_BYTES} bytes')
+    if sniff_mimetype(data[:16]) is None:
+        raise UnsupportedImageType('Image must be JPEG, PNG, GIF or WebP')
+    # Decoded before anything is written, so a corrupt file or a decompression bomb is refused, not stored
+    thumbnail = _render_thumbnail(io.BytesIO(data))
+
+    digest = hashlib.sha256(data).hexdigest()
+    path = image_path(digest)
+    created = not os.path.exists(path)
+    if created:
+        _write_atomically(path, data)
+    thumbnail_path = image_path(digest, thumbnail=True)
+    if thumbnail is not None and not os.path.exists(thumbnail_path):
+        _write_atomically(thumbnail_path, thumbnail)
+    return digest, created
+
+
+def store_data_uri(uri):
+    """Store a ``data:image/...;base64,...`` URI. Returns the digest."""
+    header, _, payload = uri.partition(',')
+    if not header.startswith('data:image/') or not header.endswith(';base64'):
+        raise ImageError('Only base64 data:image URIs can be stored')
+    try:
+        data = base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        raise ImageError('Invalid base64 in data URI')
+    return store_image(data)[0]
+
+
+def cover_fields(data):
+    """Move an inline ``imglink`` data URI from a book payload into the store, setting ``cover_hash``.
+
+    Also checks that a ``cover_hash`` given directly names a stored image.
+    """
+    imglink = data.get('imglink')
+    if isinstance(imglink, str) and imglink.startswith('data:'):
+        data['cover_hash'] = store_data_uri(imglink)
+        data['imglink'] = None
+    cover_hash = data.get('cover_hash')
+    if cover_hash is not None and not (is_digest(cover_hash) and os.path.exists(image_path(cover_hash))):
+        raise ImageError('cover_hash does not name a stored image')
+    return data
+
+
+def move_inline_covers(conn):
+    """Move every Books.imglink data URI into the store. Returns the number of books updated."""
+    read = conn.cursor(name='inline_covers')
+    read.execute("SELECT BookId, imglink FROM Books WHERE imglink LIKE 'data:%'")
+    moved = []
+    for book_id, imglink in read:
+        try:
+            moved.append((store_data_uri(imglink), book_id))
+        except ImageError as e:
+            print(f"Book {book_id}: {e}")
+    read.close()
+
+    cur = conn.cursor()
+    cur.executemany('UPDATE Books SET cover_hash = %s, imglink = NULL WHERE BookId = %s', moved)
+    conn.commit()
+    cur.close()
+    return len(moved)
+
+
+if __name__ == '__main__':
+    from db_helper import db_connection
+
+    with db_connection() as conn:
+        if not conn:
+            raise SystemExit('Database unavailable')
+        print(f"Moved {move_inline_covers(conn)} inline covers into {IMAGE_DIR}")
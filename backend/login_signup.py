@@ -1,33 +1,27 @@
 import secrets
 import string
 
-from db_helper import get_db_connection
+from cache import catalogue_cache
+from conditional import table_versions
+from db_helper import db_connection, db_unavailable, get_pool_stats
+from events import async_broker, broker
 from flask import Blueprint, jsonify, request
+from notifications import listener
 from psycopg2.extras import RealDictCursor
 from werkzeug.security import check_password_hash, generate_password_hash
 
 auth_bp = Blueprint('auth', __name__)
 
-def generate_user_id():
+def generate_user_id(cur):
     """Generate a unique 10-character UserId"""
     max_attempts = 10
     for _ in range(max_attempts):
         user_id = ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(10))
         
-        conn = get_db_connection()
-        if conn:
-            try:
-                cur = conn.cursor()
-                cur.execute('SELECT UserId FROM Users WHERE UserId = %s', (user_id,))
-                if not cur.fetchone():
-                    cur.close()
-                    conn.close()
-                    return user_id
-                cur.close()
-            except Exception:
-                pass
-            finally:
-                conn.close()
+        # A failed query aborts the request's transaction, so it is not retried here
+        cur.execute('SELECT UserId FROM Users WHERE UserId = %s', (user_id,))
+        if not cur.fetchone():
+            return user_id
     
     import time
     return f"USR{int(time.time()) % 1000000000:010d}"[:10]
@@ -55,42 +49,37 @@ def signup():
         
         password_hash = generate_password_hash(password)
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({
-                'success': False,
-                'message': 'Database connection failed'
-            }), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor()
+            cur = conn.cursor()
         
-        cur.execute('SELECT UserId FROM Users WHERE Username = %s OR Email = %s', (username, email))
-        existing_user = cur.fetchone()
+            cur.execute('SELECT UserId FROM Users WHERE Username = %s OR Email = %s', (username, email))
+            existing_user = cur.fetchone()
         
-        if existing_user:
+            if existing_user:
+                cur.close()
+                return jsonify({
+                    'success': False,
+                    'message': 'Username or email already exists'
+                }), 409
+        
+            user_id = generate_user_id(cur)
+        
+            cur.execute(
+                'INSERT INTO Users (UserId, Username, Email, PasswordHash, AdminIndicator) VALUES (%s, %s, %s, %s, %s) RETURNING UserId',
+                (user_id, username, email, password_hash, admin_indicator)
+            )
+            returned_user_id = cur.fetchone()[0]
+            conn.commit()
             cur.close()
-            conn.close()
-            return jsonify({
-                'success': False,
-                'message': 'Username or email already exists'
-            }), 409
-        
-        user_id = generate_user_id()
-        
-        cur.execute(
-            'INSERT INTO Users (UserId, Username, Email, PasswordHash, AdminIndicator) VALUES (%s, %s, %s, %s, %s) RETURNING UserId',
-            (user_id, username, email, password_hash, admin_indicator)
-        )
-        returned_user_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
         
-        return jsonify({
-            'success': True,
-            'message': 'User registered successfully',
-            'user_id': returned_user_id
-        }), 201
+            return jsonify({
+                'success': True,
+                'message': 'User registered successfully',
+                'user_id': returned_user_id
+            }), 201
         
     except Exception as e:
         print(f"Signup error: {e}")
@@ -114,22 +103,18 @@ def login():
         username = data['username']
         password = data['password']
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({
-                'success': False,
-                'message': 'Database connection failed'
-            }), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur = conn.cursor(cursor_factory=RealDictCursor)
         
-        cur.execute(
-            'SELECT * FROM Users WHERE Username = %s',
-            (username,)
-        )
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
+            cur.execute(
+                'SELECT * FROM Users WHERE Username = %s',
+                (username,)
+            )
+            user = cur.fetchone()
+            cur.close()
         
         if not user:
             return jsonify({
@@ -180,44 +165,43 @@ def change_password():
                 'message': 'New password must be at least 8 characters long'
             }), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        with db_connection() as conn:
+            if not conn:
+                return db_unavailable()
         
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
         
-        cursor.execute(
-            'SELECT UserId, PasswordHash FROM Users WHERE Username = %s',
-            (username,)
-        )
-        user = cursor.fetchone()
+            cursor.execute(
+                'SELECT UserId, PasswordHash FROM Users WHERE Username = %s',
+                (username,)
+            )
+            user = cursor.fetchone()
         
-        if not user:
-            return jsonify({
-                'success': False,
-                'message': 'User not found'
-            }), 404
+            if not user:
+                return jsonify({
+                    'success': False,
+                    'message': 'User not found'
+                }), 404
         
-        if not check_password_hash(user['passwordhash'], current_password):
-            return jsonify({
-                'success': False,
-                'message': 'Current password is incorrect'
-            }), 401
+            if not check_password_hash(user['passwordhash'], current_password):
+                return jsonify({
+                    'success': False,
+                    'message': 'Current password is incorrect'
+                }), 401
         
-        new_password_hash = generate_password_hash(new_password)
-        cursor.execute(
-            'UPDATE Users SET PasswordHash = %s WHERE UserId = %s',
-            (new_password_hash, user['userid'])
-        )
+            new_password_hash = generate_password_hash(new_password)
+            cursor.execute(
+                'UPDATE Users SET PasswordHash = %s WHERE UserId = %s',
+                (new_password_hash, user['userid'])
+            )
         
-        conn.commit()
-        cursor.close()
-        conn.close()
+            conn.commit()
+            cursor.close()
         
-        return jsonify({
-            'success': True,
-            'message': 'Password changed successfully'
-        }), 200
+            return jsonify({
+                'success': True,
+                'message': 'Password changed successfully'
+            }), 200
         
     except Exception as e:
         print(f"Change password error: {e}")
@@ -229,10 +213,8 @@ def change_password():
 @auth_bp.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    conn = get_db_connection()
-    db_status = "connected" if conn else "disconnected"
-    if conn:
-        conn.close()
+    with db_connection() as conn:
+        db_status = "connected" if conn else "disconnected"
     
     return jsonify({
         'status': 'healthy',
@@ -240,3 +222,21 @@ def health():
         'database': db_status
     }), 200
 
+
+@auth_bp.route('/api/health/pool', methods=['GET'])
+def pool_stats():
+    """Connection pool statistics for this worker process"""
+    return jsonify({'success': True, 'pool': get_pool_stats()}), 200
+
+
+@auth_bp.route('/api/health/cache', methods=['GET'])
+def cache_stats():
+    """Catalogue cache and invalidation listener statistics for this worker process"""
+    return jsonify({
+        'success': True,
+        'cache': catalogue_cache.stats(),
+        'invalidation_listener': listener.stats(),
+        'table_versions': table_versions.stats(),
+        'booking_events': broker.stats(),
+        'async_booking_events': async_broker.stats()
+    }), 200
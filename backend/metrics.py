@@ -0,0 +1,271 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+
+from flask import Response, g, request
+from query_log import request_queries
+
+# Each worker process writes its metrics here and /metrics sums them. Keyed
+# by the parent process, so the workers of one gunicorn master share a
+# directory and a restarted server does not add in the last run's counts.
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), f'library-metrics-{os.getppid()}'))
+# Seconds between writes of a worker's metrics, so other workers' numbers are at most this old
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 1))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+EXPOSITION_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Metric:
+    """One metric family: a counter, gauge or histogram, with one value per label combination."""
+
+    def __init__(self, name, kind, documentation, labelnames=(), buckets=None):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if buckets else None
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+    def observe(self, labels, value):
+        with self._lock:
+            # Per-bucket counts followed by sum and count; made cumulative on export
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 3)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            samples = [[list(labels), list(value) if isinstance(value, list) else value]
+                       for labels, value in self._values.items()]
+        return {'kind': self.kind, 'help': self.documentation, 'labels': list(self.labelnames),
+                'buckets': list(self.buckets or ()), 'samples': samples}
+
+
+class Registry:
+    """This process's metrics, plus the files through which worker processes share them."""
+
+    def __init__(self, directory=METRICS_DIR):
+        self.directory = directory
+        self._metrics = {}
+        self._flushed_pid = None
+        self._flush_lock = threading.Lock()
+
+    def register(self, *args, **kwargs):
+        metric = Metric(*args, **kwargs)
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'{pid}.json')
+
+    def flush(self):
+        """Write this process's snapshot where the other workers can read it."""
+        with self._flush_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self._path(f'.{os.getpid()}')
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, self._path(os.getpid()))
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Metrics flush error: {e}")
+
+    def ensure_flusher(self):
+        """Start the flush thread once per process, including after a fork."""
+        pid = os.getpid()
+        if self._flushed_pid == pid:
+            return
+        with self._flush_lock:
+            if self._flushed_pid != pid:
+                threading.Thread(target=self._run_flusher, name='metrics-flush', daemon=True).start()
+                # A worker's last counts survive it stopping between flushes
+                atexit.register(self.flush)
+                self._flushed_pid = pid
+
+    def collect(self):
+        """Every worker's metrics merged: counters and histograms summed over all
+        processes that have run, including exited ones so totals never go
+        backwards, and gauges over the processes still alive."""
+        own_pid = os.getpid()
+        snapshots = [(own_pid, self.snapshot())]
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            if not name.endswith('.json') or not name[:-5].isdigit():
+                continue
+            pid = int(name[:-5])
+            if pid == own_pid:
+                continue
+            try:
+                with open(self._path(pid)) as f:
+                    snapshots.append((pid, json.load(f)))
+            except (OSError, ValueError):
+                continue
+
+        merged = {}
+        for pid, snapshot in snapshots:
+            alive = pid == own_pid or _process_alive(pid)
+            for name, family in snapshot.items():
+                if family['kind'] == 'gauge' and not alive:
+                    continue
+                target = merged.setdefault(name, {**family, 'samples': {}})
+                for labels, value in family['samples']:
+                    key = tuple(labels)
+                    current = target['samples'].get(key)
+                    if current is None:
+                        target['samples'][key] = value
+                    elif isinstance(value, list):
+                        target['samples'][key] = [a + b for a, b in zip(current, value)]
+                    else:
+                        target['samples'][key] = current + value
+        return merged
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def exposition(merged):
+    """Render merged metrics in the Prometheus text exposition format."""
+    lines = []
+    for name in sorted(merged):
+        family = merged[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        for labels, value in sorted(family['samples'].items()):
+            if family['kind'] != 'histogram':
+                lines.append(f"{name}{_labels(family['labels'], labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip([*family['buckets'], '+Inf'], value):
+                cumulative += count
+                le = f'le="{bound if bound == "+Inf" else float(bound)}"'
+                lines.append(f"{name}_bucket{_labels(family['labels'], labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(family['labels'], labels)} {_number(value[-2])}")
+            lines.append(f"{name}_count{_labels(family['labels'], labels)} {value[-1]}")
+    return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+ROUTE_LABELS = ('blueprint', 'route', 'method')
+requests_total = registry.register(
+    'http_requests_total', 'counter', 'HTTP requests completed.', ROUTE_LABELS + ('status',))
+request_duration = registry.register(
+    'http_request_duration_seconds', 'histogram', 'Time to produce the response.', ROUTE_LABELS, LATENCY_BUCKETS)
+requests_in_flight = registry.register(
+    'http_requests_in_flight', 'gauge', 'Requests being handled.', ROUTE_LABELS)
+response_size = registry.register(
+    'http_response_size_bytes', 'histogram', 'Response body size, where known before sending.',
+    ROUTE_LABELS, SIZE_BUCKETS)
+request_db_time = registry.register(
+    'http_request_db_seconds', 'histogram', 'Time a request spent in database statements.',
+    ROUTE_LABELS, LATENCY_BUCKETS)
+request_db_queries = registry.register(
+    'http_request_db_queries_total', 'counter', 'Database statements run by requests.', ROUTE_LABELS)
+db_acquire_time = registry.register(
+    'db_connection_acquire_seconds', 'histogram', 'Time to obtain a pooled connection, retries included.',
+    ('outcome',), LATENCY_BUCKETS)
+
+
+def _route_labels():
+    rule = request.url_rule
+    return (request.blueprint or '', rule.rule if rule else '<unmatched>', request.method)
+
+
+def record_acquire(seconds, acquired):
+    db_acquire_time.observe(('acquired' if acquired else 'unavailable',), seconds)
+
+
+def _before_request():
+    registry.ensure_flusher()
+    g.metrics_started = time.perf_counter()
+    g.metrics_labels = _route_labels()
+    requests_in_flight.inc(g.metrics_labels)
+
+
+def _after_request(response):
+    if 'metrics_started' not in g:
+        return response
+    labels = g.metrics_labels
+    requests_total.inc(labels + (str(response.status_code),))
+    request_duration.observe(labels, time.perf_counter() - g.metrics_started)
+    queries, db_seconds = request_queries()
+    request_db_time.observe(labels, db_seconds)
+    if queries:
+        request_db_queries.inc(labels, queries)
+    # Streamed bodies (exports, event streams) have no length up front
+    if response.content_length is not None:
+        response_size.observe(labels, response.content_length)
+    return response
+
+
+def _teardown_request(exc):
+    if 'metrics_started' in g:
+        requests_in_flight.dec(g.metrics_labels)
+
+
+def metrics_endpoint():
+    """Prometheus metrics summed over every worker process"""
+    return Response(exposition(registry.collect()), mimetype=EXPOSITION_CONTENT_TYPE)
+
+
+def init_metrics(app):
+    """Record every request of ``app`` and serve the totals at /metrics."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint)
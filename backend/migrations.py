@@ -0,0 +1,658 @@
+import argparse
+import sys
+import time
+
+import psycopg2
+from db_helper import DB_CONFIG
+
+# Key of the session advisory lock that lets only one process migrate at a time
+MIGRATION_LOCK_KEY = 72410319
+# Seconds between attempts to take the lock while another process holds it
+LOCK_RETRY_INTERVAL = 1.0
+
+SCHEMA_MIGRATIONS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+class Migration:
+    """One numbered schema change.
+
+    ``apply`` is either a list of SQL statements or a function taking a
+    cursor. A transactional migration runs in a single transaction together
+    with the row recording it, so it is applied entirely or not at all. A
+    non-transactional one runs in autocommit mode, which ``CREATE INDEX
+    CONCURRENTLY`` requires; it is recorded only once every statement has
+    succeeded, so its statements must be safe to run again after a failure.
+    """
+
+    def __init__(self, version, name, apply, transactional=True):
+        self.version = version
+        self.name = name
+        self.apply = apply
+        self.transactional = transactional
+
+    def run(self, cur):
+        if callable(self.apply):
+            self.apply(cur)
+        else:
+            for statement in self.apply:
+                cur.execute(statement)
+
+
+def concurrent_index(name, definition):
+    """Statements building index ``name`` online, first dropping a copy left INVALID by an interrupted build."""
+    return [
+        f'DROP INDEX CONCURRENTLY IF EXISTS {name}',
+        f'CREATE INDEX CONCURRENTLY {name} ON {definition}'
+    ]
+
+
+def baseline(cur):
+    """The schema as init_db() used to create it; every statement is a no-op on a database that has it."""
+    # 1) Users Table
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS Users (
+            UserId VARCHAR(10) PRIMARY KEY,
+            Username VARCHAR(30) UNIQUE NOT NULL,
+            Email VARCHAR(50) UNIQUE NOT NULL,
+            PasswordHash VARCHAR(255) UNIQUE NOT NULL,
+            CreationTime TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            AdminIndicator BOOLEAN NOT NULL DEFAULT FALSE
+        );
+    ''')
+
+    # 2) Author Table
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS Author (
+            AuthorId SERIAL PRIMARY KEY,
+            AuthorName VARCHAR(50) NOT NULL,
+            AuthorBio VARCHAR(500)
+        );
+    ''')
+
+    # 3) Publisher Table
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS Publisher (
+            PublisherId SERIAL PRIMARY KEY,
+            PublisherName VARCHAR(50) NOT NULL UNIQUE
+        );
+    ''')
+
+    # 4) Books Table
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS Books (
+            BookId SERIAL PRIMARY KEY,
+            Name VARCHAR(50) NOT NULL,
+            authorID INT NOT NULL,
+            category VARCHAR(50) NOT NULL,
+            genre VARCHAR(50) NOT NULL,
+            publisherID INT,
+            publishdate DATE NOT NULL,
+            language VARCHAR(30) NOT NULL,
+            pagecount INT NOT NULL,
+            copiesavailable INT NOT NULL,
+            imglink VARCHAR(255),
+            ratedType VARCHAR(20) NOT NULL,
+            description TEXT,
+            CONSTRAINT fk_author FOREIGN KEY (authorID) REFERENCES Author(AuthorId),
+            CONSTRAINT fk_publisher FOREIGN KEY (publisherID) REFERENCES Publisher(PublisherId)
+        );
+    ''')
+
+    # 5) Bookings Table
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS Bookings (
+            BookingId SERIAL PRIMARY KEY,
+            UserId VARCHAR(10) NOT NULL,
+            BookId INT NOT NULL,
+            BookingDate TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            dueDate TIMESTAMP NOT NULL,
+            CurrentlyBookedIndicator BOOLEAN NOT NULL DEFAULT TRUE,
+            pendingReturnIndicator BOOLEAN NOT NULL DEFAULT FALSE,
+            CONSTRAINT fk_user_booking FOREIGN KEY (UserId) REFERENCES Users(UserId),
+            CONSTRAINT fk_book_booking FOREIGN KEY (BookId) REFERENCES Books(BookId)
+        );
+    ''')
+
+    # 6) Reservations Table
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS Reservations (
+            ReservationId SERIAL PRIMARY KEY,
+            UserId VARCHAR(10) NOT NULL,
+            BookId INT NOT NULL,
+            ReservationDate TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT fk_user_reservation FOREIGN KEY (UserId) REFERENCES Users(UserId),
+            CONSTRAINT fk_book_reservation FOREIGN KEY (BookId) REFERENCES Books(BookId)
+        );
+    ''')
+
+    # 7) Reviews Table
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS Reviews (
+            BookID INT NOT NULL,
+            UserId VARCHAR(10) NOT NULL,
+            Rating INT NOT NULL CHECK (Rating >= 1 AND Rating <= 5),
+            ReviewDate TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            ReviewDescription TEXT,
+            PRIMARY KEY (BookID, UserId),
+            CONSTRAINT fk_book_review FOREIGN KEY (BookID) REFERENCES Books(BookId),
+            CONSTRAINT fk_user_review FOREIGN KEY (UserId) REFERENCES Users(UserId)
+        );
+    ''')
+
+    # 8) TransactionHistory Table
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS TransactionHistory (
+            TransactionId SERIAL PRIMARY KEY,
+            UserId VARCHAR(10) NOT NULL,
+            BookId INT NOT NULL,
+            TransactionDate TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            ReservedIndicator BOOLEAN NOT NULL,
+            CONSTRAINT fk_user_transaction FOREIGN KEY (UserId) REFERENCES Users(UserId),
+            CONSTRAINT fk_book_transaction FOREIGN KEY (BookId) REFERENCES Books(BookId)
+        );
+    ''')
+
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_username ON Users(Username);')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_email ON Users(Email);')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_userid_bookings ON Bookings(UserId);')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_bookid_bookings ON Bookings(BookId);')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_userid_reservations ON Reservations(UserId);')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_bookid_reservations ON Reservations(BookId);')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_bookid_reviews ON Reviews(BookID);')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_userid_reviews ON Reviews(UserId);')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_userid_transactions ON TransactionHistory(UserId);')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_bookid_transactions ON TransactionHistory(BookId);')
+
+
+# Full-text search: Books.search_vector is kept current by triggers
+SEARCH_SCHEMA = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'ALTER TABLE Books ADD COLUMN IF NOT EXISTS search_vector tsvector',
+    '''
+    CREATE OR REPLACE FUNCTION books_search_vector_refresh() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', COALESCE(NEW.Name, '')), 'A') ||
+            setweight(to_tsvector('simple', COALESCE((SELECT AuthorName FROM Author WHERE AuthorId = NEW.authorID), '')), 'B') ||
+            setweight(to_tsvector('simple', COALESCE((SELECT PublisherName FROM Publisher WHERE PublisherId = NEW.publisherID), '')), 'C') ||
+            setweight(to_tsvector('simple', COALESCE(NEW.genre, '') || ' ' || COALESCE(NEW.category, '')), 'C') ||
+            setweight(to_tsvector('simple', COALESCE(NEW.description, '')), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION author_search_vector_refresh() RETURNS trigger AS $$
+    BEGIN
+        UPDATE Books SET authorID = authorID WHERE authorID = NEW.AuthorId;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION publisher_search_vector_refresh() RETURNS trigger AS $$
+    BEGIN
+        UPDATE Books SET publisherID = publisherID WHERE publisherID = NEW.PublisherId;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    'DROP TRIGGER IF EXISTS trg_books_search_vector ON Books',
+    '''
+    CREATE TRIGGER trg_books_search_vector
+        BEFORE INSERT OR UPDATE OF Name, authorID, publisherID, genre, category, description ON Books
+        FOR EACH ROW EXECUTE FUNCTION books_search_vector_refresh()
+    ''',
+    'DROP TRIGGER IF EXISTS trg_author_search_vector ON Author',
+    '''
+    CREATE TRIGGER trg_author_search_vector
+        AFTER UPDATE OF AuthorName ON Author
+        FOR EACH ROW EXECUTE FUNCTION author_search_vector_refresh()
+    ''',
+    'DROP TRIGGER IF EXISTS trg_publisher_search_vector ON Publisher',
+    '''
+    CREATE TRIGGER trg_publisher_search_vector
+        AFTER UPDATE OF PublisherName ON Publisher
+        FOR EACH ROW EXECUTE FUNCTION publisher_search_vector_refresh()
+    ''',
+    # Backfill rows created before the trigger existed
+    'UPDATE Books SET Name = Name WHERE search_vector IS NULL',
+    'CREATE INDEX IF NOT EXISTS idx_books_search_vector ON Books USING GIN (search_vector)',
+    'CREATE INDEX IF NOT EXISTS idx_books_name_trgm ON Books USING GIN (Name gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS idx_author_name_trgm ON Author USING GIN (AuthorName gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS idx_publisher_name_trgm ON Publisher USING GIN (PublisherName gin_trgm_ops)'
+]
+
+# Rating aggregates: Books.review_count, rating_sum, rating_histogram and
+# average_rating are kept current by triggers on Reviews
+RATING_SCHEMA = [
+    'ALTER TABLE Books ADD COLUMN IF NOT EXISTS review_count INT NOT NULL DEFAULT 0',
+    'ALTER TABLE Books ADD COLUMN IF NOT EXISTS rating_sum INT NOT NULL DEFAULT 0',
+    'ALTER TABLE Books ADD COLUMN IF NOT EXISTS average_rating DOUBLE PRECISION NOT NULL DEFAULT 0',
+    # Added without a default so rows that predate it are NULL and get backfilled below
+    'ALTER TABLE Books ADD COLUMN IF NOT EXISTS rating_histogram INT[]',
+    "ALTER TABLE Books ALTER COLUMN rating_histogram SET DEFAULT '{0,0,0,0,0}'",
+    '''
+    CREATE OR REPLACE FUNCTION reviews_rating_refresh() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE Books SET
+                review_count = review_count - 1,
+                rating_sum = rating_sum - OLD.Rating,
+                rating_histogram[OLD.Rating] = rating_histogram[OLD.Rating] - 1,
+                average_rating = COALESCE(ROUND((rating_sum - OLD.Rating)::numeric / NULLIF(review_count - 1, 0), 2), 0)
+            WHERE BookId = OLD.BookID;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            UPDATE Books SET
+                review_count = review_count + 1,
+                rating_sum = rating_sum + NEW.Rating,
+                rating_histogram[NEW.Rating] = rating_histogram[NEW.Rating] + 1,
+                average_rating = ROUND((rating_sum + NEW.Rating)::numeric / (review_count + 1), 2)
+            WHERE BookId = NEW.BookID;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    'DROP TRIGGER IF EXISTS trg_reviews_rating ON Reviews',
+    '''
+    CREATE TRIGGER trg_reviews_rating
+        AFTER INSERT OR DELETE ON Reviews
+        FOR EACH ROW EXECUTE FUNCTION reviews_rating_refresh()
+    ''',
+    'DROP TRIGGER IF EXISTS trg_reviews_rating_update ON Reviews',
+    '''
+    CREATE TRIGGER trg_reviews_rating_update
+        AFTER UPDATE OF Rating, BookID ON Reviews
+        FOR EACH ROW
+        WHEN (OLD.Rating IS DISTINCT FROM NEW.Rating OR OLD.BookID IS DISTINCT FROM NEW.BookID)
+        EXECUTE FUNCTION reviews_rating_refresh()
+    ''',
+    '''
+    UPDATE Books b SET
+        review_count = r.review_count,
+        rating_sum = r.rating_sum,
+        rating_histogram = r.rating_histogram,
+        average_rating = r.average_rating
+    FROM (
+        SELECT bk.BookId,
+            COUNT(rv.Rating) AS review_count,
+            COALESCE(SUM(rv.Rating), 0) AS rating_sum,
+            ARRAY[COUNT(*) FILTER (WHERE rv.Rating = 1), COUNT(*) FILTER (WHERE rv.Rating = 2),
+                  COUNT(*) FILTER (WHERE rv.Rating = 3), COUNT(*) FILTER (WHERE rv.Rating = 4),
+                  COUNT(*) FILTER (WHERE rv.Rating = 5)]::int[] AS rating_histogram,
+            COALESCE(ROUND(AVG(rv.Rating)::numeric, 2), 0) AS average_rating
+        FROM Books bk
+        LEFT JOIN Reviews rv ON rv.BookID = bk.BookId
+        WHERE bk.rating_histogram IS NULL
+        GROUP BY bk.BookId
+    ) r
+    WHERE b.BookId = r.BookId
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_books_average_rating ON Books(average_rating, BookId)',
+    'CREATE INDEX IF NOT EXISTS idx_books_review_count ON Books(review_count, BookId)'
+]
+
+
+def notify_trigger(table, name):
+    """Statements (re)creating the trigger that announces every committed write to ``table`` as ``name``."""
+    trigger = f'trg_{table.lower()}_notify'
+    return [
+        f'DROP TRIGGER IF EXISTS {trigger} ON {table}',
+        f'''
+        CREATE TRIGGER {trigger}
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_catalogue_change('{name}')
+        '''
+    ]
+
+
+# Cache invalidation and ETags: every committed write to a catalogue table
+# sends a NOTIFY carrying a never-reused version token, so each API worker
+# can evict what it has cached from that table and change its ETags
+CATALOGUE_NOTIFY_SCHEMA = [
+    'CREATE SEQUENCE IF NOT EXISTS catalogue_version_seq',
+    '''
+    CREATE OR REPLACE FUNCTION notify_catalogue_change() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('catalogue_invalidate',
+            TG_ARGV[0] || ':' || nextval('catalogue_version_seq') || ':' || extract(epoch FROM clock_timestamp()));
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    *notify_trigger('Books', 'books'),
+    *notify_trigger('Author', 'authors'),
+    *notify_trigger('Publisher', 'publishers')
+]
+
+# Reservation queue: a title's reservations are served in ReservationDate
+# order. When a copy comes back to an empty shelf it is held for the next
+# reserver in line until their HoldExpiresAt instead of being restocked
+RESERVATION_QUEUE_SCHEMA = [
+    'ALTER TABLE Reservations ADD COLUMN IF NOT EXISTS HoldExpiresAt TIMESTAMP',
+    '''
+    CREATE OR REPLACE FUNCTION allocate_returned_copy(returned_book INT, hold_for INTERVAL) RETURNS VARCHAR AS $$
+    DECLARE
+        shelf INT;
+        next_reservation INT;
+        next_user VARCHAR(10);
+    BEGIN
+        -- Locking the book serialises allocation against checkouts of the same title
+        SELECT copiesavailable INTO shelf FROM Books WHERE BookId = returned_book FOR UPDATE;
+        IF shelf = 0 THEN
+            SELECT ReservationId, UserId INTO next_reservation, next_user
+            FROM Reservations
+            WHERE BookId = returned_book AND HoldExpiresAt IS NULL
+            ORDER BY ReservationDate, ReservationId
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED;
+            IF FOUND THEN
+                UPDATE Reservations SET HoldExpiresAt = LOCALTIMESTAMP + hold_for
+                WHERE ReservationId = next_reservation;
+                RETURN next_user;
+            END IF;
+        END IF;
+        UPDATE Books SET copiesavailable = copiesavailable + 1 WHERE BookId = returned_book;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION expire_reservation_holds(hold_for INTERVAL)
+    RETURNS TABLE (book_id INT, expired_user VARCHAR, held_for VARCHAR) AS $$
+    DECLARE
+        expired RECORD;
+    BEGIN
+        FOR expired IN
+            DELETE FROM Reservations WHERE HoldExpiresAt <= LOCALTIMESTAMP RETURNING BookId, UserId
+        LOOP
+            book_id := expired.BookId;
+            expired_user := expired.UserId;
+            held_for := allocate_returned_copy(expired.BookId, hold_for);
+            RETURN NEXT;
+        END LOOP;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_reservations_queue ON Reservations(BookId, ReservationDate, ReservationId)',
+    'CREATE INDEX IF NOT EXISTS idx_reservations_hold ON Reservations(HoldExpiresAt) WHERE HoldExpiresAt IS NOT NULL'
+]
+
+
+# Search-as-you-type: every committed change to a book title or author name
+# is announced with its id and new text, so each API worker can update its
+# in-memory suggestion index (suggest.py). Row-level, unlike
+# catalogue_invalidate, and silent for updates that leave the text alone,
+# such as the copiesavailable changes of every checkout and return.
+SUGGESTION_NOTIFY_SCHEMA = [
+    '''
+    CREATE OR REPLACE FUNCTION notify_suggestion_change() RETURNS trigger AS $$
+    DECLARE
+        old_row JSONB := CASE WHEN TG_OP <> 'INSERT' THEN to_jsonb(OLD) END;
+        new_row JSONB := CASE WHEN TG_OP <> 'DELETE' THEN to_jsonb(NEW) END;
+    BEGIN
+        IF TG_OP = 'UPDATE' AND old_row -> TG_ARGV[2] IS NOT DISTINCT FROM new_row -> TG_ARGV[2] THEN
+            RETURN NULL;
+        END IF;
+        PERFORM pg_notify('suggestion_change', json_build_object(
+            'type', TG_ARGV[0],
+            'id', COALESCE(new_row, old_row) -> TG_ARGV[1],
+            'text', new_row ->> TG_ARGV[2])::text);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    'DROP TRIGGER IF EXISTS trg_books_suggestion ON Books',
+    '''
+    CREATE TRIGGER trg_books_suggestion
+        AFTER INSERT OR DELETE OR UPDATE OF Name ON Books
+        FOR EACH ROW EXECUTE FUNCTION notify_suggestion_change('book', 'bookid', 'name')
+    ''',
+    'DROP TRIGGER IF EXISTS trg_author_suggestion ON Author',
+    '''
+    CREATE TRIGGER trg_author_suggestion
+        AFTER INSERT OR DELETE OR UPDATE OF AuthorName ON Author
+        FOR EACH ROW EXECUTE FUNCTION notify_suggestion_change('author', 'authorid', 'authorname')
+    '''
+]
+
+
+def suggestion_triggers(table, kind, id_column, text_column):
+    """Statements (re)creating the statement-level triggers announcing ``table``'s title or name changes.
+
+    One trigger per event: a trigger with transition tables may neither
+    fire on several events nor name an UPDATE OF column list.
+    """
+    statements = []
+    for event, referencing in (('INSERT', 'NEW TABLE AS new_rows'),
+                               ('UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+                               ('DELETE', 'OLD TABLE AS old_rows')):
+        trigger = f'trg_{table.lower()}_suggestion_{event.lower()}'
+        statements += [
+            f'DROP TRIGGER IF EXISTS {trigger} ON {table}',
+            f'''
+            CREATE TRIGGER {trigger}
+                AFTER {event} ON {table}
+                REFERENCING {referencing}
+                FOR EACH STATEMENT EXECUTE FUNCTION notify_suggestion_changes('{kind}', '{id_column}', '{text_column}')
+            '''
+        ]
+    return statements
+
+
+# Migration 11 sent one NOTIFY per row, so a single statement touching many
+# titles queued that many notifications in the writer's transaction. These
+# triggers run once per statement: up to 1000 changes are still sent one by
+# one, more than that become a single {"type": "rebuild"}, which makes every
+# worker reload its index. Bulk writers set library.suggestion_notify to
+# 'off' for their transaction and send the rebuild themselves.
+SUGGESTION_STATEMENT_NOTIFY_SCHEMA = [
+    '''
+    CREATE OR REPLACE FUNCTION notify_suggestion_changes() RETURNS trigger AS $$
+    DECLARE
+        changes JSONB;
+    BEGIN
+        IF current_setting('library.suggestion_notify', true) = 'off' THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'INSERT' THEN
+            SELECT jsonb_agg(jsonb_build_object('type', TG_ARGV[0], 'id', n.data -> TG_ARGV[1],
+                                                'text', n.data ->> TG_ARGV[2]))
+            INTO changes
+            FROM (SELECT to_jsonb(t) AS data FROM new_rows t) n;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT jsonb_agg(jsonb_build_object('type', TG_ARGV[0], 'id', o.data -> TG_ARGV[1], 'text', NULL))
+            INTO changes
+            FROM (SELECT to_jsonb(t) AS data FROM old_rows t) o;
+        ELSE
+            -- Silent for updates that leave the text alone, such as every checkout's copiesavailable change
+            SELECT jsonb_agg(jsonb_build_object('type', TG_ARGV[0], 'id', n.data -> TG_ARGV[1],
+                                                'text', n.data ->> TG_ARGV[2]))
+            INTO changes
+            FROM (SELECT to_jsonb(t) AS data FROM new_rows t) n
+            JOIN (SELECT to_jsonb(t) AS data FROM old_rows t) o ON o.data -> TG_ARGV[1] = n.data -> TG_ARGV[1]
+            WHERE o.data -> TG_ARGV[2] IS DISTINCT FROM n.data -> TG_ARGV[2];
+        END IF;
+        IF changes IS NULL THEN
+            RETURN NULL;
+        END IF;
+        IF jsonb_array_length(changes) > 1000 THEN
+            PERFORM pg_notify('suggestion_change', json_build_object('type', 'rebuild')::text);
+        ELSE
+            PERFORM pg_notify('suggestion_change', change::text) FROM jsonb_array_elements(changes) change;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    'DROP TRIGGER IF EXISTS trg_books_suggestion ON Books',
+    'DROP TRIGGER IF EXISTS trg_author_suggestion ON Author',
+    'DROP FUNCTION IF EXISTS notify_suggestion_change()',
+    *suggestion_triggers('Books', 'book', 'bookid', 'name'),
+    *suggestion_triggers('Author', 'author', 'authorid', 'authorname')
+]
+
+
+# Every database is brought to the current schema by these migrations, in
+# order, whether it was created by init.sql (frozen at the baseline schema)
+# or by the old init_db(). Never edit one that has shipped; add a new one.
+MIGRATIONS = [
+    Migration(1, 'baseline schema', baseline),
+    Migration(2, 'reconcile init.sql and init_db() schemas', [
+        # VARCHAR to TEXT is binary compatible, so this does not rewrite the table
+        'ALTER TABLE Books ALTER COLUMN imglink TYPE TEXT',
+        # Databases created by init_db() lack the UNIQUE that init.sql declares; it
+        # can only be added once duplicate names have been merged by hand
+        '''
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'author'::regclass AND contype = 'u') THEN
+                RETURN;
+            END IF;
+            IF EXISTS (SELECT 1 FROM Author GROUP BY AuthorName HAVING COUNT(*) > 1) THEN
+                RAISE WARNING 'Author has duplicate AuthorName values; UNIQUE constraint not added';
+                RETURN;
+            END IF;
+            ALTER TABLE Author ADD CONSTRAINT author_authorname_key UNIQUE (AuthorName);
+        END
+        $$
+        '''
+    ]),
+    Migration(3, 'keyset pagination indexes', [
+        # (sort column, BookId) pairs for the book list's keyset pagination and filters
+        'CREATE INDEX IF NOT EXISTS idx_books_name ON Books(Name, BookId)',
+        'CREATE INDEX IF NOT EXISTS idx_books_publishdate ON Books(publishdate, BookId)',
+        'CREATE INDEX IF NOT EXISTS idx_books_category ON Books(category, BookId)',
+        'CREATE INDEX IF NOT EXISTS idx_books_genre ON Books(genre, BookId)',
+        'CREATE INDEX IF NOT EXISTS idx_books_authorid ON Books(authorID)',
+        'CREATE INDEX IF NOT EXISTS idx_books_publisherid ON Books(publisherID)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_date ON TransactionHistory(TransactionDate, TransactionId)'
+    ]),
+    Migration(4, 'full-text book search', SEARCH_SCHEMA),
+    Migration(5, 'incremental rating aggregates', RATING_SCHEMA),
+    Migration(6, 'catalogue change notifications', CATALOGUE_NOTIFY_SCHEMA),
+    Migration(7, 'booking and user change notifications', [
+        *notify_trigger('Bookings', 'bookings'),
+        *notify_trigger('Users', 'users')
+    ]),
+    Migration(8, 'reservation queue with holds', RESERVATION_QUEUE_SCHEMA),
+    Migration(9, 'indexes matching the query shapes', [
+        # create_book() and the bulk import look names up with LOWER(...)
+        *concurrent_index('idx_author_name_lower', 'Author (LOWER(AuthorName))'),
+        *concurrent_index('idx_publisher_name_lower', 'Publisher (LOWER(PublisherName))'),
+        # The admin pending-returns list: only the few pending rows are indexed
+        *concurrent_index('idx_bookings_pending', 'Bookings (BookingId) WHERE pendingReturnIndicator = TRUE'),
+        # A user's booking or reservation of one book (checkout, book detail page)
+        *concurrent_index('idx_bookings_user_book', 'Bookings (UserId, BookId)'),
+        *concurrent_index('idx_reservations_user_book', 'Reservations (UserId, BookId)'),
+        # Leading columns of the indexes above and of idx_reservations_queue
+        'DROP INDEX CONCURRENTLY IF EXISTS idx_userid_bookings',
+        'DROP INDEX CONCURRENTLY IF EXISTS idx_userid_reservations',
+        'DROP INDEX CONCURRENTLY IF EXISTS idx_bookid_reservations'
+    ], transactional=False),
+    Migration(10, 'content-addressed cover images', [
+        # SHA-256 of the cover in the image store (images.py); a nullable column
+        # without a default is a catalogue-only change
+        'ALTER TABLE Books ADD COLUMN IF NOT EXISTS cover_hash CHAR(64)'
+    ]),
+    Migration(11, 'suggestion index notifications', SUGGESTION_NOTIFY_SCHEMA),
+    Migration(12, 'statement-level suggestion notifications', SUGGESTION_STATEMENT_NOTIFY_SCHEMA)
+]
+
+
+def migrate(target=None):
+    """Apply every migration not yet recorded in schema_migrations, in version order.
+
+    Uses its own connection rather than the pool, because non-transactional
+    migrations need autocommit. Safe to run from several processes at once:
+    the others wait on the advisory lock and then find nothing left to do.
+    Returns the versions applied.
+    """
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    cur = conn.cursor()
+    applied = []
+    try:
+        # Polled rather than waited on: a session blocked in pg_advisory_lock() holds
+        # a snapshot, and CREATE INDEX CONCURRENTLY in the lock holder would wait for it
+        while True:
+            cur.execute('SELECT pg_try_advisory_lock(%s)', (MIGRATION_LOCK_KEY,))
+            if cur.fetchone()[0]:
+                break
+            time.sleep(LOCK_RETRY_INTERVAL)
+        cur.execute(SCHEMA_MIGRATIONS_TABLE)
+        cur.execute('SELECT version FROM schema_migrations')
+        done = {row[0] for row in cur.fetchall()}
+
+        for migration in MIGRATIONS:
+            if migration.version in done or (target is not None and migration.version > target):
+                continue
+            print(f"⏳ Applying migration {migration.version}: {migration.name}")
+            conn.autocommit = not migration.transactional
+            try:
+                migration.run(cur)
+                cur.execute('INSERT INTO schema_migrations (version, name) VALUES (%s, %s)',
+                            (migration.version, migration.name))
+                if migration.transactional:
+                    conn.commit()
+            except Exception:
+                if migration.transactional:
+                    conn.rollback()
+                raise
+            finally:
+                conn.autocommit = True
+            applied.append(migration.version)
+    finally:
+        if not conn.closed:
+            try:
+                cur.execute('SELECT pg_advisory_unlock(%s)', (MIGRATION_LOCK_KEY,))
+            except psycopg2.Error:
+                pass
+            conn.close()
+
+    print(f"✅ Database schema up to date ({len(applied)} migrations applied)")
+    return applied
+
+
+def status():
+    """Return ``(version, name, applied_at)`` for every known migration; ``applied_at`` is None if pending."""
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        applied = {}
+        if cur.fetchone()[0]:
+            cur.execute('SELECT version, applied_at FROM schema_migrations')
+            applied = dict(cur.fetchall())
+        cur.close()
+    finally:
+        conn.close()
+    return [(m.version, m.name, applied.get(m.version)) for m in MIGRATIONS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bring the database schema up to date.')
+    parser.add_argument('--status', action='store_true', help='list migrations and whether they are applied')
+    parser.add_argument('--target', type=int, help='stop after this version')
+    args = parser.parse_args()
+
+    if args.status:
+        for version, name, applied_at in status():
+            print(f"{version:>4}  {'applied ' + str(applied_at) if applied_at else 'pending':<36}  {name}")
+        return
+    try:
+        migrate(args.target)
+    except psycopg2.Error as e:
+        sys.exit(f"❌ Migration failed: {e}")
+
+
+if __name__ == '__main__':
+    main()
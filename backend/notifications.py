@@ -0,0 +1,129 @@
+import select
+import threading
+import time
+
+import psycopg2
+from circuit_breaker import backoff_delay
+from db_helper import DB_CONFIG
+
+# How long to block waiting for a notification before pinging the connection
+POLL_INTERVAL = 5.0
+
+
+class NotificationListener:
+    """One LISTEN connection per worker process, dispatching NOTIFY payloads to callbacks.
+
+    The connection is dedicated rather than borrowed from the pool, since it
+    sits in LISTEN for the life of the process. ``on_connect`` callbacks run
+    with the connection each time LISTEN is (re)established. If it drops,
+    the ``on_disconnect`` callbacks run at once and the listener reconnects
+    with jittered backoff, then also calls the ``on_reconnect`` callbacks,
+    because anything sent while it was away has been lost.
+    """
+
+    def __init__(self, db_config, poll_interval=POLL_INTERVAL):
+        self.db_config = dict(db_config)
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        self._connect_callbacks = []
+        self._reconnect_callbacks = []
+        self._disconnect_callbacks = []
+        self._thread = None
+
+        self._connected = False
+        self._received = 0
+        self._reconnects = 0
+        self._callback_errors = 0
+
+    def subscribe(self, channel, callback):
+        """Call ``callback(payload)`` for every NOTIFY on ``channel``. Subscribe before start()."""
+        with self._lock:
+            self._callbacks.setdefault(channel, []).append(callback)
+
+    def on_connect(self, callback):
+        """Call ``callback(conn)`` every time the listening connection is established."""
+        with self._lock:
+            self._connect_callbacks.append(callback)
+
+    def on_reconnect(self, callback):
+        with self._lock:
+            self._reconnect_callbacks.append(callback)
+
+    def on_disconnect(self, callback):
+        with self._lock:
+            self._disconnect_callbacks.append(callback)
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='pg-listener', daemon=True)
+            self._thread.start()
+
+    def _dispatch(self, callbacks, *args):
+        for callback in callbacks:
+            try:
+                callback(*args)
+            except Exception as e:
+                self._callback_errors += 1
+                print(f"Notification callback error: {e}")
+
+    def _run(self):
+        attempt = 0
+        connected_before = False
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.db_config)
+                conn.autocommit = True
+                cur = conn.cursor()
+                with self._lock:
+                    channels = list(self._callbacks)
+                for channel in channels:
+                    # Channel names are constants from this codebase, never user input
+                    cur.execute(f'LISTEN {channel}')
+                self._connected = True
+                attempt = 0
+                if connected_before:
+                    self._reconnects += 1
+                    self._dispatch(list(self._reconnect_callbacks))
+                connected_before = True
+                self._dispatch(list(self._connect_callbacks), conn)
+
+                while True:
+                    if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                        # Nothing arrived; make sure the connection is still alive
+                        cur.execute('SELECT 1')
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self._received += 1
+                        self._dispatch(list(self._callbacks.get(notify.channel, ())), notify.payload)
+            except (psycopg2.Error, OSError) as e:
+                if self._connected:
+                    print(f"❌ Notification listener lost its connection: {e}")
+                    self._connected = False
+                    self._dispatch(list(self._disconnect_callbacks))
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except psycopg2.Error:
+                        pass
+            time.sleep(backoff_delay(attempt, 0.5, 30))
+            attempt += 1
+
+    def stats(self):
+        return {
+            'connected': self._connected,
+            'channels': sorted(self._callbacks),
+            'notifications_received': self._received,
+            'reconnects': self._reconnects,
+            'callback_errors': self._callback_errors
+        }
+
+
+listener = NotificationListener(DB_CONFIG)
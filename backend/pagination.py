@@ -0,0 +1,198 @@
+import base64
+import json
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class QueryParamError(ValueError):
+    """Raised for malformed list query parameters; handlers answer it with a 400."""
+
+
+def parse_bool(value):
+    """Cast a query-string flag such as ``1``/``true``/``no`` to a bool."""
+    lowered = value.strip().lower()
+    if lowered in ('1', 'true', 'yes'):
+        return True
+    if lowered in ('0', 'false', 'no'):
+        return False
+    raise ValueError(value)
+
+
+def parse_flag(args, name):
+    """Read an optional boolean query parameter, answering malformed values with a QueryParamError."""
+    value = args.get(name)
+    try:
+        return bool(value) and parse_bool(value)
+    except ValueError:
+        raise QueryParamError(f'Invalid value for {name}')
+
+
+def id_list(cast):
+    """Filter cast for a comma-separated ``ids`` parameter, bound as one array for ``= ANY(%s)``."""
+    def parse(value):
+        ids = [cast(part.strip()) for part in value.split(',') if part.strip()]
+        if not ids:
+            raise ValueError(value)
+        if len(ids) > MAX_LIMIT:
+            raise QueryParamError(f'ids accepts at most {MAX_LIMIT} values')
+        return ids
+    return parse
+
+
+def encode_cursor(values):
+    """Pack the keyset of the last row on a page into an opaque URL-safe token."""
+    raw = json.dumps(values, default=str, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, length):
+    """Inverse of encode_cursor(); ``length`` is the number of keyset columns expected."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise QueryParamError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != length:
+        raise QueryParamError('Invalid cursor')
+    return values
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise QueryParamError('limit must be an integer')
+    if limit < 1:
+        raise QueryParamError('limit must be at least 1')
+    return min(limit, maximum)
+
+
+def parse_fields(value, spec):
+    """Turn a comma-separated ``fields`` parameter into a whitelisted column list."""
+    if not value:
+        return list(spec['columns'])
+    fields = []
+    for name in value.split(','):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in spec['columns']:
+            raise QueryParamError(f'Unknown field: {name}')
+        if name not in fields:
+            fields.append(name)
+    if not fields:
+        raise QueryParamError('fields must name at least one column')
+    return fields
+
+
+def parse_sort(value, spec):
+    """Return (column, descending) for a ``sort`` parameter such as ``name`` or ``-publishdate``."""
+    if not value:
+        return spec['default_sort'], False
+    descending = value.startswith('-')
+    column = value.lstrip('-').strip().lower()
+    if column not in spec['sorts']:
+        raise QueryParamError(f"Cannot sort by {column}; choose one of: {', '.join(sorted(spec['sorts']))}")
+    return column, descending
+
+
+def parse_filters(args, spec):
+    """Collect WHERE clauses and parameters for every filter present in the query string."""
+    clauses, params = [], []
+    for name, (clause, cast) in spec['filters'].items():
+        value = args.get(name)
+        if value in (None, ''):
+            continue
+        try:
+            value = cast(value)
+        except QueryParamError:
+            # Already says what is wrong, e.g. id_list()'s length limit
+            raise
+        except ValueError:
+            raise QueryParamError(f'Invalid value for {name}')
+        clauses.append(clause)
+        params.extend([value] * clause.count('%s'))
+    return clauses, params
+
+
+def key_columns(spec):
+    key = spec['key']
+    return [key] if isinstance(key, str) else list(key)
+
+
+def fetch_page(cur, spec, args):
+    """Run a keyset-paginated, filtered, projected list query.
+
+    ``spec`` describes the table: its name, key column(s) (unique together,
+    used to break ties), whitelisted columns, sortable columns and filters.
+    Pages are addressed with ``after`` cursors rather than OFFSET, so every
+    page costs the same index range scan no matter how deep the client has
+    paged, and no request ever materialises more than ``MAX_LIMIT`` rows.
+    ``cur`` must be a RealDictCursor.
+
+    Returns ``(rows, next_cursor, total)``. ``next_cursor`` is None on the
+    last page; ``total`` is None unless the client opted in with
+    ``include_total=1``, since counting costs a scan of every matching row.
+    """
+    keys = key_columns(spec)
+    limit = parse_limit(args.get('limit'))
+    fields = parse_fields(args.get('fields'), spec)
+    sort_column, descending = parse_sort(args.get('sort'), spec)
+    clauses, params = parse_filters(args, spec)
+
+    total = None
+    if parse_flag(args, 'include_total'):
+        count_query = f"SELECT COUNT(*) AS total FROM {spec['table']}"
+        if clauses:
+            count_query += ' WHERE ' + ' AND '.join(clauses)
+        cur.execute(count_query, params)
+        total = cur.fetchone()['total']
+
+    keyset = [sort_column] + [key for key in keys if key != sort_column]
+    after = args.get('after')
+    if after:
+        values = decode_cursor(after, len(keyset))
+        op = '<' if descending else '>'
+        if len(keyset) == 1:
+            clauses.append(f'{keyset[0]} {op} %s')
+        else:
+            placeholders = ', '.join(['%s'] * len(keyset))
+            clauses.append(f"({', '.join(keyset)}) {op} ({placeholders})")
+        params.extend(values)
+
+    columns = list(fields)
+    for column in keyset:
+        if column not in columns:
+            columns.append(column)
+
+    direction = 'DESC' if descending else 'ASC'
+    order_by = ', '.join(f'{column} {direction}' for column in keyset)
+    query = f"SELECT {', '.join(columns)} FROM {spec['table']}"
+    if clauses:
+        query += ' WHERE ' + ' AND '.join(clauses)
+    query += f' ORDER BY {order_by} LIMIT %s'
+
+    # One extra row tells us whether another page exists without a COUNT(*)
+    cur.execute(query, params + [limit + 1])
+    rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][column] for column in keyset])
+
+    if sort_column not in fields and sort_column not in keys:
+        for row in rows:
+            row.pop(sort_column, None)
+    return rows, next_cursor, total
+
+
+def page_body(name, rows, next_cursor, total=None):
+    """Build the JSON body shared by every paginated list endpoint."""
+    body = {'success': True, 'count': len(rows), name: rows, 'next_cursor': next_cursor}
+    if total is not None:
+        body['total'] = total
+    return body
@@ -0,0 +1,131 @@
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+# Statements slower than this are written to the slow-query log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+# Also log EXPLAIN (ANALYZE, BUFFERS) for slow reads. This runs the statement a
+# second time, inside a savepoint that is rolled back, so it is off by default.
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "0") == "1"
+# Requests running more statements than this are logged; 0 turns the check off
+REQUEST_QUERY_BUDGET = int(os.getenv("REQUEST_QUERY_BUDGET", 20))
+
+_WHITESPACE = re.compile(r'\s+')
+
+# Only plain reads are re-run for EXPLAIN; WITH queries may hide data-modifying CTEs
+_EXPLAINABLE = re.compile(r'^select\b', re.IGNORECASE)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def normalise(statement):
+    """The statement text with whitespace collapsed, so the same query always logs the same way."""
+    if isinstance(statement, bytes):
+        statement = statement.decode()
+    return _WHITESPACE.sub(' ', str(statement)).strip()
+
+
+def request_queries():
+    """``(statements, seconds)`` run so far by the current request."""
+    if not has_request_context():
+        return 0, 0.0
+    return g.get('query_count', 0), g.get('query_seconds', 0.0)
+
+
+def _log(event, **fields):
+    if has_request_context():
+        fields.update(method=request.method, path=request.path)
+    print(json.dumps({'event': event, **fields}, default=str))
+
+
+def _explain(cursor, statement, params):
+    """EXPLAIN ANALYZE a statement that has just run, undoing anything it does the second time."""
+    conn = cursor.connection
+    if conn.autocommit or cursor.name:
+        return None
+    cur = conn.cursor()
+    try:
+        cur.execute('SAVEPOINT slow_query_explain')
+        try:
+            cur.execute(f'EXPLAIN (ANALYZE, BUFFERS) {statement}', params)
+            return '\n'.join(row[0] for row in cur.fetchall())
+        finally:
+            cur.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            cur.execute('RELEASE SAVEPOINT slow_query_explain')
+    except Exception as e:
+        return f'EXPLAIN failed: {e}'
+    finally:
+        cur.close()
+
+
+# Statements seen by query_budget() blocks, across threads so a test client's
+# requests are counted wherever they run
+_budgets = []
+_budgets_lock = threading.Lock()
+
+
+def observe_statement(cursor, method, statement, params, seconds, ok):
+    """Called by the connection pool's cursors after every statement."""
+    text = normalise(statement)
+    rows = cursor.rowcount if ok else None
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+        g.query_seconds = g.get('query_seconds', 0.0) + seconds
+    if _budgets:
+        with _budgets_lock:
+            for recorded in _budgets:
+                recorded.append((text, seconds, rows))
+
+    duration_ms = seconds * 1000
+    if duration_ms < SLOW_QUERY_MS:
+        return
+    fields = {'statement': text, 'duration_ms': round(duration_ms, 3), 'rows': rows}
+    if SLOW_QUERY_EXPLAIN and ok and method == 'execute' and _EXPLAINABLE.match(text):
+        fields['plan'] = _explain(cursor, statement, params)
+    _log('slow_query', **fields)
+
+
+@contextmanager
+def query_budget(max_queries):
+    """Fail if the statements run inside the block number more than ``max_queries``.
+
+    For tests that pin an endpoint's query count:
+
+        with query_budget(3):
+            client.get('/api/books/1/detail')
+
+    Yields the list of ``(statement, seconds, rows)`` recorded so far.
+    """
+    recorded = []
+    with _budgets_lock:
+        _budgets.append(recorded)
+    try:
+        yield recorded
+    finally:
+        with _budgets_lock:
+            _budgets.remove(recorded)
+    if len(recorded) > max_queries:
+        statements = '\n'.join(f'  {text}' for text, _, _ in recorded)
+        raise QueryBudgetExceeded(f'{len(recorded)} statements run, budget is {max_queries}:\n{statements}')
+
+
+def _add_server_timing(response):
+    count, seconds = request_queries()
+    timing = f'db;dur={seconds * 1000:.3f};desc="{count} queries"'
+    existing = response.headers.get('Server-Timing')
+    response.headers['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+    if REQUEST_QUERY_BUDGET and count > REQUEST_QUERY_BUDGET:
+        _log('query_budget_exceeded', queries=count, budget=REQUEST_QUERY_BUDGET,
+             db_ms=round(seconds * 1000, 3))
+    return response
+
+
+def init_query_log(app):
+    """Report each request's statement count and database time in a Server-Timing header."""
+    app.after_request(_add_server_timing)
@@ -0,0 +1,49 @@
+import os
+import time
+from datetime import timedelta
+
+from db_helper import db_connection
+from events import notify_booking_event
+
+# How long a returned copy is held for the next reserver before it moves on
+RESERVATION_HOLD = timedelta(hours=float(os.getenv("RESERVATION_HOLD_HOURS", 72)))
+# Seconds between sweeps for expired holds
+HOLD_SWEEP_INTERVAL = float(os.getenv("HOLD_SWEEP_INTERVAL", 60))
+
+
+def notify_hold(cur, book_id, user_id):
+    """Tell the reserver's open pages that a copy is now held for them."""
+    if user_id:
+        notify_booking_event(cur, 'hold_placed', None, user_id, book_id)
+
+
+def sweep_expired_holds():
+    """Drop reservations whose hold ran out and pass each held copy to the next in line.
+
+    The work is done by ``expire_reservation_holds()`` in one transaction, so
+    every worker can sweep: a hold being expired by one is locked, and any
+    other waits and then finds it gone. Returns the number of holds expired.
+    """
+    with db_connection() as conn:
+        if not conn:
+            return 0
+        cur = conn.cursor()
+        cur.execute('SELECT book_id, held_for FROM expire_reservation_holds(%s)', (RESERVATION_HOLD,))
+        expired = cur.fetchall()
+        for book_id, held_for in expired:
+            notify_hold(cur, book_id, held_for)
+        conn.commit()
+        cur.close()
+    if expired:
+        print(f"Expired {len(expired)} reservation holds")
+    return len(expired)
+
+
+def run_hold_sweeper():
+    """Background loop started once per worker by app.py."""
+    while True:
+        time.sleep(HOLD_SWEEP_INTERVAL)
+        try:
+            sweep_expired_holds()
+        except Exception as e:
+            print(f"Reservation hold sweep error: {e}")
@@ -0,0 +1,94 @@
+import os
+import re
+
+from pagination import decode_cursor, encode_cursor, parse_limit
+
+# word_similarity() cut-off for the fuzzy branches; lower tolerates more typos
+SIMILARITY_THRESHOLD = float(os.getenv("SEARCH_SIMILARITY_THRESHOLD", 0.4))
+
+BOOK_RESULT_COLUMNS = ['bookid', 'name', 'authorid', 'category', 'genre', 'publisherid', 'publishdate',
+                       'language', 'pagecount', 'copiesavailable', 'imglink', 'cover_hash', 'ratedtype', 'description']
+
+# Every branch of the candidate UNION is served by its own index:
+#   search_vector @@ tsquery        -> idx_books_search_vector (GIN tsvector)
+#   Name ILIKE / <% on Name         -> idx_books_name_trgm (GIN trigram)
+#   AuthorName / PublisherName      -> idx_author_name_trgm / idx_publisher_name_trgm
+# so no branch falls back to a sequential scan of Books.
+SEARCH_QUERY = '''
+    WITH candidates AS (
+        SELECT BookId FROM Books
+        WHERE search_vector @@ to_tsquery('simple', %(tsquery)s)
+        UNION
+        SELECT BookId FROM Books
+        WHERE Name ILIKE %(like)s OR %(term)s <%% Name
+        UNION
+        SELECT b.BookId FROM Books b JOIN Author a ON a.AuthorId = b.authorID
+        WHERE a.AuthorName ILIKE %(like)s OR %(term)s <%% a.AuthorName
+        UNION
+        SELECT b.BookId FROM Books b JOIN Publisher p ON p.PublisherId = b.publisherID
+        WHERE %(term)s <%% p.PublisherName
+    ),
+    ranked AS (
+        SELECT {columns}, a.AuthorName AS authorname, p.PublisherName AS publishername,
+            (ts_rank(b.search_vector, to_tsquery('simple', %(tsquery)s))
+             + GREATEST(
+                 word_similarity(%(term)s, b.Name),
+                 0.8 * word_similarity(%(term)s, a.AuthorName),
+                 0.5 * word_similarity(%(term)s, COALESCE(p.PublisherName, ''))
+             ))::float8 AS score
+        FROM candidates c
+        JOIN Books b ON b.BookId = c.BookId
+        JOIN Author a ON a.AuthorId = b.authorID
+        LEFT JOIN Publisher p ON p.PublisherId = b.publisherID
+    )
+    SELECT * FROM ranked
+    {after}
+    ORDER BY score DESC, bookid ASC
+    LIMIT %(limit)s
+'''
+
+
+def to_prefix_tsquery(term):
+    """Turn free text into an AND-ed prefix tsquery (``harr:* & pot:*``) safe to pass to to_tsquery()."""
+    words = re.findall(r'\w+', term.lower())
+    return ' & '.join(f'{word}:*' for word in words)
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_books(cur, term, args):
+    """Relevance-ranked, typo-tolerant book search over title, author, publisher, genre and description.
+
+    Full-text matches are ranked by the weighted ``search_vector`` (title A,
+    author B, publisher/genre/category C, description D) and fuzzy matches by
+    trigram word similarity, so partial words and small typos still find the
+    book. Results are keyset-paginated on (score, bookid). ``cur`` must be a
+    RealDictCursor. Returns ``(rows, next_cursor)``.
+    """
+    limit = parse_limit(args.get('limit'))
+    params = {
+        'term': term,
+        'tsquery': to_prefix_tsquery(term),
+        'like': f'%{escape_like(term)}%',
+        'limit': limit + 1
+    }
+
+    after_clause = ''
+    if args.get('after'):
+        params['after_score'], params['after_bookid'] = decode_cursor(args['after'], 2)
+        after_clause = ('WHERE score < %(after_score)s '
+                        'OR (score = %(after_score)s AND bookid > %(after_bookid)s)')
+
+    # SET LOCAL only lasts until the end of this transaction
+    cur.execute('SET LOCAL pg_trgm.word_similarity_threshold = %s', (SIMILARITY_THRESHOLD,))
+    columns = ', '.join(f'b.{column}' for column in BOOK_RESULT_COLUMNS)
+    cur.execute(SEARCH_QUERY.format(columns=columns, after=after_clause), params)
+    rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1]['score'], rows[-1]['bookid']])
+    return rows, next_cursor
@@ -0,0 +1,91 @@
+import csv
+import io
+import os
+
+import psycopg2
+from flask import current_app
+from pagination import key_columns, parse_fields, parse_filters
+from psycopg2.extras import RealDictCursor
+
+# Rows pulled from the server-side cursor per network round trip
+EXPORT_ITERSIZE = int(os.getenv("EXPORT_ITERSIZE", 2000))
+# Flush the response once this many bytes are buffered
+CHUNK_SIZE = 64 * 1024
+
+
+def export_query(spec, args):
+    """Build the key-ordered SELECT behind a full export, honouring ``fields`` and the spec's filters.
+
+    Returns ``(fields, query, params)``.
+    """
+    fields = parse_fields(args.get('fields'), spec)
+    for key in key_columns(spec):
+        if key not in fields:
+            fields.insert(0, key)
+    clauses, params = parse_filters(args, spec)
+
+    query = f"SELECT {', '.join(fields)} FROM {spec['table']}"
+    if clauses:
+        query += ' WHERE ' + ' AND '.join(clauses)
+    query += ' ORDER BY ' + ', '.join(key_columns(spec))
+    return fields, query, params
+
+
+def iter_rows(conn, query, params, name):
+    """Yield rows from a named (server-side) cursor so only ``itersize`` rows are held at once.
+
+    A database error part way through is logged and re-raised: the headers
+    and a 200 have already gone out, so the only way left to tell the client
+    the body is incomplete is to abort the chunked response before its final
+    chunk. Iterate inside ``stream_with_context`` so the app logger is reachable.
+    """
+    cur = conn.cursor(name=name, cursor_factory=RealDictCursor)
+    cur.itersize = EXPORT_ITERSIZE
+    try:
+        cur.execute(query, params)
+        for row in cur:
+            yield row
+    except psycopg2.Error:
+        current_app.logger.exception('Export %s failed part way through', name)
+        raise
+    finally:
+        try:
+            cur.close()
+        except psycopg2.Error:
+            pass
+
+
+def ndjson_chunks(rows, dumps):
+    """Encode rows as newline-delimited JSON, yielding roughly CHUNK_SIZE pieces."""
+    buffer = []
+    size = 0
+    for row in rows:
+        line = dumps(row)
+        buffer.append(line)
+        size += len(line) + 1
+        if size >= CHUNK_SIZE:
+            yield '\n'.join(buffer) + '\n'
+            buffer = []
+            size = 0
+    if buffer:
+        yield '\n'.join(buffer) + '\n'
+
+
+def csv_chunks(rows, fields):
+    """Encode rows as CSV with a header line, yielding roughly CHUNK_SIZE pieces."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(fields)
+    # Send the header straight away so the download starts before the first batch arrives
+    yield out.getvalue()
+    out.seek(0)
+    out.truncate()
+
+    for row in rows:
+        writer.writerow([row[field] for field in fields])
+        if out.tell() >= CHUNK_SIZE:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+    if out.tell():
+        yield out.getvalue()
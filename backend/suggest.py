@@ -0,0 +1,271 @@
+import json
+import queue
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+
+import psycopg2
+from db_helper import db_connection
+from streaming import EXPORT_ITERSIZE
+
+# How many matching keys to look at before ranking; bounds the work per keystroke
+SCAN_LIMIT = 200
+# Seconds a suggestion request waits for a load already in progress
+LOAD_WAIT = 5.0
+# NOTIFY channel carrying title and author name changes (migration 12)
+SUGGESTION_CHANNEL = 'suggestion_change'
+# Sent instead of the changes when a statement or bulk write touches many titles
+REBUILD_PAYLOAD = json.dumps({'type': 'rebuild'})
+# Setting a bulk writer turns 'off' for its transaction (SET LOCAL) to silence
+# the triggers; it then sends REBUILD_PAYLOAD once itself
+SUGGESTION_NOTIFY_SETTING = 'library.suggestion_notify'
+# Changes arriving together beyond this many are not applied one by one; the
+# index is rebuilt instead, as after a bulk import
+REBUILD_THRESHOLD = 1000
+
+
+def normalize(text):
+    """Lower-case, strip accents and punctuation, and collapse whitespace."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return ' '.join(re.findall(r'\w+', text))
+
+
+def _index_keys(text):
+    """Keys for a title or name: the whole string plus the tail starting at every later word.
+
+    Indexing the word tails lets ``potter`` suggest "Harry Potter" while
+    still answering every lookup with a single bisect.
+    """
+    normalized = normalize(text)
+    words = normalized.split(' ')
+    keys = []
+    offset = 0
+    for position, word in enumerate(words):
+        if word:
+            keys.append((normalized[offset:], position))
+        offset += len(word) + 1
+    return keys
+
+
+class SuggestionIndex:
+    """In-memory prefix index over book titles and author names.
+
+    Keys live in one sorted list searched with bisect, so a lookup costs
+    O(log n) plus the handful of neighbouring keys it returns and never
+    touches the database. The index is built once per worker process and
+    then kept current by the write handlers and, for writes made by other
+    workers or outside the API, by SUGGESTION_CHANNEL notifications.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._load_finished = threading.Condition(self._lock)
+        self._keys = []
+        self._entries = {}
+        self._loaded = False
+        self._loading = False
+        self._pending = []
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    @property
+    def loading(self):
+        return self._loading
+
+    def wait_loaded(self, timeout):
+        """Wait for a load in progress to finish. Returns whether the index is loaded."""
+        with self._load_finished:
+            self._load_finished.wait_for(lambda: self._loaded or not self._loading, timeout)
+            return self._loaded
+
+    def _insert(self, kind, entry_id, text):
+        ref = (kind, entry_id)
+        self._entries[ref] = text
+        for key, position in _index_keys(text):
+            insort(self._keys, (key, position, kind, entry_id))
+
+    def _remove(self, kind, entry_id):
+        ref = (kind, entry_id)
+        text = self._entries.pop(ref, None)
+        if text is None:
+            return
+        for key, position in _index_keys(text):
+            item = (key, position, kind, entry_id)
+            i = bisect_left(self._keys, item)
+            if i < len(self._keys) and self._keys[i] == item:
+                del self._keys[i]
+
+    def upsert(self, kind, entry_id, text):
+        """Add or rename a ``book`` or ``author`` entry; a ``text`` of None removes it."""
+        with self._lock:
+            if self._loading:
+                # Replayed once the bulk load has swapped its snapshot in
+                self._pending.append((kind, entry_id, text))
+                return
+            self._remove(kind, entry_id)
+            if text:
+                self._insert(kind, entry_id, text)
+
+    def load(self, conn):
+        """(Re)build the index from Books and Author using a server-side cursor."""
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = True
+        try:
+            keys = []
+            entries = {}
+            for kind, query in (('book', 'SELECT BookId, Name FROM Books'),
+                                ('author', 'SELECT AuthorId, AuthorName FROM Author')):
+                cur = conn.cursor(name=f'suggest_load_{kind}')
+                cur.itersize = EXPORT_ITERSIZE
+                cur.execute(query)
+                for entry_id, text in cur:
+                    entries[(kind, entry_id)] = text
+                    keys.extend((key, position, kind, entry_id) for key, position in _index_keys(text))
+                cur.close()
+            conn.rollback()
+            keys.sort()
+        except psycopg2.Error:
+            with self._lock:
+                self._loading = False
+                self._pending = []
+                self._load_finished.notify_all()
+            raise
+
+        with self._lock:
+            self._keys = keys
+            self._entries = entries
+            self._loaded = True
+            self._loading = False
+            pending, self._pending = self._pending, []
+            for kind, entry_id, text in pending:
+                self.upsert(kind, entry_id, text)
+            self._load_finished.notify_all()
+        print(f"✅ Suggestion index loaded with {len(entries)} titles and authors")
+
+    def suggest(self, prefix, limit=10):
+        """Top ``limit`` entries whose title or name (or a word in it) starts with ``prefix``.
+
+        Matches at the start of the title rank ahead of matches on a later
+        word, and shorter titles ahead of longer ones.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            keys = self._keys
+            start = bisect_left(keys, (prefix,))
+            matches = {}
+            for key, position, kind, entry_id in keys[start:start + SCAN_LIMIT]:
+                if not key.startswith(prefix):
+                    break
+                ref = (kind, entry_id)
+                if ref not in matches or position < matches[ref]:
+                    matches[ref] = position
+            entries = self._entries
+            ranked = sorted(matches.items(), key=lambda item: (item[1], len(entries[item[0]]), entries[item[0]]))
+            return [{'type': kind, 'id': entry_id, 'text': entries[(kind, entry_id)]}
+                    for (kind, entry_id), _ in ranked[:limit]]
+
+
+suggestion_index = SuggestionIndex()
+
+
+def ensure_loaded():
+    """Build this process's index on first use, or wait for the load already running.
+
+    Returns False if the database is unavailable or the load has not
+    finished within LOAD_WAIT seconds.
+    """
+    if suggestion_index.loaded:
+        return True
+    if not suggestion_index.loading:
+        with db_connection() as conn:
+            if not conn:
+                return False
+            suggestion_index.load(conn)
+    return suggestion_index.wait_loaded(LOAD_WAIT)
+
+
+def warm_suggestion_index():
+    """Load the index in the background at startup so the first keystroke does not pay for it."""
+    try:
+        ensure_loaded()
+    except Exception as e:
+        print(f"Suggestion index warm-up error: {e}")
+
+
+def rebuild_suggestion_index():
+    """Reload this process's index from the database, e.g. after a bulk import."""
+    try:
+        with db_connection() as conn:
+            if conn:
+                suggestion_index.load(conn)
+    except Exception as e:
+        print(f"Suggestion index rebuild error: {e}")
+
+
+# Notifications waiting to be applied; None asks for a full rebuild
+_changes = queue.Queue()
+
+
+def handle_suggestion_change(payload):
+    """NOTIFY callback: queue a title or name change for apply_suggestion_changes().
+
+    The listener thread only queues it, so a bulk import's burst of
+    notifications cannot hold up cache invalidation.
+    """
+    _changes.put(payload)
+
+
+def request_rebuild():
+    """Listener reconnect callback: changes sent while it was away are lost, so reload."""
+    _changes.put(None)
+
+
+def parse_change(payload):
+    """A queued payload as ``(type, id, text)``, or None if it asks for a rebuild."""
+    if payload is None:
+        return None
+    change = json.loads(payload)
+    if change['type'] == 'rebuild':
+        return None
+    return change['type'], change['id'], change['text']
+
+
+def apply_suggestion_changes():
+    """Apply queued changes to this process's index, for ever; run in a daemon thread.
+
+    Changes are taken in batches. A batch larger than REBUILD_THRESHOLD, or
+    one holding a rebuild request (from a listener reconnect or a
+    REBUILD_PAYLOAD notification), reloads the index instead, which is
+    cheaper than that many sorted inserts.
+    """
+    while True:
+        batch = [_changes.get()]
+        while True:
+            try:
+                batch.append(_changes.get_nowait())
+            except queue.Empty:
+                break
+        if not suggestion_index.loaded and not suggestion_index.loading:
+            # Nothing to keep current yet; the first load reads the latest state
+            continue
+        changes = []
+        for payload in batch:
+            try:
+                changes.append(parse_change(payload))
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Suggestion change error: {e}")
+        if len(changes) > REBUILD_THRESHOLD or None in changes:
+            # A load already running may have read its rows before these changes
+            suggestion_index.wait_loaded(None)
+            rebuild_suggestion_index()
+            continue
+        for kind, entry_id, text in changes:
+            suggestion_index.upsert(kind, entry_id, text)
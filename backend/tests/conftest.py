@@ -0,0 +1,59 @@
+"""Fixtures for tests of the SQL itself: functions, triggers and the queries handlers run.
+
+These use the database configured by the DB_* variables, migrated with
+migrations.py, and are skipped when it cannot be reached. Each test runs in
+one transaction that is rolled back afterwards, so nothing it writes stays
+and no NOTIFY is ever delivered.
+"""
+import uuid
+from datetime import date
+
+import psycopg2
+import pytest
+from db_helper import DB_CONFIG
+
+
+@pytest.fixture
+def db():
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f'database not reachable: {e}')
+    try:
+        yield conn.cursor()
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+@pytest.fixture
+def make_user(db):
+    """Create a user and return its UserId."""
+    def make():
+        token = uuid.uuid4().hex
+        user_id = f'T{token[:9]}'
+        db.execute('INSERT INTO Users (UserId, Username, Email, PasswordHash) VALUES (%s, %s, %s, %s)',
+                   (user_id, f'test-{token[:20]}', f'{token[:20]}@example.com', f'hash-{token}'))
+        return user_id
+    return make
+
+
+@pytest.fixture
+def make_book(db):
+    """Create a book with ``copies`` on the shelf and return its BookId."""
+    token = uuid.uuid4().hex[:20]
+    db.execute('INSERT INTO Author (AuthorName) VALUES (%s) RETURNING AuthorId', (f'Author {token}',))
+    author_id = db.fetchone()[0]
+    db.execute('INSERT INTO Publisher (PublisherName) VALUES (%s) RETURNING PublisherId', (f'Publisher {token}',))
+    publisher_id = db.fetchone()[0]
+
+    def make(copies):
+        db.execute('''
+            INSERT INTO Books (Name, authorID, category, genre, publisherID, publishdate, language,
+                               pagecount, copiesavailable, ratedType)
+            VALUES (%s, %s, 'Fiction', 'Mystery', %s, %s, 'English', 100, %s, 'General')
+            RETURNING BookId
+        ''', (f'Book {token}', author_id, publisher_id, date(2000, 1, 1), copies))
+        return db.fetchone()[0]
+    return make
+
@@ -0,0 +1,7 @@
+from crud_api import _prefixed
+
+
+def test_prefixed_pulls_out_the_joined_columns():
+    row = {'bookid': 1, 'booking_bookingid': 7, 'booking_duedate': None, 'reservation_reservationid': None}
+    assert _prefixed(row, 'booking_') == {'bookingid': 7, 'duedate': None}
+    assert _prefixed(row, 'reservation_') is None
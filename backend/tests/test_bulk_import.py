@@ -0,0 +1,84 @@
+import io
+
+import pytest
+from bulk_import import STAGING_COLUMNS, import_books, parse_row, read_rows
+
+ROW = {
+    'Name': ' Dune ', 'Category': 'Fiction', 'Genre': 'Science Fiction', 'PublishDate': '1965-08-01',
+    'Language': 'English', 'PageCount': '412', 'CopiesAvailable': 3, 'RatedType': 'PG',
+    'AuthorName': 'Frank Herbert', 'PublisherName': 'Chilton'
+}
+
+
+def parsed(row, line=2):
+    return dict(zip(STAGING_COLUMNS, parse_row(line, row)))
+
+
+def test_valid_row_in_staging_order():
+    values = parse_row(2, ROW)
+    assert len(values) == len(STAGING_COLUMNS)
+    row = dict(zip(STAGING_COLUMNS, values))
+    assert row['line'] == 2
+    assert row['bookid'] is None
+    assert row['name'] == 'Dune'
+    assert row['author_name'] == 'Frank Herbert'
+    assert row['publishdate'] == '1965-08-01'
+    assert row['pagecount'] == 412
+    assert row['copiesavailable'] == 3
+    assert row['description'] is None
+
+
+def test_column_names_are_matched_case_insensitively():
+    row = parsed({' BOOKID ': '17', **{key.lower(): value for key, value in ROW.items()}})
+    assert row['bookid'] == 17
+    assert row['name'] == 'Dune'
+
+
+def test_plain_imglink_is_kept():
+    row = parsed({**ROW, 'imglink': 'https://covers.example/dune.jpg'})
+    assert row['imglink'] == 'https://covers.example/dune.jpg'
+    assert row['cover_hash'] is None
+
+
+@pytest.mark.parametrize('change, message', [
+    ({'Name': '  '}, 'name is required'),
+    ({'PublisherName': None}, 'publishername is required'),
+    ({'Name': 'x' * 51}, 'name is longer than 50 characters'),
+    ({'PublishDate': '01/08/1965'}, 'publishdate must be YYYY-MM-DD'),
+    ({'PageCount': 'many'}, 'pagecount must be an integer'),
+    ({'CopiesAvailable': -1}, 'copiesavailable must be at least 0'),
+    ({'BookId': '0'}, 'bookid must be at least 1'),
+    ({'BookId': '2147483648'}, 'bookid must be at most 2147483647'),
+    ({'PageCount': 10 ** 12}, 'pagecount must be at most 2147483647'),
+    ({'CopiesAvailable': '99999999999'}, 'copiesavailable must be at most 2147483647'),
+])
+def test_invalid_rows_raise_value_error(change, message):
+    with pytest.raises(ValueError, match=message):
+        parse_row(2, {**ROW, **change})
+
+
+def test_largest_int_is_accepted():
+    row = parsed({**ROW, 'BookId': '2147483647', 'PageCount': 2147483647})
+    assert row['bookid'] == 2147483647
+    assert row['pagecount'] == 2147483647
+
+
+def test_out_of_range_row_is_reported_by_line_without_touching_the_database():
+    report = import_books(None, [(5, {**ROW, 'PageCount': '3000000000'})])
+    assert report['error_count'] == 1
+    assert report['errors'] == [{'line': 5, 'message': 'pagecount must be at most 2147483647'}]
+    assert report['inserted'] == 0
+
+
+def test_ndjson_line_that_is_not_an_object():
+    with pytest.raises(ValueError, match='not a JSON object'):
+        parse_row(1, None)
+
+
+def test_read_rows_numbers_csv_and_ndjson_lines():
+    csv_rows = list(read_rows(io.StringIO('name,genre\nDune,SF\nEmma,Romance\n'), 'csv'))
+    assert [line for line, _ in csv_rows] == [2, 3]
+    assert csv_rows[1][1] == {'name': 'Emma', 'genre': 'Romance'}
+
+    ndjson_rows = list(read_rows(io.StringIO('{"name": "Dune"}\n\n[1, 2]\nnot json\n'), 'ndjson'))
+    assert ndjson_rows == [(1, {'name': 'Dune'}), (3, None), (4, None)]
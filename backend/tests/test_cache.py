@@ -0,0 +1,136 @@
+import pytest
+from cache import RedisCache, TTLCache, cached_json, create_cache, handle_invalidation
+from flask import Flask, jsonify
+
+
+def test_get_returns_what_was_set():
+    cache = TTLCache(max_bytes=1024, ttl=60)
+    cache.set('key', b'value', tags=('books',))
+    assert cache.get('key') == b'value'
+    assert cache.get('other') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_invalidate_drops_tagged_entries_only():
+    cache = TTLCache(max_bytes=1024, ttl=60)
+    cache.set('books', b'1', tags=('books', 'authors'))
+    cache.set('publishers', b'2', tags=('publishers',))
+    cache.invalidate('authors')
+    assert cache.get('books') is None
+    assert cache.get('publishers') == b'2'
+
+
+def test_set_refuses_a_result_read_before_an_invalidation():
+    cache = TTLCache(max_bytes=1024, ttl=60)
+    generation = cache.generation(('books',))
+    cache.invalidate('books')
+    cache.set('key', b'stale', tags=('books',), generation=generation)
+    assert cache.get('key') is None
+
+    cache.set('key', b'fresh', tags=('books',), generation=cache.generation(('books',)))
+    assert cache.get('key') == b'fresh'
+
+
+def test_generation_only_moves_for_its_own_tags():
+    cache = TTLCache(max_bytes=1024, ttl=60)
+    generation = cache.generation(('books',))
+    cache.invalidate('authors')
+    assert cache.generation(('books',)) == generation
+
+
+def test_total_size_is_bounded_by_evicting_least_recently_used():
+    cache = TTLCache(max_bytes=10, ttl=60)
+    cache.set('a', b'aaaa')
+    cache.set('b', b'bbbb')
+    cache.get('a')
+    cache.set('c', b'cccc')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'aaaa'
+    assert cache.get('c') == b'cccc'
+    stats = cache.stats()
+    assert stats['bytes'] == 8
+    assert stats['evictions'] == 1
+
+
+def test_value_larger_than_the_bound_is_not_stored():
+    cache = TTLCache(max_bytes=4, ttl=60)
+    cache.set('key', b'too large')
+    assert cache.get('key') is None
+    assert cache.stats()['bytes'] == 0
+
+
+def test_replacing_an_entry_keeps_the_byte_count():
+    cache = TTLCache(max_bytes=1024, ttl=60)
+    cache.set('key', b'12345')
+    cache.set('key', b'12')
+    assert cache.stats()['bytes'] == 2
+    assert cache.stats()['entries'] == 1
+
+
+def test_expired_entries_are_misses():
+    cache = TTLCache(max_bytes=1024, ttl=60)
+    cache.set('key', b'value', ttl=0)
+    assert cache.get('key') is None
+    stats = cache.stats()
+    assert stats['expirations'] == 1
+    assert stats['bytes'] == 0
+
+
+def test_clear_refuses_a_result_read_before_it():
+    cache = TTLCache(max_bytes=1024, ttl=60)
+    cache.set('key', b'old', tags=('books',))
+    generation = cache.generation(('books',))
+    cache.clear()
+    assert cache.get('key') is None
+    cache.set('key', b'stale', tags=('books',), generation=generation)
+    assert cache.get('key') is None
+
+
+def test_create_cache_backends():
+    assert isinstance(create_cache('memory'), TTLCache)
+    assert isinstance(create_cache('redis'), RedisCache)
+    with pytest.raises(ValueError):
+        create_cache('memcached')
+
+
+def test_redis_errors_degrade_to_misses():
+    # Nothing listens on port 1, so every command fails
+    cache = RedisCache(url='redis://127.0.0.1:1/0')
+    assert cache.generation(('books',)) is None
+    cache.set('key', b'value', tags=('books',))
+    assert cache.get('key', ('books',)) is None
+    cache.invalidate('books')
+    stats = cache.stats()
+    assert stats['errors'] == 4
+    assert stats['hits'] == stats['stores'] == stats['invalidations'] == 0
+
+
+def test_handle_invalidation_uses_the_table_as_the_tag(monkeypatch):
+    cache = TTLCache(max_bytes=1024, ttl=60)
+    cache.set('books', b'1', tags=('books',))
+    cache.set('authors', b'2', tags=('authors',))
+    monkeypatch.setattr('cache.catalogue_cache', cache)
+    handle_invalidation('books:42:1700000000.5')
+    assert cache.get('books') is None
+    assert cache.get('authors') == b'2'
+
+
+def test_cached_json_serves_hits_until_invalidated(monkeypatch):
+    cache = TTLCache(max_bytes=1024, ttl=60)
+    monkeypatch.setattr('cache.catalogue_cache', cache)
+    calls = []
+    app = Flask(__name__)
+
+    @app.route('/books')
+    @cached_json('books')
+    def books():
+        calls.append(1)
+        return jsonify({'count': len(calls)})
+
+    client = app.test_client()
+    assert client.get('/books').get_json() == {'count': 1}
+    assert client.get('/books').get_json() == {'count': 1}
+    assert client.get('/books?page=2').get_json() == {'count': 2}
+    cache.invalidate('books')
+    assert client.get('/books').get_json() == {'count': 3}
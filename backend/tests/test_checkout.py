@@ -0,0 +1,53 @@
+"""Inventory-safe checkout (CHECKOUT_QUERY) and booking deletes, against the database."""
+from datetime import datetime, timedelta
+
+from crud_api import BOOKING_DELETE_QUERY, CHECKOUT_QUERY
+
+HOLD = timedelta(hours=72)
+
+
+def checkout(db, user_id, book_id):
+    now = datetime.now()
+    db.execute(CHECKOUT_QUERY, {'user_id': user_id, 'book_id': book_id, 'booking_date': now,
+                                'due_date': now + timedelta(days=14), 'transaction_date': now})
+    row = db.fetchone()
+    return row[0] if row else None
+
+
+def shelf(db, book_id):
+    db.execute('SELECT copiesavailable FROM Books WHERE BookId = %s', (book_id,))
+    return db.fetchone()[0]
+
+
+def test_checkout_takes_a_copy_off_the_shelf(db, make_book, make_user):
+    book_id = make_book(2)
+    assert checkout(db, make_user(), book_id) is not None
+    assert shelf(db, book_id) == 1
+
+
+def test_last_copy_cannot_be_taken_twice(db, make_book, make_user):
+    book_id = make_book(1)
+    assert checkout(db, make_user(), book_id) is not None
+    assert checkout(db, make_user(), book_id) is None
+    assert shelf(db, book_id) == 0
+    db.execute('SELECT COUNT(*) FROM Bookings WHERE BookId = %s', (book_id,))
+    assert db.fetchone()[0] == 1
+
+
+def test_checkout_consumes_the_users_reservation(db, make_book, make_user):
+    book_id, user_id = make_book(1), make_user()
+    db.execute('INSERT INTO Reservations (UserId, BookId) VALUES (%s, %s)', (user_id, book_id))
+    assert checkout(db, user_id, book_id) is not None
+    db.execute('SELECT COUNT(*) FROM Reservations WHERE UserId = %s AND BookId = %s', (user_id, book_id))
+    assert db.fetchone()[0] == 0
+    db.execute('SELECT ReservedIndicator FROM TransactionHistory WHERE UserId = %s AND BookId = %s',
+               (user_id, book_id))
+    assert db.fetchall() == [(True,)]
+
+
+def test_deleting_a_booking_releases_its_copy(db, make_book, make_user):
+    book_id = make_book(1)
+    booking_id = checkout(db, make_user(), book_id)
+    db.execute(BOOKING_DELETE_QUERY, {'booking_id': booking_id, 'hold_for': HOLD})
+    assert db.fetchone()[3] is True
+    assert shelf(db, book_id) == 1
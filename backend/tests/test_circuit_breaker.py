@@ -0,0 +1,62 @@
+import threading
+import time
+
+from circuit_breaker import CircuitBreaker, backoff_delay
+
+
+def test_backoff_delay_is_capped():
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, 0.1, 1.0) <= min(1.0, 0.1 * 2 ** attempt)
+
+
+def test_opens_after_consecutive_failures():
+    opened = []
+    breaker = CircuitBreaker(lambda: False, failure_threshold=3, probe_base_delay=60, on_open=lambda: opened.append(1))
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert opened == [1]
+    stats = breaker.stats()
+    assert stats['times_opened'] == 1
+    assert stats['rejected_requests'] == 1
+    assert stats['retry_after'] >= 1
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(lambda: False, failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_further_failures_while_open_do_not_reopen():
+    opened = []
+    breaker = CircuitBreaker(lambda: False, failure_threshold=1, probe_base_delay=60, on_open=lambda: opened.append(1))
+    breaker.record_failure()
+    breaker.record_failure()
+    assert opened == [1]
+
+
+def test_probe_closes_the_circuit():
+    reachable = threading.Event()
+
+    def probe():
+        reachable.set()
+        return True
+
+    breaker = CircuitBreaker(probe, failure_threshold=1, probe_base_delay=0.01, probe_max_delay=0.01)
+    breaker.record_failure()
+    assert reachable.wait(5)
+    for _ in range(500):
+        if breaker.state == CircuitBreaker.CLOSED:
+            break
+        time.sleep(0.01)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+    assert breaker.retry_after() == 1
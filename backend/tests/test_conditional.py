@@ -0,0 +1,121 @@
+import conditional
+import pytest
+from conditional import TableVersions, handle_version_notification
+from flask import Flask, jsonify
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    versions = TableVersions()
+    monkeypatch.setattr(conditional, 'table_versions', versions)
+    return versions
+
+
+@pytest.fixture
+def client(versions):
+    calls = []
+    app = Flask(__name__)
+
+    @app.route('/books')
+    @conditional.conditional('books', 'authors')
+    def books():
+        calls.append(1)
+        return jsonify({'count': len(calls)})
+
+    @app.route('/missing')
+    @conditional.conditional('books')
+    def missing():
+        return jsonify({'success': False}), 404
+
+    return app.test_client()
+
+
+def test_snapshot_needs_every_table():
+    versions = TableVersions()
+    versions.update('books', 7)
+    assert versions.snapshot(('books',)) == (7,)
+    assert versions.snapshot(('books', 'authors')) is None
+
+
+def test_latest_notification_wins_even_if_smaller():
+    versions = TableVersions()
+    versions.update('books', 9)
+    versions.update('books', 8)
+    assert versions.snapshot(('books',)) == (8,)
+
+
+def test_bump_gives_fresh_local_tokens():
+    versions = TableVersions()
+    versions.update('books', 7)
+    versions.bump('books', 'authors')
+    first = versions.snapshot(('books', 'authors'))
+    versions.bump('books')
+    second = versions.snapshot(('books', 'authors'))
+    assert first[0] != 7 and isinstance(first[0], str)
+    assert second[0] != first[0]
+    assert second[1] == first[1]
+
+
+def test_reset_forgets_every_table():
+    versions = TableVersions()
+    versions.update('books', 7)
+    versions.reset()
+    assert versions.snapshot(('books',)) is None
+
+
+def test_handle_version_notification(versions):
+    handle_version_notification('books:42:1700000000.5')
+    handle_version_notification('malformed')
+    assert versions.snapshot(('books',)) == (42,)
+    assert versions.stats()['authors'] is None
+
+
+def test_no_etag_until_the_tables_have_tokens(client, versions):
+    versions.update('books', 1)
+    response = client.get('/books')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+
+
+def test_matching_etag_is_answered_with_304_without_the_handler(client, versions):
+    versions.update('books', 1)
+    versions.update('authors', 1)
+    response = client.get('/books')
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'public, no-cache'
+
+    revalidated = client.get('/books', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == etag
+    assert client.get('/books').get_json() == {'count': 2}
+
+
+def test_a_write_changes_the_etag(client, versions):
+    versions.update('books', 1)
+    versions.update('authors', 1)
+    etag = client.get('/books').headers['ETag']
+    versions.bump('authors')
+    response = client.get('/books', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_etag_depends_on_the_query_string(client, versions):
+    versions.update('books', 1)
+    versions.update('authors', 1)
+    assert client.get('/books?page=1').headers['ETag'] != client.get('/books?page=2').headers['ETag']
+
+
+def test_if_modified_since_alone_is_ignored(client, versions):
+    versions.update('books', 1)
+    versions.update('authors', 1)
+    response = client.get('/books', headers={'If-Modified-Since': 'Wed, 01 Jan 2100 00:00:00 GMT'})
+    assert response.status_code == 200
+    assert 'Last-Modified' not in response.headers
+
+
+def test_errors_carry_no_etag(client, versions):
+    versions.update('books', 1)
+    response = client.get('/missing')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
@@ -0,0 +1,43 @@
+import crud_api
+import pytest
+from flask import Flask
+
+
+class Connection:
+    closed = 0
+
+    def close(self):
+        self.closed += 1
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(crud_api.crud_bp)
+    return app.test_client()
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = Connection()
+    monkeypatch.setattr(crud_api, 'get_db_connection', lambda: conn)
+    return conn
+
+
+def test_connection_is_released_when_the_response_closes(client, conn, monkeypatch):
+    monkeypatch.setattr(crud_api, 'iter_rows', lambda *args: iter([{'bookid': 1}, {'bookid': 2}]))
+    response = client.get('/api/books/export?format=csv&fields=bookid')
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).splitlines() == ['bookid', '1', '2']
+    response.close()
+    assert conn.closed == 1
+
+
+def test_connection_is_released_when_setup_fails(client, conn, monkeypatch):
+    def fail(*args):
+        raise RuntimeError('cursor could not be created')
+
+    monkeypatch.setattr(crud_api, 'iter_rows', fail)
+    response = client.get('/api/books/export')
+    assert response.status_code == 500
+    assert conn.closed == 1
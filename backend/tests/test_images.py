@@ -0,0 +1,63 @@
+import io
+import os
+
+import images
+import pytest
+from images import ImageError, UnsupportedImageType, image_path, store_image
+
+Image = pytest.importorskip('PIL.Image')
+
+
+@pytest.fixture(autouse=True)
+def image_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, 'IMAGE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def png(size=(40, 60)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def test_store_writes_the_image_and_its_thumbnail():
+    data = png()
+    digest, created = store_image(data)
+    assert created
+    with open(image_path(digest), 'rb') as f:
+        assert f.read() == data
+    with Image.open(image_path(digest, thumbnail=True)) as thumbnail:
+        assert thumbnail.format == 'JPEG'
+
+    assert store_image(data) == (digest, False)
+
+
+def test_unknown_format_is_unsupported():
+    with pytest.raises(UnsupportedImageType):
+        store_image(b'%PDF-1.7 not an image')
+
+
+def test_truncated_image_is_refused_and_not_stored(image_dir):
+    with pytest.raises(ImageError, match='could not be decoded'):
+        store_image(png()[:60])
+    assert not any(files for _, _, files in os.walk(image_dir))
+
+
+def test_decompression_bomb_is_refused_and_not_stored(image_dir, monkeypatch):
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 100)
+    with pytest.raises(ImageError, match='could not be decoded'):
+        store_image(png((100, 100)))
+    assert not any(files for _, _, files in os.walk(image_dir))
+
+
+def test_upload_answers_bad_images_with_4xx():
+    from crud_api import crud_bp
+    from flask import Flask
+    app = Flask(__name__)
+    app.register_blueprint(crud_bp)
+    client = app.test_client()
+    assert client.post('/api/images', data=b'GIF89a' + b'\0' * 20).status_code == 400
+    assert client.post('/api/images', data=b'plain text').status_code == 415
+    response = client.post('/api/images', data=png())
+    assert response.status_code == 201
+    assert response.get_json()['thumbnail_url'].endswith('/thumb')
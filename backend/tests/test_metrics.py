@@ -0,0 +1,67 @@
+import os
+
+from metrics import Registry, exposition
+
+
+def make_registry(tmp_path):
+    registry = Registry(str(tmp_path))
+    requests = registry.register('http_requests_total', 'counter', 'HTTP requests completed.', ('route', 'status'))
+    in_flight = registry.register('http_requests_in_flight', 'gauge', 'Requests being handled.', ('route',))
+    duration = registry.register('http_request_duration_seconds', 'histogram', 'Time to produce the response.',
+                                 ('route',), (0.1, 1))
+    return registry, requests, in_flight, duration
+
+
+def test_counter_and_gauge_lines(tmp_path):
+    registry, requests, in_flight, _ = make_registry(tmp_path)
+    requests.inc(('/api/books', '200'))
+    requests.inc(('/api/books', '200'), 2)
+    in_flight.inc(('/api/books',))
+    in_flight.dec(('/api/books',))
+
+    lines = exposition(registry.collect()).splitlines()
+    assert '# HELP http_requests_total HTTP requests completed.' in lines
+    assert '# TYPE http_requests_total counter' in lines
+    assert 'http_requests_total{route="/api/books",status="200"} 3' in lines
+    assert '# TYPE http_requests_in_flight gauge' in lines
+    assert 'http_requests_in_flight{route="/api/books"} 0' in lines
+
+
+def test_histogram_buckets_are_cumulative(tmp_path):
+    registry, _, _, duration = make_registry(tmp_path)
+    for seconds in (0.05, 0.5, 0.5, 3):
+        duration.observe(('/api/books',), seconds)
+
+    lines = exposition(registry.collect()).splitlines()
+    assert '# TYPE http_request_duration_seconds histogram' in lines
+    assert 'http_request_duration_seconds_bucket{route="/api/books",le="0.1"} 1' in lines
+    assert 'http_request_duration_seconds_bucket{route="/api/books",le="1.0"} 3' in lines
+    assert 'http_request_duration_seconds_bucket{route="/api/books",le="+Inf"} 4' in lines
+    assert 'http_request_duration_seconds_sum{route="/api/books"} 4.05' in lines
+    assert 'http_request_duration_seconds_count{route="/api/books"} 4' in lines
+
+
+def test_label_values_are_escaped(tmp_path):
+    registry, requests, _, _ = make_registry(tmp_path)
+    requests.inc(('a "quoted"\\path\n', '500'))
+    assert 'http_requests_total{route="a \\"quoted\\"\\\\path\\n",status="500"} 1' in exposition(registry.collect())
+
+
+def test_exposition_ends_with_a_newline(tmp_path):
+    registry, _, _, _ = make_registry(tmp_path)
+    text = exposition(registry.collect())
+    assert text.endswith('\n')
+    assert text.startswith('# HELP ')
+
+
+def test_collect_sums_other_workers_and_drops_their_gauges_once_exited(tmp_path):
+    registry, requests, in_flight, _ = make_registry(tmp_path)
+    requests.inc(('/api/books', '200'))
+    in_flight.inc(('/api/books',))
+    registry.flush()
+    # Stand in for a worker that has since exited: same snapshot under a pid that is not running
+    os.rename(tmp_path / f'{os.getpid()}.json', tmp_path / '999999999.json')
+
+    merged = registry.collect()
+    assert merged['http_requests_total']['samples'][('/api/books', '200')] == 2
+    assert merged['http_requests_in_flight']['samples'][('/api/books',)] == 1
@@ -0,0 +1,113 @@
+import migrations
+import pytest
+from migrations import MIGRATIONS, Migration
+
+
+class Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._rows = []
+
+    def execute(self, statement, params=None):
+        self.conn.log.append((statement, self.conn.autocommit))
+        if statement in self.conn.fail_on:
+            raise RuntimeError(statement)
+        if 'pg_try_advisory_lock' in statement:
+            self._rows = [(True,)]
+        elif statement == 'SELECT version FROM schema_migrations':
+            self._rows = [(version,) for version in sorted(self.conn.done)]
+        elif statement.startswith('INSERT INTO schema_migrations'):
+            self.conn.recorded.append(params[0])
+
+    def fetchone(self):
+        return self._rows[0]
+
+    def fetchall(self):
+        return self._rows
+
+
+class Connection:
+    """Records the statements migrate() runs, with the autocommit mode of each."""
+
+    def __init__(self, done=(), fail_on=()):
+        self.done = set(done)
+        self.fail_on = set(fail_on)
+        self.autocommit = False
+        self.closed = False
+        self.log = []
+        self.recorded = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+    def statements(self):
+        return [statement for statement, _ in self.log]
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = Connection()
+    monkeypatch.setattr(migrations.psycopg2, 'connect', lambda **kwargs: conn)
+    monkeypatch.setattr(migrations, 'MIGRATIONS', [
+        Migration(1, 'one', ['first']),
+        Migration(2, 'two', ['second a', 'second b']),
+        Migration(3, 'three', ['third'], transactional=False),
+        Migration(4, 'four', ['fourth'])
+    ])
+    return conn
+
+
+def test_shipped_versions_are_contiguous_and_in_order():
+    assert [m.version for m in MIGRATIONS] == list(range(1, len(MIGRATIONS) + 1))
+    assert len({m.name for m in MIGRATIONS}) == len(MIGRATIONS)
+
+
+def test_pending_migrations_run_in_version_order(conn):
+    assert migrations.migrate() == [1, 2, 3, 4]
+    statements = conn.statements()
+    assert [s for s in statements if s in ('first', 'second a', 'second b', 'third', 'fourth')] == \
+        ['first', 'second a', 'second b', 'third', 'fourth']
+    assert conn.recorded == [1, 2, 3, 4]
+    assert conn.commits == 3
+    assert 'pg_advisory_unlock' in statements[-1]
+    assert conn.closed
+
+
+def test_transactional_flag_sets_autocommit(conn):
+    migrations.migrate()
+    modes = dict(conn.log)
+    assert modes['first'] is False
+    assert modes['third'] is True
+
+
+def test_applied_versions_are_skipped(conn):
+    conn.done = {1, 3}
+    assert migrations.migrate() == [2, 4]
+    assert 'first' not in conn.statements()
+    assert 'third' not in conn.statements()
+
+
+def test_target_stops_after_that_version(conn):
+    assert migrations.migrate(target=2) == [1, 2]
+    assert 'third' not in conn.statements()
+
+
+def test_failure_rolls_back_and_stops(conn):
+    conn.fail_on = {'second b'}
+    with pytest.raises(RuntimeError):
+        migrations.migrate()
+    assert conn.recorded == [1]
+    assert conn.rollbacks == 1
+    assert 'third' not in conn.statements()
+    assert 'pg_advisory_unlock' in conn.statements()[-1]
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+from pagination import MAX_LIMIT, QueryParamError, decode_cursor, encode_cursor, id_list, parse_filters
+
+
+def test_cursor_round_trip():
+    token = encode_cursor(['Fiction', 42])
+    assert decode_cursor(token, 2) == ['Fiction', 42]
+
+
+def test_cursor_is_url_safe_and_unpadded():
+    token = encode_cursor(['a title with ? & / and ünïcode', 1])
+    assert '=' not in token
+    assert all(ch.isalnum() or ch in '-_' for ch in token)
+    assert decode_cursor(token, 2) == ['a title with ? & / and ünïcode', 1]
+
+
+def test_cursor_encodes_dates_as_text():
+    token = encode_cursor([datetime(2024, 3, 1, 12, 30), 'USR0000001'])
+    assert decode_cursor(token, 2) == ['2024-03-01 12:30:00', 'USR0000001']
+
+
+@pytest.mark.parametrize('token', ['not a cursor', '!!!', encode_cursor({'bookid': 1})[:-2], ''])
+def test_malformed_cursor_is_rejected(token):
+    with pytest.raises(QueryParamError):
+        decode_cursor(token, 1)
+
+
+def test_cursor_with_wrong_keyset_length_is_rejected():
+    with pytest.raises(QueryParamError):
+        decode_cursor(encode_cursor([1]), 2)
+
+
+def test_cursor_that_is_not_a_list_is_rejected():
+    with pytest.raises(QueryParamError):
+        decode_cursor(encode_cursor({'bookid': 1}), 1)
+
+
+IDS_SPEC = {'filters': {'ids': ('BookId = ANY(%s)', id_list(int))}}
+
+
+def test_id_list_filter():
+    assert parse_filters({'ids': '3, 1,,2'}, IDS_SPEC) == (['BookId = ANY(%s)'], [[3, 1, 2]])
+
+
+def test_id_list_length_limit_is_reported_as_such():
+    ids = ','.join(str(n) for n in range(MAX_LIMIT + 1))
+    with pytest.raises(QueryParamError, match=f'at most {MAX_LIMIT}'):
+        parse_filters({'ids': ids}, IDS_SPEC)
+
+
+def test_malformed_id_list_is_rejected():
+    with pytest.raises(QueryParamError, match='Invalid value for ids'):
+        parse_filters({'ids': '1,two'}, IDS_SPEC)
@@ -0,0 +1,65 @@
+"""Statement counts of the endpoints that used to run a query per row.
+
+These run against the database configured by the DB_* variables, migrated
+and with some data in it, and are skipped when it cannot be reached.
+"""
+import psycopg2
+import pytest
+from db_helper import DB_CONFIG
+from query_log import query_budget
+
+
+def _first(query):
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f'database not reachable: {e}')
+    try:
+        cur = conn.cursor()
+        cur.execute(query)
+        row = cur.fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        pytest.skip(f'no rows for: {query}')
+    return row
+
+
+@pytest.fixture(scope='module')
+def client():
+    _first('SELECT 1')
+    from app import app
+    from suggest import ensure_loaded
+    # query_budget counts every thread's statements, so let the start-up index load finish first
+    ensure_loaded()
+    return app.test_client()
+
+
+@pytest.fixture(scope='module')
+def booking():
+    return _first('SELECT UserId, BookId FROM Bookings LIMIT 1')
+
+
+def test_book_detail_is_one_query(client, booking):
+    user_id, book_id = booking
+    with query_budget(1):
+        response = client.get(f'/api/books/{book_id}/detail')
+    assert response.status_code == 200
+
+    with query_budget(1):
+        response = client.get(f'/api/books/{book_id}/detail?user_id={user_id}')
+    assert response.status_code == 200
+    assert response.get_json()['user']['user_id'] == user_id
+
+
+def test_bookings_with_names_is_one_query_per_page(client, booking):
+    with query_budget(1) as recorded:
+        response = client.get('/api/bookings?include_names=1&limit=500')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert all(row['username'] and row['bookname'] for row in body['bookings'])
+    assert len(recorded) == 1
+
+    with query_budget(2):
+        response = client.get('/api/bookings?include_names=1&include_total=1&limit=500')
+    assert response.status_code == 200
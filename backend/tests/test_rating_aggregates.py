@@ -0,0 +1,65 @@
+"""Rating aggregates: the Reviews triggers that maintain them (migration 5) and rating_summary().
+
+The trigger tests run against the database; see conftest.py.
+"""
+from crud_api import rating_summary
+
+
+def aggregates(db, book_id):
+    db.execute('SELECT review_count, rating_sum, rating_histogram, average_rating FROM Books WHERE BookId = %s',
+               (book_id,))
+    return db.fetchone()
+
+
+def review(db, book_id, user_id, rating):
+    db.execute('INSERT INTO Reviews (BookID, UserId, Rating) VALUES (%s, %s, %s)', (book_id, user_id, rating))
+
+
+def test_new_book_has_empty_aggregates(db, make_book):
+    assert aggregates(db, make_book(1)) == (0, 0, [0, 0, 0, 0, 0], 0)
+
+
+def test_reviews_are_counted(db, make_book, make_user):
+    book_id = make_book(1)
+    review(db, book_id, make_user(), 5)
+    review(db, book_id, make_user(), 4)
+    review(db, book_id, make_user(), 4)
+    assert aggregates(db, book_id) == (3, 13, [0, 0, 0, 2, 1], 4.33)
+
+
+def test_changed_rating_moves_between_buckets(db, make_book, make_user):
+    book_id = make_book(1)
+    user_id = make_user()
+    review(db, book_id, user_id, 2)
+    review(db, book_id, make_user(), 4)
+    db.execute('UPDATE Reviews SET Rating = 5 WHERE BookID = %s AND UserId = %s', (book_id, user_id))
+    assert aggregates(db, book_id) == (2, 9, [0, 0, 0, 1, 1], 4.5)
+
+
+def test_edit_without_a_rating_change_leaves_aggregates_alone(db, make_book, make_user):
+    book_id = make_book(1)
+    user_id = make_user()
+    review(db, book_id, user_id, 3)
+    db.execute("UPDATE Reviews SET ReviewDescription = 'Fine' WHERE BookID = %s AND UserId = %s", (book_id, user_id))
+    assert aggregates(db, book_id) == (1, 3, [0, 0, 1, 0, 0], 3)
+
+
+def test_deleting_the_last_review_resets_the_average(db, make_book, make_user):
+    book_id = make_book(1)
+    user_id = make_user()
+    review(db, book_id, user_id, 1)
+    db.execute('DELETE FROM Reviews WHERE BookID = %s AND UserId = %s', (book_id, user_id))
+    assert aggregates(db, book_id) == (0, 0, [0, 0, 0, 0, 0], 0)
+
+
+def test_rating_summary():
+    summary = rating_summary({'review_count': 3, 'average_rating': 4.33, 'rating_histogram': [0, 0, 0, 2, 1]})
+    assert summary == {'review_count': 3, 'average_rating': 4.33, 'min_rating': 4, 'max_rating': 5,
+                       'histogram': {'1': 0, '2': 0, '3': 0, '4': 2, '5': 1}}
+
+
+def test_rating_summary_without_reviews():
+    summary = rating_summary({'review_count': 0, 'average_rating': 0, 'rating_histogram': None})
+    assert summary['average_rating'] is None
+    assert summary['min_rating'] is None and summary['max_rating'] is None
+    assert summary['histogram'] == {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0}
@@ -0,0 +1,109 @@
+"""The reservation queue's functions (migration 8) and checkout's use of holds, against the database."""
+from datetime import datetime, timedelta
+
+import pytest
+from crud_api import CHECKOUT_QUERY, QUEUE_POSITION_QUERY
+
+HOLD = timedelta(hours=72)
+
+
+def reserve(db, user_id, book_id, day):
+    db.execute('INSERT INTO Reservations (UserId, BookId, ReservationDate) VALUES (%s, %s, %s) RETURNING ReservationId',
+               (user_id, book_id, datetime(2024, 1, day)))
+    return db.fetchone()[0]
+
+
+def allocate(db, book_id):
+    db.execute('SELECT allocate_returned_copy(%s, %s)', (book_id, HOLD))
+    return db.fetchone()[0]
+
+
+def shelf(db, book_id):
+    db.execute('SELECT copiesavailable FROM Books WHERE BookId = %s', (book_id,))
+    return db.fetchone()[0]
+
+
+def checkout(db, user_id, book_id):
+    now = datetime.now()
+    db.execute(CHECKOUT_QUERY, {'user_id': user_id, 'book_id': book_id, 'booking_date': now,
+                                'due_date': now + timedelta(days=14), 'transaction_date': now})
+    return db.fetchone()
+
+
+@pytest.fixture
+def queue(db, make_user, make_book):
+    """An empty shelf with three reservers, queued in the order second, first, third by date."""
+    book_id = make_book(0)
+    users = [make_user() for _ in range(3)]
+    reserve(db, users[1], book_id, 1)
+    reserve(db, users[0], book_id, 2)
+    reserve(db, users[2], book_id, 3)
+    return book_id, [users[1], users[0], users[2]]
+
+
+def test_returned_copies_are_held_in_reservation_order(db, queue):
+    book_id, in_line = queue
+    assert [allocate(db, book_id) for _ in range(3)] == in_line
+    assert shelf(db, book_id) == 0
+    # Everyone in line has a hold now, so the next copy goes back on the shelf
+    assert allocate(db, book_id) is None
+    assert shelf(db, book_id) == 1
+
+
+def test_same_date_reservations_are_served_by_id(db, make_user, make_book):
+    book_id = make_book(0)
+    first, second = make_user(), make_user()
+    reserve(db, first, book_id, 1)
+    reserve(db, second, book_id, 1)
+    assert allocate(db, book_id) == first
+
+
+def test_copy_goes_to_the_shelf_while_copies_remain(db, queue):
+    book_id, _ = queue
+    db.execute('UPDATE Books SET copiesavailable = 1 WHERE BookId = %s', (book_id,))
+    assert allocate(db, book_id) is None
+    assert shelf(db, book_id) == 2
+    db.execute('SELECT COUNT(*) FROM Reservations WHERE BookId = %s AND HoldExpiresAt IS NOT NULL', (book_id,))
+    assert db.fetchone()[0] == 0
+
+
+def test_expired_hold_passes_to_the_next_in_line(db, queue):
+    book_id, in_line = queue
+    allocate(db, book_id)
+    db.execute("UPDATE Reservations SET HoldExpiresAt = LOCALTIMESTAMP - INTERVAL '1 second' "
+               'WHERE BookId = %s AND UserId = %s', (book_id, in_line[0]))
+    db.execute('SELECT book_id, expired_user, held_for FROM expire_reservation_holds(%s) WHERE book_id = %s',
+               (HOLD, book_id))
+    assert db.fetchall() == [(book_id, in_line[0], in_line[1])]
+    db.execute('SELECT UserId FROM Reservations WHERE BookId = %s ORDER BY ReservationDate', (book_id,))
+    assert [row[0] for row in db.fetchall()] == in_line[1:]
+
+
+def test_queue_position(db, queue):
+    book_id, in_line = queue
+    db.execute('SELECT ReservationId FROM Reservations WHERE BookId = %s AND UserId = %s', (book_id, in_line[2]))
+    db.execute(QUEUE_POSITION_QUERY, (db.fetchone()[0],))
+    _, _, _, position, queue_length = db.fetchone()
+    assert (position, queue_length) == (3, 3)
+
+
+def test_only_the_holder_can_check_out_a_held_copy(db, queue):
+    book_id, in_line = queue
+    allocate(db, book_id)
+    assert checkout(db, in_line[1], book_id) is None
+    assert checkout(db, in_line[0], book_id) is not None
+    assert shelf(db, book_id) == 0
+    db.execute('SELECT COUNT(*) FROM Reservations WHERE BookId = %s AND UserId = %s', (book_id, in_line[0]))
+    assert db.fetchone()[0] == 0
+
+
+def test_checkout_leaves_an_expired_hold_for_the_sweeper(db, queue):
+    book_id, in_line = queue
+    allocate(db, book_id)
+    db.execute("UPDATE Reservations SET HoldExpiresAt = LOCALTIMESTAMP - INTERVAL '1 second' "
+               'WHERE BookId = %s AND UserId = %s', (book_id, in_line[0]))
+    db.execute('UPDATE Books SET copiesavailable = 1 WHERE BookId = %s', (book_id,))
+    assert checkout(db, in_line[0], book_id) is not None
+    # The held copy is still owed to the queue: the sweeper passes it on
+    db.execute('SELECT COUNT(*) FROM Reservations WHERE BookId = %s AND UserId = %s', (book_id, in_line[0]))
+    assert db.fetchone()[0] == 1
@@ -0,0 +1,61 @@
+"""Return approval in one statement (RETURN_APPROVAL_QUERY), against the database."""
+from datetime import datetime, timedelta
+
+from crud_api import RETURN_APPROVAL_QUERY
+
+HOLD = timedelta(hours=72)
+
+
+def book_out(db, user_id, book_id, pending=True):
+    db.execute('''
+        INSERT INTO Bookings (UserId, BookId, dueDate, CurrentlyBookedIndicator, pendingReturnIndicator)
+        VALUES (%s, %s, LOCALTIMESTAMP + INTERVAL '14 days', TRUE, %s)
+        RETURNING BookingId
+    ''', (user_id, book_id, pending))
+    return db.fetchone()[0]
+
+
+def approve(db, booking_id):
+    db.execute(RETURN_APPROVAL_QUERY, {'booking_id': booking_id, 'transaction_date': datetime.now(),
+                                       'hold_for': HOLD})
+    return db.fetchall()
+
+
+def shelf(db, book_id):
+    db.execute('SELECT copiesavailable FROM Books WHERE BookId = %s', (book_id,))
+    return db.fetchone()[0]
+
+
+def test_approved_return_goes_back_on_the_shelf_and_is_logged(db, make_book, make_user):
+    book_id, user_id = make_book(0), make_user()
+    booking_id = book_out(db, user_id, book_id)
+    assert approve(db, booking_id) == [(user_id, book_id, None)]
+    assert shelf(db, book_id) == 1
+    db.execute('SELECT COUNT(*) FROM Bookings WHERE BookingId = %s', (booking_id,))
+    assert db.fetchone()[0] == 0
+    db.execute('SELECT ReservedIndicator FROM TransactionHistory WHERE UserId = %s AND BookId = %s',
+               (user_id, book_id))
+    assert db.fetchall() == [(False,)]
+
+
+def test_booking_without_a_return_request_is_left_alone(db, make_book, make_user):
+    book_id = make_book(0)
+    booking_id = book_out(db, make_user(), book_id, pending=False)
+    assert approve(db, booking_id) == []
+    assert shelf(db, book_id) == 0
+
+
+def test_returned_copy_is_held_for_the_next_reserver(db, make_book, make_user):
+    book_id, reserver = make_book(0), make_user()
+    db.execute('INSERT INTO Reservations (UserId, BookId) VALUES (%s, %s)', (reserver, book_id))
+    booking_id = book_out(db, make_user(), book_id)
+    assert approve(db, booking_id)[0][2] == reserver
+    assert shelf(db, book_id) == 0
+
+
+def test_approving_twice_restocks_once(db, make_book, make_user):
+    book_id = make_book(2)
+    booking_id = book_out(db, make_user(), book_id)
+    approve(db, booking_id)
+    assert approve(db, booking_id) == []
+    assert shelf(db, book_id) == 3
@@ -0,0 +1,14 @@
+from search import escape_like, to_prefix_tsquery
+
+
+def test_prefix_tsquery_ands_every_word():
+    assert to_prefix_tsquery('Harry Pot') == 'harry:* & pot:*'
+
+
+def test_prefix_tsquery_drops_tsquery_syntax():
+    assert to_prefix_tsquery("o'brien & (war | peace)!") == 'o:* & brien:* & war:* & peace:*'
+    assert to_prefix_tsquery(' ?! ') == ''
+
+
+def test_escape_like():
+    assert escape_like('100%_done\\') == '100\\%\\_done\\\\'
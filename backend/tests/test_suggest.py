@@ -0,0 +1,78 @@
+import json
+
+from suggest import REBUILD_PAYLOAD, SuggestionIndex, normalize, parse_change
+
+
+def make_index():
+    index = SuggestionIndex()
+    index.upsert('book', 1, 'Harry Potter and the Philosopher\'s Stone')
+    index.upsert('book', 2, 'Harry Potter')
+    index.upsert('book', 3, 'The Hobbit')
+    index.upsert('author', 7, 'Gabriel García Márquez')
+    return index
+
+
+def test_normalize_strips_accents_case_and_punctuation():
+    assert normalize('  García-Márquez,  GABRIEL ') == 'garcia marquez gabriel'
+    assert normalize(None) == ''
+
+
+def test_prefix_of_the_whole_title():
+    assert [s['id'] for s in make_index().suggest('harry')] == [2, 1]
+
+
+def test_prefix_of_a_later_word_ranks_after_title_matches():
+    index = make_index()
+    index.upsert('book', 4, 'Potter\'s Field')
+    assert [s['id'] for s in index.suggest('potter')] == [4, 2, 1]
+
+
+def test_accented_names_match_plain_prefixes():
+    assert make_index().suggest('marq') == [{'type': 'author', 'id': 7, 'text': 'Gabriel García Márquez'}]
+
+
+def test_limit_and_empty_prefix():
+    index = make_index()
+    assert len(index.suggest('harry', limit=1)) == 1
+    assert index.suggest('') == []
+    assert index.suggest('?!') == []
+
+
+def test_rename_replaces_the_old_keys():
+    index = make_index()
+    index.upsert('book', 3, 'The Silmarillion')
+    assert index.suggest('hobbit') == []
+    assert [s['id'] for s in index.suggest('silm')] == [3]
+
+
+def test_upsert_with_no_text_removes_the_entry():
+    index = make_index()
+    index.upsert('book', 2, None)
+    assert [s['id'] for s in index.suggest('harry')] == [1]
+    index.upsert('book', 99, None)
+
+
+def test_books_and_authors_with_the_same_id_are_separate():
+    index = make_index()
+    index.upsert('author', 3, 'Tolkien')
+    index.upsert('author', 3, None)
+    assert [s['id'] for s in index.suggest('hobbit')] == [3]
+
+
+def test_wait_loaded_without_a_load_in_progress():
+    index = SuggestionIndex()
+    assert not index.loading
+    assert index.wait_loaded(0) is False
+
+
+def test_parse_change():
+    payload = json.dumps({'type': 'book', 'id': 3, 'text': 'The Hobbit'})
+    assert parse_change(payload) == ('book', 3, 'The Hobbit')
+    assert parse_change(json.dumps({'type': 'author', 'id': 7, 'text': None})) == ('author', 7, None)
+
+
+def test_rebuild_payload_and_reconnect_both_ask_for_a_rebuild():
+    assert parse_change(REBUILD_PAYLOAD) is None
+    # As sent by the trigger, with json_build_object()'s spacing
+    assert parse_change('{"type" : "rebuild"}') is None
+    assert parse_change(None) is None
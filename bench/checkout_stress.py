@@ -0,0 +1,98 @@
+"""Hammer POST /api/bookings for one title in parallel and check that no copy is sold twice.
+
+Sets the book to --copies copies and fires --requests checkouts at it from
+--concurrency threads. Exactly --copies of them must succeed (201), the rest
+must be refused with 409, and the book must end with zero copies. The
+bookings made are deleted and the original copy count restored afterwards.
+
+    python bench/checkout_stress.py --base-url http://localhost:5000 --book-id 1 --user-id USR1234567
+"""
+import argparse
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+
+def call(method, url, body=None):
+    """Return (status, parsed JSON body) without raising on HTTP errors."""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=60) as res:
+            return res.status, json.loads(res.read() or b'{}')
+    except urllib.error.HTTPError as e:
+        try:
+            return e.code, json.loads(e.read() or b'{}')
+        except ValueError:
+            return e.code, {}
+
+
+def copies_available(base_url, book_id):
+    status, body = call('GET', f'{base_url}/api/books?book_id={book_id}')
+    if status != 200:
+        sys.exit(f'Could not read book {book_id}: {status} {body}')
+    return body['book']['copiesavailable']
+
+
+def set_copies(base_url, book_id, copies):
+    status, body = call('PUT', f'{base_url}/api/books/{book_id}', {'copiesavailable': copies})
+    if status != 200:
+        sys.exit(f'Could not set copies on book {book_id}: {status} {body}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--book-id', type=int, required=True)
+    parser.add_argument('--user-id', required=True, help='existing UserId to book as')
+    parser.add_argument('--copies', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=100)
+    args = parser.parse_args()
+
+    original_copies = copies_available(args.base_url, args.book_id)
+    set_copies(args.base_url, args.book_id, args.copies)
+    due_date = (datetime.now() + timedelta(days=14)).strftime('%Y-%m-%d %H:%M:%S')
+    checkout = {'UserId': args.user_id, 'BookId': args.book_id, 'dueDate': due_date}
+
+    def attempt(_):
+        return call('POST', f'{args.base_url}/api/bookings', checkout)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(attempt, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(status for status, _ in results)
+    booking_ids = [body['booking_id'] for status, body in results if status == 201]
+    final_copies = copies_available(args.base_url, args.book_id)
+
+    for booking_id in booking_ids:
+        call('DELETE', f'{args.base_url}/api/bookings/{booking_id}')
+    set_copies(args.base_url, args.book_id, original_copies)
+
+    expected = min(args.copies, args.requests)
+    ok = (statuses[201] == expected
+          and statuses[409] == args.requests - expected
+          and final_copies == args.copies - expected)
+    print(json.dumps({
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'copies': args.copies,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'final_copies': final_copies,
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_s': round(args.requests / elapsed, 1),
+        'oversold': max(statuses[201] - args.copies, 0),
+        'ok': ok
+    }, indent=2))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
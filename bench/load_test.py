@@ -0,0 +1,422 @@
+"""Drive a mixed, realistic workload at the API and report throughput and latency as JSON.
+
+Each worker thread loops over weighted scenarios:
+
+    browse     GET /api/books (one page, the dashboard's projection)
+    search     GET /api/books/search with a word taken from a real title
+    detail     GET /api/books/<id>/detail for the logged-in user
+    login      POST /api/login
+    admin      GET /api/bookings?pending=1&include_names=1 (the admin panel's poll)
+    checkout   POST /api/bookings, then the return request and its approval,
+               so stock levels end where they started
+
+Every request is timed on its own and reported per operation: requests,
+errors, requests/s and p50/p95/p99 latency. The report carries the git
+commit, so runs can be compared across commits with --compare.
+
+Against a server that is already running:
+
+    python bench/load_test.py --base-url http://localhost:5000 --username alice --password secret
+
+Or let the script start Postgres (docker compose) and the app (gunicorn) itself:
+
+    python bench/load_test.py --start-db --start-server --username alice --password secret \\
+        --duration 60 --concurrency 32 --output results.json
+
+--streams N keeps N idle event streams (GET /api/bookings/events) open for
+the whole run, as that many open admin tabs would, and reports how many the
+server accepted. --server asgi runs the same test against the asyncio mode.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+
+# Relative frequency of each scenario in the mix; --mix overrides
+DEFAULT_MIX = {'browse': 40, 'search': 20, 'detail': 20, 'login': 5, 'admin': 10, 'checkout': 5}
+
+# Same credentials as the db service in docker-compose.yml
+COMPOSE_DB_ENV = {'DB_HOST': 'localhost', 'DB_PORT': '5432', 'DB_NAME': 'library_db',
+                  'DB_USER': 'postgres', 'DB_PASSWORD': 'postgres123'}
+
+# Ways to serve the app for --start-server; {python} and {port} are filled in
+SERVER_COMMANDS = {
+    'gunicorn': ['{python}', '-m', 'gunicorn', '--bind', '127.0.0.1:{port}', '--workers', '4', '--threads', '8',
+                 '--timeout', '0', 'app:app'],
+    'asgi': ['{python}', '-m', 'uvicorn', '--host', '127.0.0.1', '--port', '{port}', '--workers', '4',
+             '--no-access-log', 'asgi:app'],
+}
+
+
+class Client:
+    """One keep-alive HTTP connection, as a browser tab would hold."""
+
+    def __init__(self, base_url):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.https = parsed.scheme == 'https'
+        self.host = parsed.netloc
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        """Return (status, parsed JSON body or None); status is 0 if the request failed outright."""
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if data is not None else {}
+        for attempt in range(2):
+            if self.conn is None:
+                connection = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+                self.conn = connection(self.host, timeout=60)
+            try:
+                self.conn.request(method, path, body=data, headers=headers)
+                res = self.conn.getresponse()
+                raw = res.read()
+                try:
+                    return res.status, json.loads(raw) if raw else None
+                except ValueError:
+                    return res.status, None
+            except (OSError, http.client.HTTPException):
+                # The server may close an idle keep-alive connection; retry once on a new one
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    return 0, None
+
+
+class SharedCounter:
+    """Thread-safe source of 0, 1, 2, ... shared by the worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0
+
+    def __next__(self):
+        with self._lock:
+            value = self._value
+            self._value += 1
+            return value
+
+
+class Recorder:
+    """Latencies and status codes per operation, shared by all worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+
+    def timed(self, client, operation, method, path, body=None, expected=()):
+        start = time.perf_counter()
+        status, payload = client.request(method, path, body)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        failed = not (200 <= status < 400 or status in expected)
+        with self._lock:
+            self.latencies[operation].append(elapsed_ms)
+            self.statuses[operation][status] += 1
+            if failed:
+                self.errors[operation] += 1
+        return status, payload
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    index = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return round(ordered[index], 3)
+
+
+def summarise(recorder, elapsed):
+    operations = {}
+    for operation in sorted(recorder.latencies):
+        ordered = sorted(recorder.latencies[operation])
+        count = len(ordered)
+        operations[operation] = {
+            'requests': count,
+            'errors': recorder.errors[operation],
+            'error_rate': round(recorder.errors[operation] / count, 4),
+            'requests_per_s': round(count / elapsed, 2),
+            'latency_ms': {
+                'mean': round(sum(ordered) / count, 3),
+                'p50': percentile(ordered, 0.50),
+                'p95': percentile(ordered, 0.95),
+                'p99': percentile(ordered, 0.99),
+                'max': round(ordered[-1], 3)
+            },
+            'statuses': {str(status): n for status, n in sorted(recorder.statuses[operation].items())}
+        }
+    everything = sorted(latency for latencies in recorder.latencies.values() for latency in latencies)
+    errors = sum(recorder.errors.values())
+    total = {
+        'requests': len(everything),
+        'errors': errors,
+        'error_rate': round(errors / len(everything), 4) if everything else 0,
+        'requests_per_s': round(len(everything) / elapsed, 2),
+        'latency_ms': {'p50': percentile(everything, 0.50), 'p95': percentile(everything, 0.95),
+                       'p99': percentile(everything, 0.99)}
+    }
+    return operations, total
+
+
+class Workload:
+    """The scenarios, and the ids and words they pick from."""
+
+    def __init__(self, recorder, book_ids, search_terms, user, credentials, mix):
+        self.recorder = recorder
+        self.book_ids = book_ids
+        self.search_terms = search_terms
+        self.user = user
+        self.credentials = credentials
+        self.scenarios = list(mix)
+        self.weights = [mix[name] for name in self.scenarios]
+
+    def browse(self, client, rng):
+        params = urllib.parse.urlencode({'fields': 'bookid,name,imglink,cover_hash,category', 'limit': 50,
+                                         'sort': rng.choice(['bookid', 'name', '-average_rating'])})
+        self.recorder.timed(client, 'browse', 'GET', f'/api/books?{params}')
+
+    def search(self, client, rng):
+        params = urllib.parse.urlencode({'name': rng.choice(self.search_terms), 'limit': 20})
+        self.recorder.timed(client, 'search', 'GET', f'/api/books/search?{params}')
+
+    def detail(self, client, rng):
+        book_id = rng.choice(self.book_ids)
+        self.recorder.timed(client, 'detail', 'GET', f"/api/books/{book_id}/detail?user_id={self.user['userid']}")
+
+    def login(self, client, rng):
+        self.recorder.timed(client, 'login', 'POST', '/api/login', self.credentials)
+
+    def admin(self, client, rng):
+        self.recorder.timed(client, 'admin', 'GET', '/api/bookings?pending=1&include_names=1&limit=50')
+
+    def checkout(self, client, rng):
+        due_date = (datetime.now() + timedelta(days=14)).strftime('%Y-%m-%d %H:%M:%S')
+        booking = {'UserId': self.user['userid'], 'BookId': rng.choice(self.book_ids), 'dueDate': due_date}
+        # 409 is the correct answer for a title with no copies left
+        status, body = self.recorder.timed(client, 'checkout', 'POST', '/api/bookings', booking, expected=(409,))
+        if status != 201:
+            return
+        path = f"/api/bookings/{body['booking_id']}"
+        self.recorder.timed(client, 'return_request', 'PUT', path, {'pendingReturnIndicator': True})
+        self.recorder.timed(client, 'return_approval', 'PUT', path, {'pendingReturnIndicator': False})
+
+    def run(self, base_url, seed, deadline, max_requests, counter):
+        rng = random.Random(seed)
+        client = Client(base_url)
+        while time.monotonic() < deadline and next(counter) < max_requests:
+            scenario = rng.choices(self.scenarios, self.weights)[0]
+            getattr(self, scenario)(client, rng)
+
+
+def fetch_fixtures(base_url, credentials, sample):
+    """Book ids and search words from the live catalogue, and the user to act as."""
+    client = Client(base_url)
+    status, body = client.request('POST', '/api/login', credentials)
+    if status != 200:
+        sys.exit(f'Login as {credentials["username"]} failed: {status} {body}')
+    user = body['user']
+
+    status, body = client.request('GET', f'/api/books?fields=bookid,name&limit={sample}')
+    if status != 200 or not body.get('books'):
+        sys.exit(f'Could not list books (is the catalogue empty?): {status}')
+    books = body['books']
+    terms = sorted({word for book in books for word in book['name'].split() if len(word) > 3}) or ['the']
+    return [book['bookid'] for book in books], terms, user
+
+
+def open_event_streams(base_url, count):
+    """Open ``count`` event streams and leave them idle. Returns the open sockets and a Counter of statuses."""
+    parsed = urllib.parse.urlsplit(base_url)
+    request = (f'GET /api/bookings/events HTTP/1.1\r\nHost: {parsed.netloc}\r\n'
+               'Accept: text/event-stream\r\n\r\n').encode()
+    streams, statuses = [], Counter()
+    for _ in range(count):
+        try:
+            sock = socket.create_connection((parsed.hostname, parsed.port or 80), timeout=10)
+        except OSError:
+            statuses[0] += 1
+            continue
+        try:
+            sock.sendall(request)
+            status_line = sock.makefile('rb').readline().split()
+            status = int(status_line[1]) if len(status_line) > 1 else 0
+        except (OSError, ValueError):
+            status = 0
+        statuses[status] += 1
+        if status == 200:
+            streams.append(sock)
+        else:
+            sock.close()
+    return streams, statuses
+
+
+def wait_until_up(base_url, timeout):
+    deadline = time.monotonic() + timeout
+    client = Client(base_url)
+    while time.monotonic() < deadline:
+        status, _ = client.request('GET', '/api/health')
+        if status == 200:
+            return
+        time.sleep(0.5)
+    sys.exit(f'Server at {base_url} did not become healthy within {timeout}s')
+
+
+def start_database():
+    subprocess.run(['docker', 'compose', 'up', '-d', '--wait', 'db'], cwd=ROOT, check=True)
+
+
+def start_server(server, port, db_env):
+    """Apply migrations, then start the app in the background. Returns the process."""
+    env = {**os.environ, **db_env, 'PORT': str(port)}
+    subprocess.run([sys.executable, 'migrations.py'], cwd=BACKEND, env=env, check=True)
+    command = [part.format(python=sys.executable, port=port) for part in SERVER_COMMANDS[server]]
+    return subprocess.Popen(command, cwd=BACKEND, env=env, start_new_session=True)
+
+
+def stop_server(process):
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """Per-operation change from a previous report: throughput and p95 as ratios."""
+    changes = {}
+    for operation, current in report['operations'].items():
+        before = baseline.get('operations', {}).get(operation)
+        if not before or not before['latency_ms']['p95']:
+            continue
+        changes[operation] = {
+            'requests_per_s_ratio': round(current['requests_per_s'] / before['requests_per_s'], 3),
+            'p95_ratio': round(current['latency_ms']['p95'] / before['latency_ms']['p95'], 3),
+            'error_rate_change': round(current['error_rate'] - before['error_rate'], 4)
+        }
+    return {'baseline_commit': baseline.get('commit'), 'operations': changes}
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f'unknown scenario {name!r}; choose from {", ".join(DEFAULT_MIX)}')
+        mix[name] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--username', required=True, help='existing user to log in and book as')
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help='seconds of measured load')
+    parser.add_argument('--requests', type=int, default=None, help='stop after this many scenarios instead')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds of unmeasured load first')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='weights such as browse=50,search=30,checkout=20')
+    parser.add_argument('--sample', type=int, default=500, help='books to pick ids and search words from')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--streams', type=int, default=0,
+                        help='idle event streams to hold open during the run (plain http only)')
+    parser.add_argument('--start-db', action='store_true', help='docker compose up the db service first')
+    parser.add_argument('--start-server', action='store_true',
+                        help='migrate and serve backend/ locally, against the compose database')
+    parser.add_argument('--server', choices=sorted(SERVER_COMMANDS), default='gunicorn')
+    parser.add_argument('--port', type=int, default=5055, help='port for --start-server')
+    parser.add_argument('--output', help='also write the JSON report here')
+    parser.add_argument('--compare', help='earlier JSON report to compare against')
+    args = parser.parse_args()
+
+    if args.start_db:
+        start_database()
+    server = None
+    streams, stream_statuses = [], Counter()
+    base_url = args.base_url
+    if args.start_server:
+        base_url = f'http://127.0.0.1:{args.port}'
+        db_env = {name: os.environ.get(name, value) for name, value in COMPOSE_DB_ENV.items()}
+        server = start_server(args.server, args.port, db_env)
+
+    try:
+        wait_until_up(base_url, timeout=60)
+        credentials = {'username': args.username, 'password': args.password}
+        book_ids, terms, user = fetch_fixtures(base_url, credentials, args.sample)
+        if args.streams:
+            streams, stream_statuses = open_event_streams(base_url, args.streams)
+
+        def run_phase(duration, recorder, max_requests, seed):
+            workload = Workload(recorder, book_ids, terms, user, credentials, args.mix)
+            deadline = time.monotonic() + duration
+            counter = SharedCounter()
+            threads = [threading.Thread(target=workload.run,
+                                        args=(base_url, seed + i, deadline, max_requests, counter))
+                       for i in range(args.concurrency)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return time.perf_counter() - started
+
+        if args.warmup:
+            run_phase(args.warmup, Recorder(), float('inf'), args.seed + 100000)
+        recorder = Recorder()
+        duration = args.duration if args.requests is None else float('inf')
+        elapsed = run_phase(duration, recorder, args.requests or float('inf'), args.seed)
+    finally:
+        for sock in streams:
+            sock.close()
+        if server:
+            stop_server(server)
+
+    operations, total = summarise(recorder, elapsed)
+    report = {
+        'commit': git_commit(),
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'config': {'base_url': base_url, 'server': args.server if args.start_server else None,
+                   'concurrency': args.concurrency, 'duration_s': round(elapsed, 3), 'mix': args.mix,
+                   'seed': args.seed, 'books_sampled': len(book_ids)},
+        'total': total,
+        'operations': operations
+    }
+    if args.streams:
+        # Status 0 is a connection that failed or was dropped before answering
+        report['streams'] = {'requested': args.streams, 'held': len(streams),
+                             'statuses': {str(status): n for status, n in sorted(stream_statuses.items())}}
+    if args.compare:
+        with open(args.compare) as f:
+            report['comparison'] = compare(report, json.load(f))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -114,7 +114,7 @@ function setCoverImageSafely(imgElement, url, placeholder = "../placeholder.png"
 let Book = {};
 let Author = {};
 let Publisher = {};
-let userData = { booked: 0, pendingreturn: 0, personalRating: 0, wishlisted: 0 };
+let userData = { booked: 0, pendingreturn: 0, personalRating: 0, wishlisted: 0, held: 0 };
 let previousBookingState = { booked: 0, pendingreturn: 0 };  // Track previous state for return detection
 
 // Main data loader (revised)
@@ -132,20 +132,23 @@ async function loadRealBookData() {
     const imgEl = document.getElementById("book-img");
     if (imgEl) imgEl.src = "../placeholder.png";
 
-    const booksRes = await fetchJson(`${API_BASE}/api/books`);
-
-    if (!booksRes.success || !booksRes.books) {
-      console.error("Books list empty");
-      return;
-    }
+    const currentUser = JSON.parse(
+      sessionStorage.getItem("selectedUser") ||
+      localStorage.getItem("selectedUser") ||
+      "null"
+    );
+    const userQuery = currentUser ? `?user_id=${encodeURIComponent(currentUser.userid)}` : "";
 
-    const b = booksRes.books.find((x) => String(x.bookid) === String(bookId));
+    // One request returns the book, its author, publisher, rating and this user's own state
+    const detailRes = await fetchJson(`${API_BASE}/api/books/${bookId}/detail${userQuery}`);
 
-    if (!b) {
-      console.error("Book not found in all-books list");
+    if (!detailRes.success || !detailRes.book) {
+      console.error("Book not found");
       return;
     }
 
+    const b = detailRes.book;
+
     Book = {
       BookId: b.bookid,
       Name: b.name,
@@ -157,169 +160,64 @@ async function loadRealBookData() {
       Language: b.language,
       PageCount: b.pagecount,
       CopiesAvailable: b.copiesavailable,
-      ImgLink: b.imglink || "../placeholder.png",
+      ImgLink: b.cover_hash ? `${API_BASE}/api/images/${b.cover_hash}` : b.imglink || "../placeholder.png",
+      CoverHash: b.cover_hash,
       RatedType: b.ratedtype,
       Description: b.description || "",
-      Rating: 0,
-      UsersRated: 0,
+      Rating: detailRes.rating.average_rating ? Number(detailRes.rating.average_rating) : 0,
+      UsersRated: detailRes.rating.review_count || 0,
     };
- 
-    const fullBookRes = await fetchJson(`${API_BASE}/api/books?book_id=${bookId}`);
-
-    if (fullBookRes.success && fullBookRes.book) {
-      const full = fullBookRes.book;
 
-      if (full.authorid) {
-        try {
-          const aRes = await fetchJson(`${API_BASE}/api/authors?author_id=${full.authorid}`);
-          if (aRes.success && aRes.author) {
-            Author = {
-              AuthorId: aRes.author.authorid,
-              AuthorName: aRes.author.authorname || "Unknown",
-              AuthorBio: aRes.author.authorbio || ""
-            };
-          }
-        } catch (e) {
-          // ignore author errors, show Unknown later
-        }
-      }
-         
-      if (full.publisherid) {
-        try {
-          const pRes = await fetchJson(`${API_BASE}/api/publishers?publisher_id=${full.publisherid}`);
-          if (pRes.success && pRes.publisher) {
-            Publisher = {
-              PublisherId: pRes.publisher.publisherid,
-              PublisherName: pRes.publisher.publishername || "Unknown"
-            };
-          }
-        } catch (e) {
-          // ignore publisher errors
-        }
-      }
+    if (detailRes.author) {
+      Author = {
+        AuthorId: detailRes.author.authorid,
+        AuthorName: detailRes.author.authorname || "Unknown",
+        AuthorBio: detailRes.author.authorbio || ""
+      };
     }
 
-    try {
-      const ratingRes = await fetchJson(`${API_BASE}/api/reviews/rating/${bookId}`);
-      Book.Rating = ratingRes.average_rating ? Number(ratingRes.average_rating) : 0;
-      Book.UsersRated = ratingRes.review_count || 0;
-    } catch (e) {
-      Book.Rating = 0;
-      Book.UsersRated = 0;
+    if (detailRes.publisher) {
+      Publisher = {
+        PublisherId: detailRes.publisher.publisherid,
+        PublisherName: detailRes.publisher.publishername || "Unknown"
+      };
     }
 
-  const currentUser = JSON.parse(
-  sessionStorage.getItem("selectedUser") ||
-  localStorage.getItem("selectedUser") ||
-  "null"
-);
-
-if (currentUser) {
-  const userId = currentUser.userid;
-  
-  try {
-    const res = await fetch(`${API_BASE}/api/reviews?book_id=${bookId}&user_id=${userId}`);
-
-    if (res.status === 404) {
-      console.warn("NO USER RATING (404), SET 0");
-      userData.personalRating = 0;
-
-    } else if (res.ok) {
-      const data = await res.json();
-      console.log("REVIEWS API RAW RESPONSE:", data);
-
-      if (data?.success && data.review && typeof data.review.rating === "number") {
-        console.log("USER RATING FOUND:", data.review.rating);
-        userData.personalRating = Number(data.review.rating);
-      } else {
-        console.warn("NO USER RATING, SETTING TO 0");
-        userData.personalRating = 0;
-      }
+    if (currentUser && detailRes.user) {
+      const { booking, reservation, review } = detailRes.user;
 
-    } else {
-      userData.personalRating = 0;
-    }
+      userData.personalRating = review && typeof review.rating === "number" ? Number(review.rating) : 0;
 
-  } catch (err) {
-    console.warn("ERROR GETTING PERSONAL RATING:", err);
-    userData.personalRating = 0;
-  }
-
-  try {
-    const bookingRes = await fetchJson(`${API_BASE}/api/bookings?user_id=${userId}&book_id=${bookId}`);
-    
-    console.log("RAW BOOKING RESPONSE:", bookingRes);
-    console.log("Looking for bookId:", bookId, "userId:", userId);
-    
-    if (bookingRes.success && bookingRes.bookings && bookingRes.bookings.length > 0) {
-      // Filter to find booking for THIS SPECIFIC BOOK (in case API returns all bookings)
-      const booking = bookingRes.bookings.find(b => String(b.bookid) === String(bookId));
-      
       if (booking) {
-        console.log("BOOKING FOUND FOR THIS BOOK:", booking);
-        
-        const isCurrentlyBooked = booking.currentlybookedindicator || false;
-        const isPendingReturn = booking.pendingreturnindicator || false;
-        
-        userData.booked = isCurrentlyBooked ? 1 : 0;
-        userData.pendingreturn = isPendingReturn ? 1 : 0;
+        userData.booked = booking.currentlybookedindicator ? 1 : 0;
+        userData.pendingreturn = booking.pendingreturnindicator ? 1 : 0;
         userData.bookingId = booking.bookingid;
-        
-        // DETECT IF BOOK WAS RETURNED BY ADMIN
-        // If previously booked/pending, but now not booked and not pending = admin approved return
-        if ((previousBookingState.booked === 1 || previousBookingState.pendingreturn === 1) &&
-            userData.booked === 0 && userData.pendingreturn === 0) {
-          console.log("BOOK WAS RETURNED BY ADMIN - Backend already incremented copies, displaying fresh data");
-        }
-        
         console.log("BOOKING STATUS PARSED - booked:", userData.booked, "pendingreturn:", userData.pendingreturn, "bookingId:", userData.bookingId);
       } else {
-        console.log("NO BOOKING FOUND FOR THIS SPECIFIC BOOK (bookid:" + bookId + ")");
-        // If previously had a booking but now no booking found = return completed
+        // If previously had a booking but now none is found, the admin approved the return
         if (previousBookingState.booked === 1 || previousBookingState.pendingreturn === 1) {
           console.log("BOOKING RECORD DELETED - Return was approved by admin. Showing updated copies from DB");
         }
         userData.booked = 0;
         userData.pendingreturn = 0;
       }
-    } else {
-      console.log("NO ACTIVE BOOKINGS FOUND AT ALL");
-      userData.booked = 0;
-      userData.pendingreturn = 0;
-    }
-  } catch (err) {
-    console.warn("ERROR FETCHING BOOKING STATUS:", err);
-    userData.booked = 0;
-    userData.pendingreturn = 0;
-  }
-  
-  previousBookingState = { booked: userData.booked, pendingreturn: userData.pendingreturn };
 
-  // FETCH WISHLIST STATUS FOR THIS BOOK
-  try {
-    const wishRes = await fetchJson(`${API_BASE}/api/reservations?user_id=${userId}&book_id=${bookId}`);
-    
-    console.log("RAW WISHLIST RESPONSE:", wishRes);
-    
-    if (wishRes.success && wishRes.reservations && wishRes.reservations.length > 0) {
-      const reservation = wishRes.reservations[0];
-      console.log("FIRST RESERVATION RECORD:", reservation);
-      userData.wishlisted = 1;
-      userData.reservationId = reservation.reservationid || reservation.ReservationId || reservation.reservation_id;
-      console.log("WISHLIST STATUS FETCHED: wishlisted, reservationId:", userData.reservationId);
-    } else {
-      console.log("NO WISHLIST FOUND FOR THIS BOOK");
-      userData.wishlisted = 0;
+      previousBookingState = { booked: userData.booked, pendingreturn: userData.pendingreturn };
+
+      if (reservation) {
+        userData.wishlisted = 1;
+        userData.reservationId = reservation.reservationid;
+        // A returned copy is being held for this user until holdexpiresat
+        userData.held = reservation.holdexpiresat ? 1 : 0;
+      } else {
+        userData.wishlisted = 0;
+        userData.held = 0;
+      }
     }
-  } catch (err) {
-    console.warn("ERROR FETCHING WISHLIST STATUS:", err);
-    userData.wishlisted = 0;
-  }
-}
 
     initDOM();
     
-    if (userData.pendingreturn === 1) {
+    if (userData.pendingreturn === 1 || (userData.wishlisted === 1 && userData.held === 0)) {
       startAutoReload();
     } else {
       stopAutoReload();
@@ -375,7 +273,7 @@ function initDOM() {
       return;
     }
 
-    if ((Book.CopiesAvailable ?? 0) <= 0 && userData.booked === 0) {
+    if ((Book.CopiesAvailable ?? 0) <= 0 && userData.booked === 0 && userData.held === 0) {
       bookButton.textContent = "Book";
       bookButton.classList.add("darkgreen");
       bookButton.disabled = true;
@@ -430,7 +328,7 @@ function attachBookingListener() {
     const isBooking =
       userData.booked === 0 &&
       userData.pendingreturn === 0 &&
-      (Book.CopiesAvailable ?? 0) > 0;
+      ((Book.CopiesAvailable ?? 0) > 0 || userData.held === 1);
 
     const isReturnRequest =
       userData.booked === 1 && userData.pendingreturn === 0;
@@ -470,28 +368,18 @@ function attachBookingListener() {
           userData.booked = 1;
           userData.pendingreturn = 0;
           userData.bookingId = bookingRes.booking_id;
-          Book.CopiesAvailable = (Book.CopiesAvailable ?? 1) - 1;
 
-          try {
-            const updateRes = await fetchJson(`${API_BASE}/api/books/${bookId}`, {
-              method: "PUT",
-              headers: { "Content-Type": "application/json" },
-              body: JSON.stringify({ copiesavailable: Book.CopiesAvailable })
-            });
-            console.log("Book copies updated in DB - Response:", updateRes);
-            
-            await loadRealBookData();
-          } catch (copyUpdateErr) {
-            console.error("Failed to update book copies in DB:", copyUpdateErr);
-            await loadRealBookData();
-          }
+          // The server takes the copy off the shelf as part of the booking
+          await loadRealBookData();
           
           showToast("Booked", "Successfully booked");
           
           localStorage.setItem('booking-status-changed', Date.now().toString());
           window.parent.postMessage({ action: "booking-changed" }, "*");
         } catch (e) {
-          showToast("Error", "Booking failed");
+          const soldOut = e.message === "No copies available";
+          showToast("Error", soldOut ? "No copies available" : "Booking failed");
+          if (soldOut) await loadRealBookData();
         } finally {
           isProcessing = false;
           bookButton.disabled = false;
@@ -512,7 +400,6 @@ function attachBookingListener() {
               method: "PUT",
               headers: { "Content-Type": "application/json" },
               body: JSON.stringify({
-                CurrentlyBookedIndicator: false,
                 pendingReturnIndicator: true,
               }),
             }
@@ -729,18 +616,25 @@ window.addEventListener('storage', (event) => {
 });
 
 let autoReloadInterval = null;
+// Only the admin panel holds an event stream; reader pages poll, so they
+// never take one of the server's few stream slots
+const AUTO_RELOAD_MS = 30000;
 
+// While a return is pending or the book is reserved, check every 30s for the
+// admin's approval or for a copy being held for this user
 function startAutoReload() {
   if (autoReloadInterval) return; // Already running
-  
-  autoReloadInterval = setInterval(() => {
-    if (userData.pendingreturn === 1) {
-      console.log("Auto-checking for admin approval of return...");
-      loadRealBookData();
+
+  autoReloadInterval = setInterval(async () => {
+    if (document.visibilityState === "hidden") return;
+    const wasHeld = userData.held;
+    await loadRealBookData();
+    if (wasHeld === 0 && userData.held === 1) {
+      showToast("Copy held", "A returned copy is being held for you");
     }
-  }, 30000);
-  
-  console.log("Auto-reload started for pending returns");
+  }, AUTO_RELOAD_MS);
+
+  console.log("Auto-reload started for pending return or reservation");
 }
 
 function stopAutoReload() {
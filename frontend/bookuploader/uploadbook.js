@@ -13,7 +13,8 @@ document.addEventListener("DOMContentLoaded", () => {
       pagecount: bookData.pages,
       copiesavailable: bookData.copies,
       ratedType: "General",
-      imglink: bookData.imgLink,
+      imglink: bookData.imgLink || null,
+      cover_hash: bookData.coverHash,
       description: bookData.description
     };
 
@@ -36,10 +37,37 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   }
 
+  // Covers picked from disk go to the image store; the book keeps only their hash
+  let coverHash = null;
+
+  const coverFileInput = document.getElementById("coverFile");
+  if (coverFileInput) {
+    coverFileInput.addEventListener("change", async (e) => {
+      const file = e.target.files[0];
+      if (!file) return;
+      const res = await fetch("https://library-backend-excpspbhaq-uc.a.run.app/api/images", {
+        method: "POST",
+        headers: { "Content-Type": file.type },
+        body: file
+      });
+      const data = await res.json();
+      if (!data.success) {
+        window.parent.postMessage({ action: "upload-error", message: data.message }, "*");
+        return;
+      }
+      coverHash = data.hash;
+      const img = document.getElementById("bookCover");
+      img.src = "https://library-backend-excpspbhaq-uc.a.run.app" + data.url;
+      img.alt = "Book Cover";
+      document.getElementById("imgLink").value = "";
+    });
+  }
+
   const imgLinkInput = document.getElementById("imgLink");
   if (imgLinkInput) {
     imgLinkInput.addEventListener("input", (e) => {
       const link = e.target.value.trim();
+      coverHash = null;
       const img = document.getElementById("bookCover");
       img.src = link || "";
       img.alt = link ? "Book Cover" : "No Image";
@@ -67,7 +95,8 @@ document.addEventListener("DOMContentLoaded", () => {
     pages: parseInt(document.getElementById("pages")?.value, 10) || 0,
     copies: parseInt(document.getElementById("copies")?.value, 10) || 0,
     description: document.getElementById("description")?.value.trim() || "",
-    imgLink: document.getElementById("imgLink")?.value.trim() || ""
+    imgLink: document.getElementById("imgLink")?.value.trim() || "",
+    coverHash
   };
 
   const allFilled = (
@@ -79,7 +108,7 @@ document.addEventListener("DOMContentLoaded", () => {
     bookData.publishDate &&
     bookData.language &&
     bookData.description &&
-    bookData.imgLink &&
+    (bookData.imgLink || bookData.coverHash) &&
     bookData.pages > 0 &&
     bookData.copies > 0
   );
@@ -18,27 +18,106 @@ async function loadCategories() {
 }
 
 
+// Stored covers are served as immutable thumbnails; older books still carry a link
+function coverThumbnail(b) {
+  return b.cover_hash
+    ? `https://library-backend-excpspbhaq-uc.a.run.app/api/images/${b.cover_hash}/thumb`
+    : b.imglink || "";
+}
+
+// Cards per request; a category's carousel fetches its next page on demand
+const CATEGORY_PAGE_SIZE = 24;
+// Next page of each category, or null once the category is exhausted
+let categoryCursors = {};
+
+async function fetchCategoryPage(category, cursor) {
+  // Only the columns the cards render
+  const params = new URLSearchParams({
+    fields: "bookid,name,imglink,cover_hash,category",
+    category,
+    limit: String(CATEGORY_PAGE_SIZE)
+  });
+  if (cursor) params.set("after", cursor);
+  const res = await fetch(`https://library-backend-excpspbhaq-uc.a.run.app/api/books?${params}`);
+  const data = await res.json();
+  if (!data.success || !data.books) throw new Error(data.message || "Failed to load books");
+
+  return {
+    books: data.books.map(b => ({
+      id: b.bookid,
+      title: b.name,
+      img: coverThumbnail(b),
+      category: b.category
+    })),
+    cursor: data.next_cursor
+  };
+}
+
+// Load the first page of every category, all at once, rather than the whole
+// catalogue. Needs loadCategories() to have run.
 async function loadBooks() {
   try {
-    const res = await fetch("https://library-backend-excpspbhaq-uc.a.run.app/api/books");
-    const data = await res.json();
-
-    if (data.success && data.books) {
-      books = data.books.map(b => ({
-        id: b.bookid,
-        title: b.name,
-        img: b.imglink || "",
-        category: b.category
-      }));
-    } else {
-      books = [];
-    }
+    const pages = await Promise.all(categories.map(category => fetchCategoryPage(category, null)));
+    const loaded = [];
+    const cursors = {};
+    pages.forEach((page, i) => {
+      loaded.push(...page.books);
+      cursors[categories[i]] = page.cursor;
+    });
+    books = loaded;
+    categoryCursors = cursors;
   } catch (err) {
     console.error("Failed to load books:", err);
     books = [];
+    categoryCursors = {};
   }
 }
 
+// Fetch the next page of one category; returns the books it added
+async function loadMoreBooks(category) {
+  const cursor = categoryCursors[category];
+  if (!cursor) return [];
+  const page = await fetchCategoryPage(category, cursor);
+  categoryCursors[category] = page.cursor;
+  const known = new Set(books.map(b => b.id));
+  const added = page.books.filter(b => !known.has(b.id));
+  books.push(...added);
+  return added;
+}
+
+// Show the category's books in a carousel, with a "Load more" card while it has more
+function fillCarousel(row, category) {
+  const filteredBooks = books.filter(b => b.category === category);
+  filteredBooks.forEach((book, i) => {
+    row.appendChild(createBookCard(book, i));
+  });
+  appendLoadMore(row, category, filteredBooks.length);
+  return filteredBooks.length;
+}
+
+function appendLoadMore(row, category, shown) {
+  if (!categoryCursors[category]) return;
+
+  const button = document.createElement('button');
+  button.type = 'button';
+  button.className = 'book-card load-more';
+  button.innerHTML = '<div class="book-meta"><div class="book-title">Load more</div></div>';
+  button.addEventListener('click', async () => {
+    button.disabled = true;
+    try {
+      const added = await loadMoreBooks(category);
+      button.remove();
+      added.forEach((book, i) => row.appendChild(createBookCard(book, shown + i)));
+      appendLoadMore(row, category, shown + added.length);
+      renderSidebar();
+    } catch (err) {
+      console.error("Failed to load more books:", err);
+      button.disabled = false;
+    }
+  });
+  row.appendChild(button);
+}
+
 async function searchBooks(query) {
   try {
     const res = await fetch(`https://library-backend-excpspbhaq-uc.a.run.app/api/books/search?name=${encodeURIComponent(query)}`);
@@ -48,7 +127,7 @@ async function searchBooks(query) {
       return data.books.map(b => ({
         id: b.bookid,
         title: b.name,
-        img: b.imglink || "",
+        img: coverThumbnail(b),
         category: b.category
       }));
     } else {
@@ -118,12 +197,15 @@ function renderSidebar() {
   });
 
   const totalBooks = books.length;
+  // Counts are of the books loaded so far; "+" marks a category with more to load
+  const more = cat => (categoryCursors[cat] ? '+' : '');
+  const anyMore = categories.some(cat => categoryCursors[cat]) ? '+' : '';
 
   let sidebarHTML = `
     <nav class="nav">
       <a class="nav-item" id="allBooksItem" href="#" data-category="all">
         <span class="label"><i class="fa-solid fa-books"></i>All Books</span>
-        <span class="count">${totalBooks}</span>
+        <span class="count">${totalBooks}${anyMore}</span>
       </a>
   `;
 
@@ -132,7 +214,7 @@ function renderSidebar() {
     sidebarHTML += `
       <a class="nav-item" href="#" data-category="${cat}">
         <span class="label"><i class="fa-solid fa-book-open-reader"></i>${cat}</span>
-        <span class="count">${count}</span>
+        <span class="count">${count}${more(cat)}</span>
       </a>
     `;
   });
@@ -240,12 +322,7 @@ function renderDashboard() {
         <div class="carousel"></div>
       `;
 
-      const row = panel.querySelector('.carousel');
-      const filteredBooks = books.filter(b => b.category === category);
-
-      filteredBooks.forEach((book, i) => {
-        row.appendChild(createBookCard(book, i));
-      });
+      fillCarousel(panel.querySelector('.carousel'), category);
 
       main.appendChild(panel);
     });
@@ -284,14 +361,8 @@ function renderSingleCategory(categoryName) {
   `;
 
   const row = panel.querySelector('.carousel');
-  const filteredBooks = books.filter(b => b.category === categoryName);
-
-  if (filteredBooks.length === 0) {
+  if (fillCarousel(row, categoryName) === 0) {
     row.innerHTML = '<div style="color:var(--muted);padding:20px;">No books in this category.</div>';
-  } else {
-    filteredBooks.forEach((book, i) => {
-      row.appendChild(createBookCard(book, i));
-    });
   }
 
   main.appendChild(panel);
@@ -428,6 +499,28 @@ if (stored) {
         renderDashboard();
       }
     });
+
+    const suggestionList = document.getElementById('bookSuggestions');
+    let suggestTimer = null;
+    searchInput.addEventListener('input', () => {
+      clearTimeout(suggestTimer);
+      const prefix = searchInput.value.trim();
+      if (!suggestionList || prefix.length < 2) return;
+      suggestTimer = setTimeout(async () => {
+        try {
+          const res = await fetch(`https://library-backend-excpspbhaq-uc.a.run.app/api/books/suggest?q=${encodeURIComponent(prefix)}&limit=8`);
+          const data = await res.json();
+          if (!data.success) return;
+          suggestionList.replaceChildren(...data.suggestions.map(s => {
+            const option = document.createElement('option');
+            option.value = s.text;
+            return option;
+          }));
+        } catch (err) {
+          console.warn("Failed to load suggestions:", err);
+        }
+      }, 150);
+    });
   }
 
   const initialParams = new URLSearchParams(window.location.search);
@@ -526,6 +619,9 @@ if (stored) {
         }
         
         if (settingsPanel) settingsPanel.style.display = 'block';
+        if (SettingsPanel && typeof SettingsPanel.startBookingFeed === 'function') {
+          SettingsPanel.startBookingFeed();
+        }
       }
     },
     _hide(viewName) {
@@ -537,6 +633,9 @@ if (stored) {
       }  else if (viewName === 'settings') {
         const settingsPanel = document.getElementById('settingsPanel');
         if (settingsPanel) settingsPanel.style.display = 'none';
+        if (SettingsPanel && typeof SettingsPanel.stopBookingFeed === 'function') {
+          SettingsPanel.stopBookingFeed();
+        }
       }
     },
     navigateTo(viewName) {
@@ -611,10 +710,8 @@ if (stored) {
 
 document.addEventListener('DOMContentLoaded', async () => {
 
-  await Promise.all([
-    loadCategories(),
-    loadBooks()
-  ]);
+  await loadCategories();
+  await loadBooks();
 
   renderSidebar();
 
@@ -735,8 +832,8 @@ window.addEventListener('message', async (event) => {
   if (action === 'save-btn') {
     if (data && data.success) {
       closeUploadOverlay();
-      await loadBooks();
       await loadCategories();
+      await loadBooks();
       renderSidebar();
       renderDashboard();
       showToast('Book added successfully!');
@@ -765,8 +862,8 @@ if (action === 'close-bookdetails') {
       Array.from(main.querySelectorAll('.category-panel, #detailsPanel')).forEach(n => n.remove());
     }
 
-    await loadBooks();
     await loadCategories();
+    await loadBooks();
 
     renderSidebar();
     renderDashboard();
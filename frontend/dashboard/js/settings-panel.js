@@ -7,9 +7,11 @@ const SettingsPanel = (() => {
   const API_BASE = localStorage.getItem('API_BASE') || 'https://library-backend-excpspbhaq-uc.a.run.app';
   let pendingInitialized = false;
   let lastPendingKey = '';
-  const userCache = new Map();
-  const bookCache = new Map();
   const MAX_TX_ROWS = 200;
+  // Reload interval used when the event stream is unavailable
+  const PENDING_POLL_MS = 5000;
+  let bookingEvents = null;
+  let pollTimer = null;
 
   // Initialize settings panel event listeners
   function init(viewManager) {
@@ -72,16 +74,65 @@ const SettingsPanel = (() => {
       }
     });
 
-    setInterval(() => {
-      try {
-        if (viewManager.currentView === 'settings') {
-          const manageRequestsTab = document.querySelector('.settings-tab-btn[data-tab="manage-requests"]');
-          if (manageRequestsTab && manageRequestsTab.classList.contains('active')) {
-            loadPendingRequests();
-          }
-        }
-      } catch (_) {}
-    }, 5000);
+    // The feed runs only while this panel is on screen
+    document.addEventListener('visibilitychange', () => {
+      if (document.visibilityState === 'hidden') {
+        stopBookingFeed();
+      } else if (viewManager.currentView === 'settings') {
+        startBookingFeed();
+      }
+    });
+  }
+
+  function onBookingEvent() {
+    try {
+      const manageRequestsTab = document.querySelector('.settings-tab-btn[data-tab="manage-requests"]');
+      if (manageRequestsTab && manageRequestsTab.classList.contains('active')) {
+        loadPendingRequests();
+      }
+      loadTransactionHistory();
+    } catch (_) {}
+  }
+
+  function startPolling() {
+    if (!pollTimer) pollTimer = setInterval(onBookingEvent, PENDING_POLL_MS);
+  }
+
+  // Booking changes are pushed by the server while the admin panel is open.
+  // The server caps open streams and answers 503 past the cap, and a browser
+  // never retries an EventSource that got a non-200 answer, so fall back to
+  // polling once the stream is closed for good.
+  function startBookingFeed() {
+    if (bookingEvents || pollTimer) return;
+    if (typeof EventSource === 'undefined') {
+      startPolling();
+      return;
+    }
+    const events = new EventSource(`${API_BASE}/api/bookings/events`);
+    ['return_requested', 'return_approved', 'reservation_created', 'booking_created'].forEach((type) => {
+      events.addEventListener(type, onBookingEvent);
+    });
+    events.onerror = () => {
+      // While CONNECTING the browser is retrying a dropped stream by itself
+      if (events.readyState !== EventSource.CLOSED) return;
+      events.close();
+      if (bookingEvents === events) {
+        bookingEvents = null;
+        startPolling();
+      }
+    };
+    bookingEvents = events;
+  }
+
+  function stopBookingFeed() {
+    if (bookingEvents) {
+      bookingEvents.close();
+      bookingEvents = null;
+    }
+    if (pollTimer) {
+      clearInterval(pollTimer);
+      pollTimer = null;
+    }
   }
 
   async function loadPendingRequests() {
@@ -95,9 +146,18 @@ const SettingsPanel = (() => {
         listEl.innerHTML = '<div style="padding:20px;color:var(--muted)">Loading requests...</div>';
       }
 
-      const resp = await fetch(`${API_BASE}/api/bookings?pending=1`);
-      const data = await resp.json();
-      if (!resp.ok) throw new Error(data.message || 'Failed to load');
+      // Page through every pending return, not just the first page
+      const data = { bookings: [] };
+      let cursor = null;
+      do {
+        const params = new URLSearchParams({ pending: '1', include_names: '1', limit: '500' });
+        if (cursor) params.set('after', cursor);
+        const resp = await fetch(`${API_BASE}/api/bookings?${params}`);
+        const page = await resp.json();
+        if (!resp.ok) throw new Error(page.message || 'Failed to load');
+        data.bookings.push(...(page.bookings || []));
+        cursor = page.next_cursor;
+      } while (cursor);
 
       const listHtml = document.createElement('div');
       listHtml.style.padding = '12px';
@@ -128,22 +188,8 @@ const SettingsPanel = (() => {
         const uid = b.userid || b.UserId;
         const bid = b.bookid || b.BookId;
 
-        const [uname, bname] = await Promise.all([
-          (async () => {
-            try {
-              const r = await fetch(`${API_BASE}/api/users?user_id=${encodeURIComponent(uid)}`);
-              const d = await r.json();
-              return (d.user && (d.user.fullname || d.user.username || d.user.Username)) || uid;
-            } catch { return uid; }
-          })(),
-          (async () => {
-            try {
-              const r = await fetch(`${API_BASE}/api/books?book_id=${encodeURIComponent(bid)}`);
-              const d = await r.json();
-              return (d.book && (d.book.name || d.book.Name)) || bid;
-            } catch { return bid; }
-          })()
-        ]);
+        const uname = b.username || uid;
+        const bname = b.bookname || bid;
 
         info.innerHTML =
           `<div style="font-weight:600">Booking #${b.bookingid || b.BookingId}</div>
@@ -161,7 +207,7 @@ const SettingsPanel = (() => {
             const r = await fetch(`${API_BASE}/api/bookings/${id}`, {
               method: 'PUT',
               headers: { 'Content-Type': 'application/json' },
-              body: JSON.stringify({ pendingReturnIndicator: false,  CurrentlyBookedIndicator: false,})
+              body: JSON.stringify({ pendingReturnIndicator: false })
             });
 
             const res = await r.json();
@@ -234,7 +280,7 @@ const SettingsPanel = (() => {
 
       container.innerHTML = '<div style="padding:20px;color:var(--muted)">Loading transactions...</div>';
 
-      const resp = await fetch(`${API_BASE}/api/transactions`);
+      const resp = await fetch(`${API_BASE}/api/transactions?sort=-transactiondate&include_names=1&limit=${MAX_TX_ROWS}`);
       const data = await resp.json();
       if (!resp.ok) throw new Error(data.message || 'Failed to load');
 
@@ -256,40 +302,6 @@ const SettingsPanel = (() => {
       });
       const limited = items.slice(0, MAX_TX_ROWS);
 
-      const uniqueUserIds = Array.from(new Set(limited.map(t => t.userid || t.UserId).filter(Boolean)));
-      const uniqueBookIds = Array.from(new Set(limited.map(t => t.bookid || t.BookId).filter(Boolean)));
-
-      const fetchUser = async (uid) => {
-        if (userCache.has(uid)) return userCache.get(uid);
-        try {
-          const r = await fetch(`${API_BASE}/api/users?user_id=${encodeURIComponent(uid)}`);
-          const d = await r.json();
-          const name = (d.user && (d.user.fullname || d.user.username || d.user.Username)) || uid;
-          userCache.set(uid, name);
-          return name;
-        } catch {
-          userCache.set(uid, uid);
-          return uid;
-        }
-      };
-
-      const fetchBook = async (bid) => {
-        if (bookCache.has(bid)) return bookCache.get(bid);
-        try {
-          const r = await fetch(`${API_BASE}/api/books?book_id=${encodeURIComponent(bid)}`);
-          const d = await r.json();
-          const name = (d.book && (d.book.name || d.book.Name)) || bid;
-          bookCache.set(bid, name);
-          return name;
-        } catch {
-          bookCache.set(bid, bid);
-          return bid;
-        }
-      };
-
-      await Promise.all(uniqueUserIds.map(fetchUser));
-      await Promise.all(uniqueBookIds.map(fetchBook));
-
       for (const t of limited) {
         const row = document.createElement('div');
         row.style.display = 'flex';
@@ -305,8 +317,8 @@ const SettingsPanel = (() => {
         const reserved = t.reservedindicator ?? t.ReservedIndicator;
         const action = reserved ? 'Reserved' : 'Booked';
 
-        const uname = userCache.get(uid) || uid;
-        const bname = bookCache.get(bid) || bid;
+        const uname = t.username || uid;
+        const bname = t.bookname || bid;
 
         const info = document.createElement('div');
         info.innerHTML =
@@ -335,6 +347,8 @@ const SettingsPanel = (() => {
   return {
     init,
     loadPendingRequests,
-    loadTransactionHistory
+    loadTransactionHistory,
+    startBookingFeed,
+    stopBookingFeed
   };
 })();
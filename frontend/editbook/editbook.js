@@ -2,6 +2,8 @@ let book = {};
 let author = {};
 let publisher = {};
 let originalPublishDate = null;
+// Only a changed cover is sent, so a stored cover is not overwritten by its own URL
+let coverChanged = false;
 
 function loadBookData() {
   const raw = sessionStorage.getItem("editBookPayload");
@@ -24,7 +26,7 @@ function loadBookData() {
   document.getElementById("copies").value = book.CopiesAvailable;
   document.getElementById("description").value = book.Description;
   document.getElementById("bookCover").src = book.ImgLink;
-  document.getElementById("imglink").value = book.ImgLink;
+  document.getElementById("imglink").value = book.CoverHash ? "" : book.ImgLink;
 
   originalPublishDate = book.PublishDate;
 }
@@ -47,9 +49,33 @@ function showAlert(title, message) {
 document.getElementById("imglink").addEventListener("input", (e) => {
   const url = e.target.value.trim();
   book.ImgLink = url;
+  book.CoverHash = null;
+  coverChanged = true;
   document.getElementById("bookCover").src = url;
 });
 
+document.getElementById("coverFile").addEventListener("change", async (e) => {
+  const file = e.target.files[0];
+  if (!file) return;
+  try {
+    const res = await fetch("https://library-backend-excpspbhaq-uc.a.run.app/api/images", {
+      method: "POST",
+      headers: { "Content-Type": file.type },
+      body: file
+    });
+    const data = await res.json();
+    if (!data.success) throw new Error(data.message);
+
+    book.ImgLink = null;
+    book.CoverHash = data.hash;
+    coverChanged = true;
+    document.getElementById("imglink").value = "";
+    document.getElementById("bookCover").src = "https://library-backend-excpspbhaq-uc.a.run.app" + data.url;
+  } catch (err) {
+    showAlert("Error", err.message);
+  }
+});
+
 
 document.getElementById("saveBtn").addEventListener("click", async () => {
   const currentDateInput = document.getElementById("publishDate").value;
@@ -61,10 +87,14 @@ const updated = {
   language: document.getElementById("language").value,
   pagecount: parseInt(document.getElementById("pages").value),
   copiesavailable: parseInt(document.getElementById("copies").value),
-  description: document.getElementById("description").value,
-  imglink: book.ImgLink
+  description: document.getElementById("description").value
 };
 
+if (coverChanged) {
+  updated.imglink = book.ImgLink;
+  updated.cover_hash = book.CoverHash;
+}
+
 if (currentDateInput && currentDateInput !== originalPublishDate) {
   updated.publishdate = currentDateInput;
 }
@@ -1,4 +1,8 @@
 -- init.sql
+--
+-- Creates a fresh database at the baseline schema and is never changed.
+-- Every later schema change is a numbered migration in backend/migrations.py;
+-- the backend container applies them on start (`python migrations.py`).
 
 -- 1) Users Table
 CREATE TABLE IF NOT EXISTS Users (